@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_, select
+
+from .models import ReportStatus, SpeciesReport, User
+from .utils import split_paths
+
+try:  # optional: the stdlib encoder produces the same bytes, only slower
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+# Data-only JSON for the desktop client (/api/v1/...). DTOs carry what the
+# screens show and nothing else; media fields are paths relative to /media/.
+# Timestamps are ISO 8601 UTC.
+
+FEED_LIMIT = 50
+FEED_MAX_LIMIT = 200
+TAX_PARAMS = ("phylum", "class_name", "order_name", "family", "genus")
+
+
+def _default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat() + "+00:00"
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NAIVE_UTC)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+# --- feed ------------------------------------------------------------------
+
+FEED_COLUMNS = (
+    SpeciesReport.id, SpeciesReport.title, SpeciesReport.species_name, SpeciesReport.location_text,
+    SpeciesReport.phylum, SpeciesReport.class_name, SpeciesReport.order_name, SpeciesReport.family,
+    SpeciesReport.genus, SpeciesReport.photo_paths, SpeciesReport.created_at, SpeciesReport.reporter_id,
+    SpeciesReport.latitude, SpeciesReport.longitude,
+)
+
+
+def encode_cursor(created_at: datetime, report_id: int) -> str:
+    return f"{created_at.isoformat()}_{report_id}"
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    try:
+        ts, rid = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(ts), int(rid)
+    except ValueError:
+        return None
+
+
+def feed_query(q: Optional[str], taxa: Dict[str, str], cursor: Optional[Tuple[datetime, int]], limit: int):
+    """Approved reports newest first, keyset-paginated on (created_at, id).
+
+    Unlike the HTML feed, search results are not ranked: a stable order is
+    what makes the cursor work.
+    """
+    stmt = select(*FEED_COLUMNS).where(SpeciesReport.status == ReportStatus.approved.value)
+    if q:
+        pat = f"%{q}%"
+        stmt = stmt.where(or_(SpeciesReport.title.ilike(pat), SpeciesReport.species_name.ilike(pat),
+                              SpeciesReport.description.ilike(pat)))
+    for name, value in taxa.items():
+        stmt = stmt.where(getattr(SpeciesReport, name) == value)
+    if cursor is not None:
+        ts, rid = cursor
+        stmt = stmt.where(or_(SpeciesReport.created_at < ts,
+                              (SpeciesReport.created_at == ts) & (SpeciesReport.id < rid)))
+    return stmt.order_by(SpeciesReport.created_at.desc(), SpeciesReport.id.desc()).limit(limit + 1)
+
+
+def rows_query(ids: Iterable[int]):
+    """Card columns for given report ids (order is up to the caller)."""
+    return select(*FEED_COLUMNS).where(SpeciesReport.id.in_(list(ids)))
+
+
+def users_query(ids: Iterable[int]):
+    return select(User.id, User.display_name, User.avatar_url).where(User.id.in_(set(ids)))
+
+
+def feed_page(rows: List, users: Iterable, limit: int) -> dict:
+    """{"items": [...], "users": {id: {...}}, "next": cursor or null}.
+
+    Reporters are listed once in "users" instead of on every card.
+    """
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": [card(r) for r in rows],
+        "users": {str(u.id): {"name": u.display_name, "avatar": u.avatar_url} for u in users},
+        "next": encode_cursor(rows[-1].created_at, rows[-1].id) if more and rows else None,
+    }
+
+
+def _coords(r) -> Optional[List[float]]:
+    # [lat, lon], or null when the report has no position
+    return [r.latitude, r.longitude] if r.latitude is not None and r.longitude is not None else None
+
+
+def geo_page(rows: List, users: Iterable, order: List[int], distances: Optional[Dict[int, float]] = None) -> dict:
+    """Cards in `order` (ids), with the users map like feed_page; no cursor."""
+    by_id = {r.id: r for r in rows}
+    items = []
+    for rid in order:
+        r = by_id.get(rid)
+        if r is None:
+            continue
+        c = card(r)
+        if distances is not None:
+            c["distance_km"] = distances[rid]
+        items.append(c)
+    return {"items": items, "users": {str(u.id): {"name": u.display_name, "avatar": u.avatar_url} for u in users}}
+
+
+def card(r) -> dict:
+    photos = split_paths(r.photo_paths)
+    return {
+        "id": r.id,
+        "title": r.title,
+        "species": r.species_name,
+        # phylum, class, order, family, genus
+        "taxon": [r.phylum, r.class_name, r.order_name, r.family, r.genus],
+        "location": r.location_text,
+        "coords": _coords(r),
+        "photo": photos[0] if photos else None,
+        "created_at": r.created_at,
+        "reporter": r.reporter_id,
+    }
+
+
+def detail(r: SpeciesReport) -> dict:
+    return {
+        "id": r.id,
+        "title": r.title,
+        "species": r.species_name,
+        "description": r.description,
+        "taxon": [r.phylum, r.class_name, r.order_name, r.family, r.genus],
+        "location": r.location_text,
+        "coords": _coords(r),
+        "photos": split_paths(r.photo_paths),
+        "status": r.status,
+        "review_note": r.review_note,
+        "created_at": r.created_at,
+        "updated_at": r.updated_at,
+        "reporter": {"id": r.reporter_id, "name": r.reporter.display_name if r.reporter else None,
+                     "avatar": r.reporter.avatar_url if r.reporter else None},
+    }
+
+
+# --- points, shop, stats ---------------------------------------------------
+
+def points(summary: dict) -> dict:
+    return {
+        "balance": summary["balance"],
+        "signed_in_today": summary["signed"],
+        "signin_points": summary["signin_points"],
+        "quests": summary["quests"],
+        "recent": [{"delta": e.delta, "reason": e.reason, "at": e.created_at} for e in summary["recent"]],
+    }
+
+
+def shop(balance: int, items: Iterable) -> dict:
+    return {
+        "balance": balance,
+        "items": [{"id": i.id, "kind": i.kind, "title": i.title, "description": i.description,
+                   "cost": i.points_cost, "stock": i.stock, "media": i.media_url} for i in items],
+    }
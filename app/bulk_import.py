@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import json
+import mimetypes
+import re
+import socket
+from typing import AsyncIterator, List, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+from .db import SessionLocal
+from .models import SpeciesReport
+from .utils import ALLOWED_MIME, MAX_FILE_SIZE, MEDIA_ROOT, save_bytes, join_paths, delete_media_list
+from . import geo, photo_hash, user_stats
+
+
+IMPORT_BATCH_SIZE = 200
+IMPORT_FETCH_CONCURRENCY = 8
+MAX_LINE_BYTES = 64 * 1024
+MAX_PHOTOS = 3
+MAX_REDIRECTS = 3
+FETCH_TIMEOUT = 20
+TAX_FIELDS = ("phylum", "class_name", "order_name", "family", "genus")
+
+
+def upload_subdir(user_id: int) -> str:
+    """Where separately uploaded import photos live; rows may only reference their own."""
+    return f"imports/u{user_id}"
+
+
+def _own_upload(path: str, user_id: int) -> bool:
+    pat = rf"uploads/\d{{4}}/\d{{2}}/imports/u{user_id}/[0-9a-f]{{32}}\.(png|jpe?g)"
+    return bool(re.fullmatch(pat, path)) and (MEDIA_ROOT / path).is_file()
+
+
+def parse_row(obj, user_id: int, allowed_phyla: set) -> dict:
+    """Validate one decoded NDJSON object; raises ValueError with a client-facing message."""
+    if not isinstance(obj, dict):
+        raise ValueError("row must be a JSON object")
+    title = str(obj.get("title") or "").strip()
+    species = str(obj.get("species_name") or "").strip()
+    if not title or not species:
+        raise ValueError("title and species_name are required")
+    row = {
+        "title": title[:200],
+        "species_name": species[:200],
+        "description": str(obj.get("description") or "").strip(),
+        "location_text": str(obj.get("location_text") or "").strip()[:255],
+    }
+    for f in TAX_FIELDS:
+        row[f] = str(obj.get(f) or "").strip()[:100] or None
+    row.update(geo.locate(row["location_text"], obj.get("latitude"), obj.get("longitude")))
+    if row["phylum"] and row["phylum"] not in allowed_phyla:
+        raise ValueError(f"phylum not allowed: {row['phylum']}")
+    urls = obj.get("photo_urls") or []
+    paths = obj.get("photo_paths") or []
+    if not isinstance(urls, list) or not isinstance(paths, list):
+        raise ValueError("photo_urls and photo_paths must be lists")
+    if not urls and not paths:
+        raise ValueError("at least one photo is required")
+    if len(urls) + len(paths) > MAX_PHOTOS:
+        raise ValueError(f"at most {MAX_PHOTOS} photos")
+    for u in urls:
+        if not isinstance(u, str) or not u.lower().startswith(("http://", "https://")):
+            raise ValueError("photo_urls must be http(s) URLs")
+    for p in paths:
+        if not isinstance(p, str) or not _own_upload(p, user_id):
+            raise ValueError(f"unknown upload: {p}")
+    row["_urls"] = urls
+    row["_paths"] = list(paths)
+    return row
+
+
+def _public_address(host: str) -> str:
+    """Resolve `host` and return an address to connect to; ValueError unless all are public."""
+    try:
+        infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"photo host not found: {host}")
+    addrs = [info[4][0] for info in infos]
+    for addr in addrs:
+        ip = ipaddress.ip_address(addr.split("%")[0])
+        if ip.version == 6 and ip.ipv4_mapped:
+            ip = ip.ipv4_mapped
+        # loopback, RFC1918, link-local (cloud metadata), CGNAT, reserved ...
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"photo host not allowed: {host}")
+    return addrs[0]
+
+
+def _open_photo(url: str):
+    """GET a URL on a public host, connecting to the address that was checked.
+
+    Pinning the address stops the name from resolving somewhere else between
+    the check and the connection. Redirects are not followed here.
+    """
+    import urllib3
+    from requests.utils import DEFAULT_CA_BUNDLE_PATH
+
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"photo_urls must be http(s) URLs: {url}")
+    try:
+        host = parts.hostname.encode("idna").decode("ascii")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except (UnicodeError, ValueError):
+        raise ValueError(f"invalid photo URL: {url}")
+    addr = _public_address(host)
+    common = {"timeout": FETCH_TIMEOUT, "retries": False, "maxsize": 1}
+    if parts.scheme == "https":
+        # certificate and SNI are still checked against the name, not the address
+        pool = urllib3.HTTPSConnectionPool(addr, port, cert_reqs="CERT_REQUIRED", ca_certs=DEFAULT_CA_BUNDLE_PATH,
+                                           server_hostname=host, assert_hostname=host, **common)
+    else:
+        pool = urllib3.HTTPConnectionPool(addr, port, **common)
+    netloc = f"[{host}]" if ":" in host else host
+    if parts.port:
+        netloc += f":{parts.port}"
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    headers = {"Host": netloc, "User-Agent": "KomodoHub/1.0 (+https://example.local)"}
+    try:
+        return pool.urlopen("GET", target, headers=headers, redirect=False, preload_content=False)
+    except urllib3.exceptions.HTTPError as e:
+        raise ValueError(f"photo fetch failed ({e.__class__.__name__}): {url}")
+
+
+def fetch_photo(url: str, user_id: int) -> str:
+    """Download an image URL into the user's import folder (blocking).
+
+    Only public http(s) hosts are fetched; every redirect hop is checked again.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        r = _open_photo(url)
+        if r.status in (301, 302, 303, 307, 308) and r.headers.get("Location"):
+            r.release_conn()
+            url = urljoin(url, r.headers["Location"])
+            continue
+        break
+    else:
+        raise ValueError(f"too many redirects: {url}")
+    try:
+        if r.status != 200:
+            raise ValueError(f"photo fetch failed ({r.status}): {url}")
+        ctype = (r.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if ctype not in ALLOWED_MIME:
+            raise ValueError(f"unsupported photo type {ctype or 'unknown'}: {url}")
+        buf = bytearray()
+        for chunk in r.stream(64 * 1024):
+            buf.extend(chunk)
+            if len(buf) > MAX_FILE_SIZE:
+                raise ValueError(f"photo too large: {url}")
+    finally:
+        r.release_conn()
+    ext = mimetypes.guess_extension(ctype) or ".jpg"
+    if ext == ".jpe":
+        ext = ".jpg"
+    return save_bytes(bytes(buf), ext, upload_subdir(user_id))
+
+
+def insert_batch(rows: List[dict], user_id: int) -> List[int]:
+    """Insert a batch of validated rows in one transaction and return their ids."""
+    db = SessionLocal()
+    try:
+        reps = [
+            SpeciesReport(
+                reporter_id=user_id,
+                photo_paths=join_paths(r["_paths"]),
+                **{k: v for k, v in r.items() if not k.startswith("_")},
+            )
+            for r in rows
+        ]
+        db.add_all(reps)
+        user_stats.bump(db, user_id, total_reports=len(reps))
+        db.flush()
+        photo_hash.enqueue(db, [r.id for r in reps])
+        db.commit()
+        return [r.id for r in reps]
+    finally:
+        db.close()
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[bytes | None, str | None]]:
+    """Split a byte stream into lines; oversized lines yield (None, error)."""
+    buf = b""
+    skipping = False
+    async for chunk in chunks:
+        buf += chunk
+        while True:
+            nl = buf.find(b"\n")
+            if nl == -1:
+                if len(buf) > MAX_LINE_BYTES:
+                    if not skipping:
+                        yield None, "line too long"
+                    skipping = True
+                    buf = b""
+                break
+            line, buf = buf[:nl], buf[nl + 1:]
+            if skipping:
+                skipping = False
+                continue
+            if len(line) > MAX_LINE_BYTES:
+                yield None, "line too long"
+                continue
+            yield line, None
+    if buf.strip() and not skipping:
+        yield buf, None
+
+
+async def _resolve_photos(batch: List[Tuple[int, dict]], user_id: int) -> List[Tuple[int, dict | None, str | None]]:
+    sem = asyncio.Semaphore(IMPORT_FETCH_CONCURRENCY)
+
+    async def one(line_no: int, row: dict):
+        fetched: List[str] = []
+        try:
+            for url in row["_urls"]:
+                async with sem:
+                    fetched.append(await run_in_threadpool(fetch_photo, url, user_id))
+        except Exception as e:
+            delete_media_list(fetched)
+            msg = str(e) if isinstance(e, ValueError) else f"photo fetch failed: {e.__class__.__name__}"
+            return line_no, None, msg
+        row["_paths"].extend(fetched)
+        row["_fetched"] = fetched
+        return line_no, row, None
+
+    return await asyncio.gather(*(one(n, r) for n, r in batch))
+
+
+def _result(obj: dict) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def import_stream(chunks: AsyncIterator[bytes], user_id: int, allowed_phyla: set) -> AsyncIterator[bytes]:
+    """Validate NDJSON rows as they arrive, insert them in batches, stream per-line results."""
+    created = failed = 0
+    line_no = 0
+    batch: List[Tuple[int, dict]] = []
+
+    async def flush():
+        nonlocal created, failed
+        out = []
+        resolved = await _resolve_photos(batch, user_id)
+        ok_rows = []
+        for n, row, err in resolved:
+            if err:
+                failed += 1
+                out.append((n, _result({"line": n, "ok": False, "error": err})))
+            else:
+                ok_rows.append((n, row))
+        if ok_rows:
+            try:
+                ids = await run_in_threadpool(insert_batch, [r for _, r in ok_rows], user_id)
+            except Exception as e:
+                for _, r in ok_rows:
+                    delete_media_list(r.get("_fetched", []))
+                failed += len(ok_rows)
+                out.extend((n, _result({"line": n, "ok": False, "error": f"insert failed: {e.__class__.__name__}"})) for n, _ in ok_rows)
+            else:
+                created += len(ids)
+                out.extend((n, _result({"line": n, "ok": True, "id": rid})) for (n, _), rid in zip(ok_rows, ids))
+        batch.clear()
+        out.sort(key=lambda t: t[0])
+        return [b for _, b in out]
+
+    async for raw, err in _iter_lines(chunks):
+        line_no += 1
+        if err:
+            failed += 1
+            yield _result({"line": line_no, "ok": False, "error": err})
+            continue
+        if not raw.strip():
+            continue
+        try:
+            row = parse_row(json.loads(raw), user_id, allowed_phyla)
+        except (ValueError, UnicodeDecodeError) as e:
+            failed += 1
+            yield _result({"line": line_no, "ok": False, "error": str(e)})
+            continue
+        batch.append((line_no, row))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            for b in await flush():
+                yield b
+    if batch:
+        for b in await flush():
+            yield b
+    yield _result({"done": True, "created": created, "failed": failed})
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """Streams results while the request body is still being read.
+
+    Starlette's StreamingResponse listens on `receive` for a disconnect, which
+    would swallow request body chunks the body iterator is consuming.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
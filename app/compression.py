@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import gzip
+import os
+import zlib
+from typing import Dict, Iterable, Optional
+
+try:  # optional: gzip only without it
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+ENABLED = os.environ.get("KOMODO_COMPRESSION", "1").strip().lower() not in {"0", "off", "false"}
+MIN_SIZE = int(os.environ.get("KOMODO_COMPRESS_MIN_BYTES", "1024"))
+# per-request levels: cheap enough to run on every response
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# bodies compressed once and reused (cached pages, taxonomy JSON)
+GZIP_LEVEL_STORED = 9
+BROTLI_QUALITY_STORED = 9
+EXCLUDED_PREFIXES = ("/media/",)
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "image/svg+xml")
+
+
+def encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best encoding the client accepts (br before gzip), or None for identity."""
+    if not ENABLED or not accept_encoding:
+        return None
+    q: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        q[name.strip().lower()] = weight
+    star = q.get("*", 0.0)
+    best, best_q = None, 0.0
+    for enc in encodings():
+        weight = q.get(enc, star)
+        if weight > best_q:
+            best, best_q = enc, weight
+    return best
+
+
+def compressible(content_type: str) -> bool:
+    ct = content_type.split(";", 1)[0].strip().lower()
+    return any(ct.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+
+def compress(body: bytes, encoding: str, stored: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY_STORED if stored else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL_STORED if stored else GZIP_LEVEL, mtime=0)
+
+
+def precompress(body: bytes) -> Dict[str, bytes]:
+    """Encoded variants of a body that is served many times; only those that
+    are actually smaller are kept."""
+    if not ENABLED or len(body) < MIN_SIZE:
+        return {}
+    out = {}
+    for enc in encodings():
+        data = compress(body, enc, stored=True)
+        if len(data) < len(body):
+            out[enc] = data
+    return out
+
+
+def weak_etag(etag: str) -> str:
+    # an encoded body is a different representation of the same resource
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+def add_vary(value: Optional[str]) -> str:
+    if not value:
+        return "Accept-Encoding"
+    if "accept-encoding" in value.lower():
+        return value
+    return f"{value}, Accept-Encoding"
+
+
+def pick(accept_encoding: Optional[str], body: bytes, variants: Dict[str, bytes], headers: Dict[str, str]) -> bytes:
+    """Choose between a body and its precompressed variants; updates `headers`."""
+    if variants:
+        headers["Vary"] = add_vary(headers.get("Vary"))
+    enc = negotiate(accept_encoding)
+    if enc is None or enc not in variants:
+        return body
+    headers["Content-Encoding"] = enc
+    if "ETag" in headers:
+        headers["ETag"] = weak_etag(headers["ETag"])
+    return variants[enc]
+
+
+class _Stream:
+    """Incremental encoder; every chunk is flushed so streamed rows reach the client."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.flush()
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._c.finish()
+        return self._c.flush(zlib.Z_FINISH)
+
+
+def _header(headers: Iterable, name: bytes) -> Optional[bytes]:
+    for k, v in headers:
+        if k.lower() == name:
+            return v
+    return None
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware: gzip/brotli by Accept-Encoding.
+
+    Whole bodies under MIN_SIZE go out as they are. Streamed responses are
+    compressed chunk by chunk and flushed as they go. Responses that already
+    carry a Content-Encoding (precompressed ones) and /media are left alone.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path", "").startswith(EXCLUDED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate((_header(scope.get("headers", ()), b"accept-encoding") or b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        stream: Optional[_Stream] = None
+        passthrough = False
+
+        def encoded_headers(message, length: Optional[int]):
+            headers = [(k, v) for k, v in message["headers"]
+                       if k.lower() not in (b"content-length", b"vary", b"etag")]
+            raw = message["headers"]
+            vary = _header(raw, b"vary")
+            headers.append((b"vary", add_vary(vary.decode("latin-1") if vary else None).encode("latin-1")))
+            etag = _header(raw, b"etag")
+            if etag:
+                headers.append((b"etag", weak_etag(etag.decode("latin-1")).encode("latin-1")))
+            headers.append((b"content-encoding", encoding.encode()))
+            if length is not None:
+                headers.append((b"content-length", str(length).encode()))
+            return {**message, "headers": headers}
+
+        async def send_wrapper(message):
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                ctype = _header(headers, b"content-type")
+                if (message["status"] < 200 or message["status"] in (204, 206, 304)
+                        or _header(headers, b"content-encoding") is not None
+                        or ctype is None or not compressible(ctype.decode("latin-1"))):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # wait for the first body chunk to decide
+                    start = {**message, "headers": list(headers)}
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if start is not None:
+                first, start = start, None
+                if not more:
+                    if len(body) < MIN_SIZE:
+                        passthrough = True
+                        await send(first)
+                        await send(message)
+                        return
+                    data = compress(body, encoding)
+                    await send(encoded_headers(first, len(data)))
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                stream = _Stream(encoding)
+                await send(encoded_headers(first, None))
+            data = stream.chunk(body) if body else b""
+            if not more:
+                data += stream.finish()
+            if data or not more:
+                await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
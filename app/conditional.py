@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.responses import JSONResponse, Response
+
+
+# Validators make clients revalidate instead of re-downloading; "no-cache"
+# means "check with the server first", not "do not store".
+REVALIDATE = "no-cache"
+REVALIDATE_PRIVATE = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def body_etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def http_date(dt: datetime) -> str:
+    """RFC 7231 date; naive datetimes are UTC like every timestamp in the models."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+
+@lru_cache(maxsize=None)
+def template_stamp(directory: str) -> str:
+    """Hash of the templates' contents, so a deploy with new markup changes
+    every page's ETag. Computed once per process on first use."""
+    h = hashlib.sha1()
+    for path in sorted(Path(directory).glob("*.html")):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()[:12]
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # weak comparison (RFC 7232 3.2): W/ prefixes are ignored
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def is_fresh(request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """True when the client's cached copy is still current.
+
+    If-None-Match wins when both are sent; If-Modified-Since is compared at
+    one-second resolution, the precision of an HTTP date.
+    """
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return _etag_matches(inm, etag)
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        lm = last_modified if last_modified.tzinfo else last_modified.replace(tzinfo=timezone.utc)
+        return lm.replace(microsecond=0) <= since
+    return False
+
+
+def validators(etag: str, last_modified: Optional[datetime] = None, cache_control: str = REVALIDATE,
+               vary: Optional[str] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if vary:
+        headers["Vary"] = vary
+    return headers
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def _dumps(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(request, data, cache_control: str = REVALIDATE_PRIVATE, dumps=_dumps) -> Response:
+    """JSONResponse with an ETag of its body, or 304 when the client has it.
+
+    The payload is still computed; this saves the transfer, not the query.
+    """
+    body = dumps(data)
+    headers = validators(body_etag(body), cache_control=cache_control)
+    if is_fresh(request, headers["ETag"]):
+        return not_modified(headers)
+    return Response(body, media_type=JSONResponse.media_type, headers=headers)
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import base64
+import csv
+import heapq
+import io
+import json
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterator, Optional
+
+from sqlalchemy import select, and_, or_
+
+from .db import read_engine
+from .models import SpeciesReport, ReportStatus, ReviewAction, User
+from .utils import split_paths
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "geojson": "application/geo+json",
+}
+EXPORT_FETCH_SIZE = 1000
+FLUSH_BYTES = 64 * 1024
+TAX_FIELDS = ("phylum", "class_name", "order_name", "family", "genus")
+CSV_COLUMNS = (
+    "id", "status", "title", "species_name", "description", "location_text", "latitude", "longitude",
+    *TAX_FIELDS, "reporter", "photo_urls", "created_at", "updated_at", "cursor",
+)
+
+
+def encode_cursor(updated_at: datetime, report_id: int) -> str:
+    raw = f"{updated_at.isoformat()}|{report_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("ascii")
+        ts, rid = raw.split("|", 1)
+        return datetime.fromisoformat(ts), int(rid)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def _parse_day(value: str) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"invalid date (expected YYYY-MM-DD): {value}")
+
+
+def _since(filters: dict) -> Optional[tuple[datetime, int]]:
+    return decode_cursor(filters["since"]) if filters.get("since") else None
+
+
+def build_query(filters: dict):
+    """Reports joined with their reporter, in (updated_at, id) order.
+
+    Approved reports only, except with `since`: then every report changed
+    after the cursor, so that those no longer approved can be sent as
+    tombstones. The order is stable and matches the cursor, so an
+    interrupted or incremental pull resumes right after the last row.
+    """
+    R = SpeciesReport
+    stmt = (
+        select(
+            R.id, R.status, R.title, R.species_name, R.description, R.location_text, R.latitude, R.longitude,
+            R.phylum, R.class_name, R.order_name, R.family, R.genus,
+            R.photo_paths, R.created_at, R.updated_at, User.display_name.label("reporter"),
+        )
+        .join(User, User.id == R.reporter_id)
+    )
+    for f in TAX_FIELDS:
+        if filters.get(f):
+            stmt = stmt.where(getattr(R, f) == filters[f])
+    if filters.get("date_from"):
+        stmt = stmt.where(R.created_at >= _parse_day(filters["date_from"]))
+    if filters.get("date_to"):
+        stmt = stmt.where(R.created_at < _parse_day(filters["date_to"]) + timedelta(days=1))
+    since = _since(filters)
+    if since:
+        ts, rid = since
+        stmt = stmt.where(or_(R.updated_at > ts, and_(R.updated_at == ts, R.id > rid)))
+    else:
+        stmt = stmt.where(R.status == ReportStatus.approved.value)
+    return stmt.order_by(R.updated_at.asc(), R.id.asc())
+
+
+def build_deletions(filters: dict):
+    """Reports deleted after the `since` cursor, from the moderation log, in cursor order.
+
+    Their taxa are gone with the row, so filters do not apply to them.
+    """
+    ts, rid = _since(filters)
+    A = ReviewAction
+    return (
+        select(A.report_id, A.created_at)
+        .where(A.action == "delete", or_(A.created_at > ts, and_(A.created_at == ts, A.report_id > rid)))
+        .order_by(A.created_at.asc(), A.report_id.asc())
+    )
+
+
+def _tombstone(report_id: int, status: str, at: datetime) -> dict:
+    return {"id": report_id, "status": status, "updated_at": at.isoformat(), "cursor": encode_cursor(at, report_id)}
+
+
+def iter_records(filters: dict, media_base: str, limit: Optional[int] = None) -> Iterator[dict]:
+    """Yield export records from a server-side cursor, EXPORT_FETCH_SIZE rows at a time.
+
+    With `since`, reports that left the approved set since the cursor come as
+    tombstones, {"id", "status", "updated_at", "cursor"}, with status
+    "pending", "rejected" or "deleted", in the same order as the rest.
+    """
+    with read_engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE)
+        rows = ((row.updated_at, row.id, row) for row in conn.execute(build_query(filters)))
+        if _since(filters):
+            deleted = ((at, rid, None) for rid, at in conn.execute(build_deletions(filters)))
+            rows = heapq.merge(rows, deleted, key=lambda t: t[:2])
+        for at, rid, row in islice(rows, limit or None):
+            if row is None:
+                yield _tombstone(rid, "deleted", at)
+            elif row.status != ReportStatus.approved.value:
+                yield _tombstone(rid, row.status, at)
+            else:
+                yield {
+                    "id": row.id,
+                    "status": row.status,
+                    "title": row.title,
+                    "species_name": row.species_name,
+                    "description": row.description,
+                    "location_text": row.location_text,
+                    "latitude": row.latitude,
+                    "longitude": row.longitude,
+                    **{f: getattr(row, f) for f in TAX_FIELDS},
+                    "reporter": row.reporter,
+                    "photo_urls": [f"{media_base}{p}" for p in split_paths(row.photo_paths)],
+                    "created_at": row.created_at.isoformat(),
+                    "updated_at": row.updated_at.isoformat(),
+                    "cursor": encode_cursor(row.updated_at, row.id),
+                }
+
+
+def _buffered(pieces: Iterator[str]) -> Iterator[bytes]:
+    """Coalesce small strings into ~FLUSH_BYTES chunks for the response body."""
+    buf = io.StringIO()
+    for piece in pieces:
+        buf.write(piece)
+        if buf.tell() >= FLUSH_BYTES:
+            yield buf.getvalue().encode("utf-8")
+            buf = io.StringIO()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _csv_pieces(records: Iterator[dict]) -> Iterator[str]:
+    out = io.StringIO()
+    w = csv.writer(out)
+    w.writerow(CSV_COLUMNS)
+    for rec in records:
+        rec = dict(rec, photo_urls=" ".join(rec.get("photo_urls", ())))
+        w.writerow([rec.get(c) for c in CSV_COLUMNS])
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    yield out.getvalue()
+
+
+def _ndjson_pieces(records: Iterator[dict]) -> Iterator[str]:
+    for rec in records:
+        yield json.dumps(rec, ensure_ascii=False) + "\n"
+
+
+def _geojson_pieces(records: Iterator[dict]) -> Iterator[str]:
+    yield '{"type":"FeatureCollection","features":['
+    first = True
+    for rec in records:
+        geometry = None
+        if rec.get("latitude") is not None and rec.get("longitude") is not None:
+            geometry = {"type": "Point", "coordinates": [rec["longitude"], rec["latitude"]]}
+        feature = {"type": "Feature", "id": rec["id"], "geometry": geometry, "properties": rec}
+        yield ("" if first else ",") + json.dumps(feature, ensure_ascii=False)
+        first = False
+    yield "]}\n"
+
+
+def stream_export(fmt: str, filters: dict, media_base: str, limit: Optional[int] = None) -> Iterator[bytes]:
+    records = iter_records(filters, media_base, limit)
+    pieces = {"csv": _csv_pieces, "ndjson": _ndjson_pieces, "geojson": _geojson_pieces}[fmt](records)
+    return _buffered(pieces)
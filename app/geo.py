@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import csv
+import math
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .models import ReportStatus, SpeciesReport
+from .page_cache import PageCache
+
+
+# Coordinates for reports: submitted by the reporter, or looked up offline in
+# a gazetteer from location_text. On SQLite, approved reports with
+# coordinates are mirrored into an R*Tree (report_geo) by triggers, so every
+# write path (forms, bulk import, scripts) keeps it current and box queries
+# never scan species_reports. Other databases fall back to a plain range
+# query on the columns.
+
+GAZETTEER_PATH = Path(__file__).resolve().parent.parent / "data" / "gazetteer.csv"
+# optional larger gazetteer: a GeoNames dump such as cities15000.txt
+EXTRA_GAZETTEER = os.environ.get("KOMODO_GAZETTEER")
+RTREE_TABLE = "report_geo"
+EARTH_RADIUS_KM = 6371.0088
+MAX_RADIUS_KM = 500.0
+# nearby(): first search radius, floor when narrowing, and rows read per round
+NEARBY_START_KM = 2.0
+NEARBY_MIN_KM = 0.05
+NEARBY_CANDIDATES = 5000
+TILE_GRID = 8  # clusters per tile side
+# zooms up to this one cluster from the per-cell rollup instead of the points
+ROLLUP_MAX_ZOOM = 4
+# rollup cell size in degrees; well under a z4 cluster cell (about 2.8 x 1.4-2.8)
+ROLLUP_CELL_DEG = 0.5
+CELLS_TABLE = "report_geo_cells"
+# bump when the DDL below changes, so startup applies it to existing databases
+INDEX_VERSION = "2"
+MAX_ZOOM = 22
+tile_cache = PageCache(int(float(os.environ.get("KOMODO_TILE_CACHE_MB", "8")) * 1024 * 1024))
+
+_NGRAM_MAX = 4
+# gazetteer kinds, most specific first; a more specific match wins a tie
+KIND_RANK = {"city": 0, "park": 0, "place": 0, "region": 1, "country": 2}
+
+
+def _norm(s: str) -> str:
+    s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(re.findall(r"[a-z0-9]+", s))
+
+
+@lru_cache(maxsize=1)
+def gazetteer() -> Dict[str, Tuple[float, float, str]]:
+    """Normalised place name -> (lat, lon, kind), loaded once per process."""
+    names: Dict[str, Tuple[float, float, str]] = {}
+    with open(GAZETTEER_PATH, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            entry = (float(row["lat"]), float(row["lon"]), row["kind"])
+            for name in [row["name"], *filter(None, row["alt_names"].split("|"))]:
+                names.setdefault(_norm(name), entry)
+    if EXTRA_GAZETTEER:
+        _load_geonames(Path(EXTRA_GAZETTEER), names)
+    return names
+
+
+def _load_geonames(path: Path, names: Dict[str, Tuple[float, float, str]]) -> None:
+    """Add a GeoNames tab-separated dump; the most populous place keeps a shared name."""
+    population: Dict[str, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 15:
+                continue
+            pop = int(cols[14] or 0)
+            entry = (float(cols[4]), float(cols[5]), "place")
+            for name in {cols[1], cols[2]}:
+                key = _norm(name)
+                if not key:
+                    continue
+                # bundled names stay; among GeoNames places the larger one wins
+                if key not in names or (key in population and pop > population[key]):
+                    names[key] = entry
+                    population[key] = pop
+
+
+def geocode(location_text: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Best offline match for free text such as "Komodo NP, Indonesia".
+
+    The whole text and each comma-separated part are looked up, then runs
+    of up to four words anywhere in the text. Parks and cities win over
+    regions over countries; among equals, the earlier and longer match wins.
+    """
+    if not location_text:
+        return None
+    names = gazetteer()
+    whole = _norm(location_text)
+    if whole in names:
+        return names[whole][:2]
+    candidates = [_norm(part) for part in location_text.split(",")]
+    words = whole.split()
+    for n in range(min(_NGRAM_MAX, len(words)), 0, -1):
+        candidates.extend(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+    best = None
+    for key in candidates:
+        hit = names.get(key)
+        if hit and (best is None or KIND_RANK.get(hit[2], 0) < KIND_RANK.get(best[2], 0)):
+            best = hit
+    return best[:2] if best else None
+
+
+def parse_coords(lat, lon) -> Optional[Tuple[float, float]]:
+    """Submitted coordinates as floats; None if both are empty.
+
+    Raises ValueError for a half-filled pair or values off the globe.
+    """
+    lat = "" if lat is None else str(lat).strip()
+    lon = "" if lon is None else str(lon).strip()
+    if not lat and not lon:
+        return None
+    try:
+        la, lo = float(lat), float(lon)
+    except ValueError:
+        raise ValueError("Latitude and longitude must both be numbers")
+    if not (-90 <= la <= 90 and -180 <= lo <= 180):
+        raise ValueError("Coordinates out of range")
+    return round(la, 6), round(lo, 6)
+
+
+def locate(location_text: Optional[str], lat=None, lon=None) -> dict:
+    """latitude/longitude/geo_source values for a report; submitted coordinates win."""
+    coords = parse_coords(lat, lon)
+    if coords:
+        return {"latitude": coords[0], "longitude": coords[1], "geo_source": "submitted"}
+    coords = geocode(location_text)
+    if coords:
+        return {"latitude": coords[0], "longitude": coords[1], "geo_source": "gazetteer"}
+    return {"latitude": None, "longitude": None, "geo_source": None}
+
+
+# --- index -----------------------------------------------------------------
+
+_APPROVED = f"'{ReportStatus.approved.value}'"
+RTREE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    f"""CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_ai AFTER INSERT ON species_reports
+    WHEN NEW.status = {_APPROVED} AND NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL
+    BEGIN
+      INSERT OR REPLACE INTO {RTREE_TABLE} VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_au AFTER UPDATE OF status, latitude, longitude ON species_reports
+    BEGIN
+      DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+      INSERT INTO {RTREE_TABLE} SELECT NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude
+        WHERE NEW.status = {_APPROVED} AND NEW.latitude IS NOT NULL AND NEW.longitude IS NOT NULL;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_ad AFTER DELETE ON species_reports
+    BEGIN
+      DELETE FROM {RTREE_TABLE} WHERE id = OLD.id;
+    END""",
+]
+
+# Low-zoom tiles cover too many reports to group per point, so approved
+# reports are also counted per ROLLUP_CELL_DEG cell (report_geo_cells), with
+# coordinate and id sums for the mean position and the id of a cell's only
+# report. Triggers keep it current on every write path, like the R*Tree; a
+# tile at ROLLUP_MAX_ZOOM or below then groups at most 720 x 360 cells.
+def _counted(r: str) -> str:
+    return f"{r}.status = {_APPROVED} AND {r}.latitude IS NOT NULL AND {r}.longitude IS NOT NULL"
+
+
+def _cell(r: str) -> Tuple[str, str]:
+    return (f"CAST(({r}.longitude + 180.0) / {ROLLUP_CELL_DEG} AS INTEGER)",
+            f"CAST(({r}.latitude + 90.0) / {ROLLUP_CELL_DEG} AS INTEGER)")
+
+
+def _cell_add(r: str) -> str:
+    return (f"INSERT INTO {CELLS_TABLE} (cx, cy, n, sum_lat, sum_lon, sum_id) "
+            f"SELECT {', '.join(_cell(r))}, 1, {r}.latitude, {r}.longitude, {r}.id WHERE {_counted(r)} "
+            "ON CONFLICT (cx, cy) DO UPDATE SET n = n + 1, sum_lat = sum_lat + excluded.sum_lat, "
+            "sum_lon = sum_lon + excluded.sum_lon, sum_id = sum_id + excluded.sum_id;")
+
+
+def _cell_remove(r: str) -> str:
+    cx, cy = _cell(r)
+    return (f"UPDATE {CELLS_TABLE} SET n = n - 1, sum_lat = sum_lat - {r}.latitude, "
+            f"sum_lon = sum_lon - {r}.longitude, sum_id = sum_id - {r}.id "
+            f"WHERE cx = {cx} AND cy = {cy} AND {_counted(r)};")
+
+
+CELLS_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {CELLS_TABLE} (
+      cx INTEGER NOT NULL, cy INTEGER NOT NULL, n INTEGER NOT NULL,
+      sum_lat REAL NOT NULL, sum_lon REAL NOT NULL, sum_id INTEGER NOT NULL,
+      PRIMARY KEY (cx, cy))""",
+    f"""CREATE TRIGGER IF NOT EXISTS {CELLS_TABLE}_ai AFTER INSERT ON species_reports
+    BEGIN
+      {_cell_add("NEW")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {CELLS_TABLE}_au AFTER UPDATE OF status, latitude, longitude ON species_reports
+    BEGIN
+      {_cell_remove("OLD")}
+      {_cell_add("NEW")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {CELLS_TABLE}_ad AFTER DELETE ON species_reports
+    BEGIN
+      {_cell_remove("OLD")}
+    END""",
+]
+
+
+def ensure_index(conn: Connection) -> bool:
+    """Create the R*Tree, the cell rollup and their triggers (SQLite only),
+    filling each when new.
+
+    Returns False when the database has no R*Tree support; queries then use
+    the fallback.
+    """
+    if conn.dialect.name != "sqlite":
+        return False
+    def exists(name):
+        return conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {"n": name}).scalar()
+
+    had_rtree, had_cells = exists(RTREE_TABLE), exists(CELLS_TABLE)
+    for ddl in RTREE_DDL + CELLS_DDL:
+        conn.execute(text(ddl))
+    if not had_rtree:
+        conn.execute(text(
+            f"INSERT OR REPLACE INTO {RTREE_TABLE} SELECT r.id, r.latitude, r.latitude, r.longitude, r.longitude "
+            f"FROM species_reports r WHERE {_counted('r')}"
+        ))
+    if not had_cells:
+        conn.execute(text(
+            f"INSERT INTO {CELLS_TABLE} (cx, cy, n, sum_lat, sum_lon, sum_id) "
+            f"SELECT {', '.join(_cell('r'))}, COUNT(*), SUM(r.latitude), SUM(r.longitude), SUM(r.id) "
+            f"FROM species_reports r WHERE {_counted('r')} GROUP BY 1, 2"
+        ))
+    return True
+
+
+_has_table: Dict[Tuple[str, str], bool] = {}
+
+
+def _has(db: Session, table: str) -> bool:
+    bind = db.get_bind()
+    key = (str(bind.url), table)
+    if key not in _has_table:
+        _has_table[key] = bind.dialect.name == "sqlite" and bool(db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :n"), {"n": table}).scalar())
+    return _has_table[key]
+
+
+def has_rtree(db: Session) -> bool:
+    return _has(db, RTREE_TABLE)
+
+
+# --- queries ---------------------------------------------------------------
+
+def _boxes(south: float, west: float, north: float, east: float) -> List[Tuple[float, float, float, float]]:
+    """The box, split in two when it crosses the antimeridian (west > east)."""
+    if west <= east:
+        return [(south, west, north, east)]
+    return [(south, west, north, 180.0), (south, -180.0, north, east)]
+
+
+def points_in(db: Session, south: float, west: float, north: float, east: float,
+              limit: Optional[int] = None) -> List[Tuple[int, float, float]]:
+    """(id, lat, lon) of approved reports inside the box."""
+    out: List[Tuple[int, float, float]] = []
+    for s, w, n, e in _boxes(south, west, north, east):
+        if has_rtree(db):
+            rows = db.execute(text(
+                f"SELECT id, min_lat, min_lon FROM {RTREE_TABLE} "
+                "WHERE min_lat >= :s AND max_lat <= :n AND min_lon >= :w AND max_lon <= :e"
+                + (" LIMIT :lim" if limit else "")
+            ), {"s": s, "n": n, "w": w, "e": e, "lim": limit}).all()
+        else:
+            R = SpeciesReport
+            stmt = select(R.id, R.latitude, R.longitude).where(
+                R.status == ReportStatus.approved.value,
+                R.latitude.between(s, n), R.longitude.between(w, e))
+            rows = db.execute(stmt.limit(limit) if limit else stmt).all()
+        out.extend((r[0], r[1], r[2]) for r in rows)
+    return out[:limit] if limit else out
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    if south <= -90.0 or north >= 90.0:
+        return south, -180.0, north, 180.0
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(lat))))
+    if dlon >= 180.0:
+        return south, -180.0, north, 180.0
+    west, east = lon - dlon, lon + dlon
+    # wrap; _boxes splits a box that crosses the antimeridian
+    return south, (west + 540.0) % 360.0 - 180.0, north, (east + 540.0) % 360.0 - 180.0
+
+
+def nearby(db: Session, lat: float, lon: float, radius_km: float, limit: int) -> List[Tuple[int, float]]:
+    """(id, distance km) of approved reports within the radius, nearest first.
+
+    Searches outward: a small circle first, widened until it holds `limit`
+    reports or reaches the radius. Each round reads at most NEARBY_CANDIDATES
+    rows of its box from the index; a box with more than that is too wide
+    and is narrowed instead. So a dense region costs a few small index reads,
+    never the whole 500 km box.
+    """
+    lo, hi = 0.0, None  # radii known to hold too few / too many reports
+    r = min(radius_km, NEARBY_START_KM)
+    while True:
+        candidates = points_in(db, *radius_box(lat, lon, r), limit=NEARBY_CANDIDATES)
+        if len(candidates) >= NEARBY_CANDIDATES and r - lo > NEARBY_MIN_KM:
+            hi, r = r, (lo + r) / 2
+            continue
+        # every report within r is among the candidates, so these are exact
+        hits = []
+        for rid, la, ln in candidates:
+            d = haversine_km(lat, lon, la, ln)
+            if d <= r:
+                hits.append((d, rid))
+        if len(hits) >= limit or r >= radius_km or (hi is not None and hi - r <= NEARBY_MIN_KM):
+            break
+        lo = r
+        # grow by the density seen so far, at least doubling, staying below an overfull radius
+        factor = math.sqrt(limit / len(hits)) * 1.2 if hits else 4.0
+        r = min(radius_km, r * max(2.0, factor))
+        if hi is not None:
+            r = min(r, (lo + hi) / 2)
+    hits.sort()
+    return [(rid, round(d, 3)) for d, rid in hits[:limit]]
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of a Web Mercator (XYZ) tile."""
+    n = 2 ** z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat(y + 1), x / n * 360.0 - 180.0, lat(y), (x + 1) / n * 360.0 - 180.0
+
+
+def tile_clusters(db: Session, z: int, x: int, y: int, grid: int = TILE_GRID) -> List[dict]:
+    """Approved reports in a tile, grouped into grid x grid cells.
+
+    Each cluster has its count and mean position; a single report also
+    carries its id. Above ROLLUP_MAX_ZOOM the grouping reads every report in
+    the tile from the index, which stays cheap because such a tile is small.
+    At or below it (on SQLite) it reads the per-cell rollup instead: each
+    ROLLUP_CELL_DEG cell falls in the tile and cluster of its mean position,
+    so cost is bounded by the cells, not the reports.
+    """
+    south, west, north, east = tile_bounds(z, x, y)
+    dlat, dlon = (north - south) / grid, (east - west) / grid
+    params = {"s": south, "n": north, "w": west, "e": east, "dlat": dlat, "dlon": dlon, "g": grid - 1}
+    if z <= ROLLUP_MAX_ZOOM and _has(db, CELLS_TABLE):
+        return _rollup_clusters(db, params)
+    if has_rtree(db):
+        source, lat, lon = RTREE_TABLE, "min_lat", "min_lon"
+        where = "min_lat >= :s AND max_lat < :n AND min_lon >= :w AND max_lon < :e"
+    else:
+        source, lat, lon = "species_reports", "latitude", "longitude"
+        where = (f"status = {_APPROVED} AND latitude >= :s AND latitude < :n "
+                 "AND longitude >= :w AND longitude < :e")
+    if db.get_bind().dialect.name == "sqlite":
+        cell = "MIN(CAST(({}) AS INTEGER), :g)"  # non-negative, so CAST truncates like FLOOR
+    else:
+        cell = "LEAST(CAST(FLOOR({}) AS INTEGER), :g)"
+    rows = db.execute(text(
+        f"SELECT {cell.format(f'({lon} - :w) / :dlon')} AS cx, "
+        f"{cell.format(f'(:n - {lat}) / :dlat')} AS cy, "
+        f"COUNT(*) AS n, AVG({lat}) AS lat, AVG({lon}) AS lon, MIN(id) AS id "
+        f"FROM {source} WHERE {where} GROUP BY cx, cy"
+    ), params).all()
+    return [
+        {"lat": round(r.lat, 4), "lon": round(r.lon, 4), "count": r.n, **({"id": r.id} if r.n == 1 else {})}
+        for r in rows
+    ]
+
+
+def _rollup_clusters(db: Session, params: dict) -> List[dict]:
+    d = ROLLUP_CELL_DEG
+    params = {**params,
+              "cx0": int((params["w"] + 180.0) // d), "cx1": int((params["e"] + 180.0) // d),
+              "cy0": int((params["s"] + 90.0) // d), "cy1": int((params["n"] + 90.0) // d)}
+    cell = "MIN(CAST(({}) AS INTEGER), :g)"
+    rows = db.execute(text(
+        f"SELECT {cell.format('(lon - :w) / :dlon')} AS cx, {cell.format('(:n - lat) / :dlat')} AS cy, "
+        "SUM(n) AS n, SUM(sum_lat) / SUM(n) AS lat, SUM(sum_lon) / SUM(n) AS lon, SUM(sum_id) AS id "
+        "FROM (SELECT n, sum_lat, sum_lon, sum_id, sum_lat / n AS lat, sum_lon / n AS lon "
+        f"      FROM {CELLS_TABLE} WHERE cx BETWEEN :cx0 AND :cx1 AND cy BETWEEN :cy0 AND :cy1 AND n > 0) "
+        "WHERE lat >= :s AND lat < :n AND lon >= :w AND lon < :e GROUP BY 1, 2"
+    ), params).all()
+    return [
+        {"lat": round(r.lat, 4), "lon": round(r.lon, 4), "count": r.n, **({"id": r.id} if r.n == 1 else {})}
+        for r in rows
+    ]
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, or_, select, update, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import Job
+
+
+# Durable background jobs in the app database. Handlers enqueue in their own
+# transaction, so a job exists exactly when the change that asked for it was
+# committed. Every app process runs a few worker threads; a job is claimed
+# with a conditional UPDATE and a lease, so several processes can share the
+# table and a job whose worker died is picked up again when the lease runs out.
+# Handlers must therefore be safe to run more than once.
+
+WORKERS = int(os.environ.get("KOMODO_JOB_WORKERS", "2"))
+POLL_SECONDS = float(os.environ.get("KOMODO_JOB_POLL_S", "1.0"))
+LEASE_SECONDS = 5 * 60
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 10 * 60
+# finished jobs (and their idempotency keys) are kept this long for inspection
+KEEP_DAYS = int(os.environ.get("KOMODO_JOB_KEEP_DAYS", "7"))
+PRUNE_INTERVAL_SECONDS = 60 * 60
+
+STATUSES = ("queued", "running", "done", "failed")
+
+_handlers: Dict[str, Callable[[dict], object]] = {}
+_wake = threading.Event()
+_stop = threading.Event()
+_threads: List[threading.Thread] = []
+_pruned_at = 0.0
+
+
+class PermanentError(Exception):
+    """Raised by a handler when retrying cannot help; the job fails at once."""
+
+
+def handler(kind: str):
+    """Register the function that runs jobs of `kind`.
+
+    It receives the decoded payload and may return a JSON-serialisable result.
+    """
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(db: Session, kind: str, payload: Optional[dict] = None, key: Optional[str] = None,
+            priority: int = 0, delay: float = 0, max_attempts: int = MAX_ATTEMPTS) -> Job:
+    """Add a job to the caller's transaction; it becomes visible on commit.
+
+    With `key`, a job already recorded under that key is returned instead of
+    adding another one; if that job had failed, it is queued again. Workers
+    in this process are woken once the transaction commits.
+    """
+    if key is not None:
+        existing = find(db, key)
+        if existing is not None:
+            if existing.status == "failed":
+                requeue(db, existing)
+            return existing
+    job = Job(kind=kind, payload=json.dumps(payload or {}, ensure_ascii=False), priority=priority,
+              max_attempts=max_attempts, idempotency_key=key,
+              run_after=datetime.utcnow() + timedelta(seconds=delay))
+    try:
+        with db.begin_nested():
+            db.add(job)
+    except IntegrityError:
+        # another request enqueued the same key first
+        return db.execute(select(Job).where(Job.idempotency_key == key)).scalar_one()
+    event.listen(db, "after_commit", lambda session: _wake.set(), once=True)
+    return job
+
+
+def requeue(db: Session, job: Job) -> None:
+    """Run a finished job again, with fresh attempts, in the caller's transaction."""
+    job.status, job.attempts, job.run_after = "queued", 0, datetime.utcnow()
+    event.listen(db, "after_commit", lambda session: _wake.set(), once=True)
+
+
+def find(db: Session, key: str) -> Optional[Job]:
+    return db.execute(select(Job).where(Job.idempotency_key == key)).scalar_one_or_none()
+
+
+def result(job: Job):
+    return json.loads(job.result) if job.result else None
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before retry number `attempts`: exponential, capped, with jitter."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(Job.status == "queued", Job.run_after <= now),
+        # the worker holding it died or hung
+        and_(Job.status == "running", Job.locked_until < now),
+    )
+
+
+def claim(db: Session, worker: str) -> Optional[Job]:
+    """Lease the most urgent runnable job to `worker`, or None.
+
+    The candidate is read first so an idle queue costs a read, not a write
+    lock; the UPDATE re-checks it, so a job claimed by another process in
+    between is simply skipped.
+    """
+    now = datetime.utcnow()
+    job_id = db.execute(
+        select(Job.id).where(_claimable(now))
+        .order_by(Job.priority.desc(), Job.run_after.asc(), Job.id.asc()).limit(1)
+    ).scalar()
+    if job_id is None:
+        db.rollback()
+        return None
+    claimed = db.execute(
+        update(Job).where(Job.id == job_id, _claimable(now))
+        .values(status="running", locked_by=worker, locked_until=now + timedelta(seconds=LEASE_SECONDS),
+                attempts=Job.attempts + 1, updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return None
+    return db.get(Job, job_id, populate_existing=True)
+
+
+def _finish(db: Session, job_id: int, worker: str, **values) -> None:
+    # only the lease holder may record the outcome
+    db.execute(
+        update(Job).where(Job.id == job_id, Job.locked_by == worker)
+        .values(locked_by=None, locked_until=None, updated_at=datetime.utcnow(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def run_one(db: Session, worker: str) -> bool:
+    """Claim and run a single job; False when nothing was runnable."""
+    from . import metrics
+
+    job = claim(db, worker)
+    if job is None:
+        return False
+    job_id, kind, attempts, max_attempts = job.id, job.kind, job.attempts, job.max_attempts
+    fn = _handlers.get(kind)
+    t0 = time.perf_counter()
+    try:
+        if fn is None:
+            raise PermanentError(f"no handler for job kind {kind!r}")
+        out = fn(json.loads(job.payload or "{}"))
+    except Exception as exc:
+        db.rollback()
+        error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+        if isinstance(exc, PermanentError) or attempts >= max_attempts:
+            _finish(db, job_id, worker, status="failed", last_error=error)
+            outcome = "failed"
+        else:
+            retry_at = datetime.utcnow() + timedelta(seconds=backoff(attempts))
+            _finish(db, job_id, worker, status="queued", last_error=error, run_after=retry_at)
+            outcome = "retry"
+    else:
+        _finish(db, job_id, worker, status="done", last_error=None,
+                result=json.dumps(out, ensure_ascii=False) if out is not None else None)
+        outcome = "done"
+    metrics.JOBS.inc(1, kind, outcome)
+    metrics.JOB_DURATION.observe(time.perf_counter() - t0, kind)
+    return True
+
+
+def run_pending(limit: int = 1000) -> int:
+    """Run runnable jobs in the calling thread until none are left (or `limit`).
+
+    For scripts and checks that need the queue drained without workers.
+    """
+    from .db import SessionLocal
+
+    done = 0
+    with SessionLocal() as db:
+        while done < limit and run_one(db, f"{_worker_prefix()}-inline"):
+            done += 1
+    return done
+
+
+def prune(db: Session, keep_days: int = KEEP_DAYS) -> int:
+    cutoff = datetime.utcnow() - timedelta(days=keep_days)
+    n = db.execute(
+        delete(Job).where(Job.status.in_(("done", "failed")), Job.updated_at < cutoff)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return n or 0
+
+
+def retry(db: Session, job_id: int) -> bool:
+    """Queue a failed job again with a fresh set of attempts."""
+    n = db.execute(
+        update(Job).where(Job.id == job_id, Job.status == "failed")
+        .values(status="queued", attempts=0, run_after=datetime.utcnow(), updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if n:
+        _wake.set()
+    return bool(n)
+
+
+def counts(db: Session) -> Dict[str, Dict[str, int]]:
+    """{kind: {status: n}} over the whole table."""
+    out: Dict[str, Dict[str, int]] = {}
+    for kind, status, n in db.execute(select(Job.kind, Job.status, func.count()).group_by(Job.kind, Job.status)):
+        out.setdefault(kind, {})[status] = n
+    return out
+
+
+def to_dict(job: Job, full: bool = False) -> dict:
+    d = {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "key": job.idempotency_key,
+        "run_after": job.run_after.isoformat() if job.run_after else None,
+        "locked_by": job.locked_by,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        "last_error": (job.last_error or "").splitlines()[-1] if job.last_error and not full else job.last_error,
+    }
+    if full:
+        d["payload"] = json.loads(job.payload) if job.payload else None
+        d["result"] = result(job)
+    return d
+
+
+# --- worker pool -----------------------------------------------------------
+
+def _worker_prefix() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _work(name: str) -> None:
+    global _pruned_at
+    from .db import SessionLocal
+
+    while not _stop.is_set():
+        try:
+            with SessionLocal() as db:
+                if time.monotonic() - _pruned_at > PRUNE_INTERVAL_SECONDS:
+                    _pruned_at = time.monotonic()
+                    prune(db)
+                while not _stop.is_set() and run_one(db, name):
+                    pass
+        except Exception:
+            # database busy or unavailable; try again on the next poll
+            traceback.print_exc()
+        _wake.wait(POLL_SECONDS)
+        _wake.clear()
+
+
+def start(n: int = WORKERS) -> int:
+    """Start `n` worker threads in this process, unless they already run."""
+    alive = [t for t in _threads if t.is_alive()]
+    if alive or n <= 0:
+        return len(alive)
+    _stop.clear()
+    _threads[:] = []
+    prefix = _worker_prefix()
+    for i in range(n):
+        t = threading.Thread(target=_work, args=(f"{prefix}-{i}",), name=f"komodo-jobs-{i}", daemon=True)
+        t.start()
+        _threads.append(t)
+    return n
+
+
+def stop(timeout: float = 10.0) -> None:
+    """Let running jobs finish and stop the workers; queued jobs stay queued."""
+    _stop.set()
+    _wake.set()
+    deadline = time.monotonic() + timeout
+    for t in _threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+    _threads[:] = [t for t in _threads if t.is_alive()]
+
+
+def workers_alive() -> int:
+    return sum(1 for t in _threads if t.is_alive())
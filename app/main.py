@@ -1,28 +1,48 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta
 from pathlib import Path
+import logging
+import os
 import sys
+import threading
+import time
 from typing import Optional, List
+from urllib.parse import urlencode
 
 from fastapi import Depends, FastAPI, Form, HTTPException, Request, UploadFile
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse, PlainTextResponse, Response
 import json
-import requests
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from sqlalchemy import select, or_, case
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
 
-from .db import engine, get_db
-from .models import Base, User, SpeciesReport, ReportStatus, PointsLedger, Donation, DailySignin, QuestLog, ShopItem, Redemption
+from .db import engine, SessionLocal, get_db, get_read_db, get_async_db, get_async_read_db, async_engines
+from .models import Base, User, SpeciesReport, ReportStatus, PointsLedger, Donation, DailySignin, QuestLog, ShopItem, Redemption, ReviewAction, AppMeta, Job
+from . import moderation, user_stats, bulk_import, export, metrics, page_cache, conditional, compression, api_v1, jobs, geo, photo_hash, taxon_stats
+from .query_trace import QueryTraceMiddleware
+from . import profiling
+from .template_cache import make_bytecode_cache
 from .security import hash_password, verify_password
-from .utils import MEDIA_ROOT, ensure_media_dirs, save_upload, join_paths, split_paths, delete_media_list
+from .utils import MEDIA_ROOT, ensure_media_dirs, save_upload, join_paths, split_paths, remove_media
 import json as _json
 
 
 app = FastAPI(title="Komodo Hub Lite")
+# endpoints can run under the per-request profiler (?_profile=1, admins only)
+app.router.route_class = profiling.ProfilingRoute
+# added before SessionMiddleware so it runs inside it and can read the session
+app.add_middleware(profiling.ProfilingMiddleware)
 app.add_middleware(SessionMiddleware, secret_key="dev-secret-change-me")
+if compression.ENABLED:
+    # inside the metrics middleware, so response sizes are bytes on the wire
+    app.add_middleware(compression.CompressionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(QueryTraceMiddleware)
 
 
 # Resolve base dir for templates both in dev and frozen bundle
@@ -35,9 +55,15 @@ def _base_dir() -> Path:
 BASE_DIR = _base_dir()
 TEMPLATES_DIR = BASE_DIR / "templates"
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+# compiled templates persist across launches (the frozen build otherwise recompiles every start)
+templates.env.bytecode_cache = make_bytecode_cache(TEMPLATES_DIR)
 DATA_DIR = BASE_DIR.parent / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
-TAX_CACHE_PATH = DATA_DIR / "tax_cache.json"
+TAX_CACHE_PATH = Path(os.environ.get("KOMODO_TAX_CACHE") or DATA_DIR / "tax_cache.json")
+# overridable so benchmarks and tests can point lookups at a local stand-in
+WIKIDATA_SPARQL_URL = os.environ.get("KOMODO_WIKIDATA_URL", "https://query.wikidata.org/sparql")
+# seconds a "not found" lookup is served before the name is looked up again
+TAXONOMY_NEGATIVE_TTL = int(os.environ.get("KOMODO_TAXONOMY_NEGATIVE_TTL", "600"))
 
 POINTS_PER_CNY = 10
 SIGNIN_POINTS = 5
@@ -114,35 +140,201 @@ QUEST_CONFIG = {
 }
 
 
+# Bump when _ensure_seed_shop() changes what it writes
+SEED_VERSION = "1"
+
+
+def _bootstrap_fingerprint() -> str:
+    """Hash of the declared schema plus the seed version.
+
+    Any new table, column or index changes it, so bootstrap reruns exactly
+    when there is something new to apply.
+    """
+    import hashlib
+
+    parts = [SEED_VERSION]
+    for t in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        parts.append(t.name)
+        parts.extend(sorted(c.name for c in t.columns))
+        parts.extend(sorted(i.name or "" for i in t.indexes))
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _meta_get(key: str) -> str | None:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(AppMeta.value).where(AppMeta.key == key)).scalar()
+    except Exception:
+        # table missing on a fresh database
+        return None
+
+
+def _meta_set(key: str, value: str) -> None:
+    with engine.begin() as conn:
+        updated = conn.execute(
+            AppMeta.__table__.update().where(AppMeta.key == key).values(value=value, updated_at=datetime.utcnow())
+        ).rowcount
+        if not updated:
+            conn.execute(AppMeta.__table__.insert().values(key=key, value=value, updated_at=datetime.utcnow()))
+
+
+def bootstrap() -> None:
+    """Create tables, apply simple migrations and seed data, unless already recorded.
+
+    create_all + migrations + seeding are idempotent but cost a dozen queries;
+    skip them once this exact schema has been bootstrapped.
+    """
+    ensure_media_dirs()
+    fingerprint = _bootstrap_fingerprint()
+    if _meta_get("bootstrap") != fingerprint:
+        Base.metadata.create_all(bind=engine)
+        complete = _ensure_schema()
+        _ensure_seed_shop()
+        with SessionLocal() as db:
+            # counts approved reports once when the rollup tables are new
+            taxon_stats.ensure_built(db)
+        # a failed migration is retried on the next start instead of being skipped for good
+        if complete:
+            _meta_set("bootstrap", fingerprint)
+    # optional, so tracked apart from the fingerprint: its absence never blocks bootstrap
+    spatial = f"{fingerprint}/{geo.INDEX_VERSION}"
+    if _meta_get("spatial_index") != spatial and _ensure_spatial_index():
+        _meta_set("spatial_index", spatial)
+
+
 # Create tables and media dirs on startup
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
-    ensure_media_dirs()
-    _ensure_schema()
-    _ensure_seed_shop()
+    bootstrap()
+    # background job workers (KOMODO_JOB_WORKERS, 0 = none in this process)
+    jobs.start()
+    app.state.ready = True
 
 
-def _ensure_schema():
-    """Ensure new taxonomy columns exist (SQLite simple migration)."""
-    from sqlalchemy import text
+@app.on_event("startup")
+async def _configure_threadpool():
+    # sync routes run on anyio's default limiter (40 threads); run_backend.py --threads sets this
+    size = os.environ.get("KOMODO_THREADPOOL")
+    if size and size.isdigit() and int(size) > 0:
+        import anyio.to_thread
+        anyio.to_thread.current_default_thread_limiter().total_tokens = int(size)
+
+
+@app.on_event("shutdown")
+def _stop_jobs():
+    # running jobs finish; queued ones wait for the next start
+    jobs.stop()
+
+
+@app.on_event("shutdown")
+async def _dispose_async_engines():
+    if async_engines.cache_info().currsize:
+        write, read = async_engines()
+        await write.dispose()
+        if read is not write:
+            await read.dispose()
+
+
+@app.get("/metrics")
+async def metrics_endpoint(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    """Prometheus text format. Admin session, or `Authorization: Bearer $KOMODO_METRICS_TOKEN` for scrapers."""
+    import hmac
+
+    token = os.environ.get("KOMODO_METRICS_TOKEN")
+    auth = request.headers.get("authorization", "")
+    if not (token and hmac.compare_digest(auth, f"Bearer {token}")):
+        require_admin(await get_current_user_async(request, db))
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    """Stored reports from ?_profile=1 requests and sampling sessions, newest first."""
+    require_admin(await get_current_user_async(request, db))
+    d = profiling.profiles_dir()
+    files = sorted(d.glob("*.txt"), reverse=True) + sorted(d.glob("*.collapsed"), reverse=True)
+    return JSONResponse([{"name": f.stem, "kind": f.suffix[1:], "bytes": f.stat().st_size} for f in files])
+
+
+@app.get("/admin/profiles/{name}")
+async def get_profile(request: Request, name: str, raw: int = 0, db: AsyncSession = Depends(get_async_read_db)):
+    """Text call tree; raw=1 downloads the .prof file (snakeviz, pstats) instead."""
+    from fastapi.responses import FileResponse
+
+    require_admin(await get_current_user_async(request, db))
+    d = profiling.profiles_dir()
+    if name != profiling._safe_name(name):
+        raise HTTPException(404)
+    for path in ((d / f"{name}.prof",) if raw else (d / f"{name}.txt", d / f"{name}.collapsed")):
+        if path.exists():
+            if raw:
+                return FileResponse(path, filename=path.name)
+            return PlainTextResponse(path.read_text(encoding="utf-8"))
+    raise HTTPException(404)
+
+
+@app.post("/admin/profile/sample")
+async def sample_profile(request: Request, seconds: float = 10, interval_ms: float = 5,
+                         db: AsyncSession = Depends(get_async_read_db)):
+    """Sample every thread's stack for a window and aggregate across all requests."""
+    import asyncio
+
+    require_admin(await get_current_user_async(request, db))
+    if profiling.StackSampler.busy():
+        return JSONResponse({"error": "a sampling session is already running"}, status_code=409)
+    seconds = max(1.0, min(seconds, 120.0))
+    sampler = profiling.StackSampler(max(1.0, interval_ms) / 1000.0)
+    # own thread, not the threadpool: it should not take capacity from requests
+    t = threading.Thread(target=sampler.run, args=(seconds,), name="komodo-sampler", daemon=True)
+    t.start()
+    while t.is_alive():
+        await asyncio.sleep(0.1)
+    name = await run_in_threadpool(sampler.save)
+    return JSONResponse({"name": name, "samples": sampler.samples, "top": sampler.top()})
+
+
+@app.get("/healthz")
+def healthz():
+    """Cheap readiness probe for the desktop shell and load balancers."""
+    if not getattr(app.state, "ready", False):
+        return JSONResponse({"status": "starting"}, status_code=503)
+    try:
+        from sqlalchemy import text
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception:
+        return JSONResponse({"status": "db_unavailable"}, status_code=503)
+    return JSONResponse({"status": "ok"})
 
-    cols_needed = [
-        ("phylum", "TEXT"),
-        ("class_name", "TEXT"),
-        ("order_name", "TEXT"),
-        ("family", "TEXT"),
-        ("genus", "TEXT"),
-    ]
-    with engine.begin() as conn:
-        try:
-            existing = {row[1] for row in conn.execute(text("PRAGMA table_info(species_reports)"))}
-            for col, typ in cols_needed:
-                if col not in existing:
-                    conn.execute(text(f"ALTER TABLE species_reports ADD COLUMN {col} {typ}"))
-        except Exception:
-            # Best-effort on non-sqlite or errors; ignore in demo
-            pass
+
+def _ensure_schema() -> bool:
+    """Add columns introduced after the first release and any missing indexes.
+
+    Returns False if that failed; the error is logged and
+    scripts/repair_db.py reports the details.
+    """
+    from .schema import add_missing_columns, SPECIES_REPORT_COLUMNS
+
+    try:
+        with engine.begin() as conn:
+            add_missing_columns(conn, SpeciesReport.__table__, SPECIES_REPORT_COLUMNS)
+            # create_all only indexes new tables
+            for idx in SpeciesReport.__table__.indexes:
+                idx.create(conn, checkfirst=True)
+    except Exception:
+        logging.getLogger("komodo").exception("schema migration failed; retrying on next start")
+        return False
+    return True
+
+
+def _ensure_spatial_index() -> bool:
+    """Create the R*Tree and cell rollup; False where unavailable (spatial queries use the fallback)."""
+    try:
+        with engine.begin() as conn:
+            return geo.ensure_index(conn)
+    except Exception:
+        # SQLite built without R*Tree
+        return False
 
 
 def _ensure_seed_shop():
@@ -172,23 +364,11 @@ def _ensure_seed_shop():
 
 
 def _repair_users_table():
-    from sqlalchemy import text
+    from .schema import add_missing_columns, USER_COLUMNS
+
     with engine.begin() as conn:
         try:
-            cols = {row[1] for row in conn.execute(text("PRAGMA table_info(users)"))}
-            wanted = {
-                "avatar_url": "TEXT",
-                "gender": "TEXT",
-                "bio": "TEXT",
-                "city": "TEXT",
-                "theme": "TEXT",
-                "favorites": "TEXT",
-                "public_profile": "INTEGER DEFAULT 0",
-                "last_active_at": "DATETIME",
-            }
-            for name, typ in wanted.items():
-                if name not in cols:
-                    conn.execute(text(f"ALTER TABLE users ADD COLUMN {name} {typ}"))
+            add_missing_columns(conn, User.__table__, USER_COLUMNS)
         except Exception:
             pass
 
@@ -196,7 +376,11 @@ def _repair_users_table():
 @app.get("/dev/db/repair")
 def dev_db_repair():
     _repair_users_table()
-    _ensure_schema()
+    ok = _ensure_schema()
+    _ensure_spatial_index()
+    _meta_set("bootstrap", "")
+    if not ok:
+        return JSONResponse({"status": "error", "message": "schema repair failed, see the server log"}, status_code=500)
     return JSONResponse({"status": "ok", "message": "schema ensured"})
 
 
@@ -253,26 +437,113 @@ def _default_taxonomy() -> dict:
     }
 
 
-@app.get("/api/taxonomy")
-def get_taxonomy():
+def _load_taxonomy() -> dict:
     try:
         path = DATA_DIR / "taxonomy.json"
         if path.exists():
-            import json
             with open(path, "r", encoding="utf-8") as f:
                 data = json.load(f)
             # Filter to allowed phyla only
-            filtered = {k: v for k, v in data.items() if k in ALLOWED_PHYLA}
-            return JSONResponse(filtered)
+            return {k: v for k, v in data.items() if k in ALLOWED_PHYLA}
     except Exception:
         pass
     # Default already contains only allowed phyla
-    return JSONResponse(_default_taxonomy())
+    return _default_taxonomy()
+
+
+_taxonomy_payload_cache: dict = {}
+
+
+def _taxonomy_payload() -> tuple:
+    """(ETag, serialized JSON, precompressed variants) of the taxonomy, rebuilt
+    only when taxonomy.json changes."""
+    try:
+        st = (DATA_DIR / "taxonomy.json").stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+    hit = _taxonomy_payload_cache.get(stamp)
+    if hit is None:
+        body = json.dumps(_load_taxonomy(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        hit = (conditional.body_etag(body), body, compression.precompress(body))
+        _taxonomy_payload_cache.clear()
+        _taxonomy_payload_cache[stamp] = hit
+    return hit
+
+
+@app.get("/api/taxonomy")
+@app.get("/api/v1/taxonomy")
+async def get_taxonomy(request: Request):
+    etag, body, variants = await run_in_threadpool(_taxonomy_payload)
+    headers = conditional.validators(etag)
+    if conditional.is_fresh(request, etag):
+        return conditional.not_modified(headers)
+    body = compression.pick(request.headers.get("accept-encoding"), body, variants, headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/taxonomy/counts")
+@app.get("/api/v1/taxonomy/counts")
+async def taxonomy_counts(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    """Approved reports per taxon node, keyed by path ("Chordata/Mammalia"); "" is the total.
+
+    Read from the rollup table. The ETag follows the content version, so a
+    revalidation costs no query.
+    """
+    version = await page_cache.current_version(db)
+    headers = conditional.validators(conditional.make_etag("taxon-counts", version))
+    if conditional.is_fresh(request, headers["ETag"]):
+        return conditional.not_modified(headers)
+    counts = await db.run_sync(taxon_stats.facet_counts)
+    return Response(api_v1.dumps({"counts": counts}), media_type="application/json", headers=headers)
+
+
+def _species_stats(db: Session, taxon: str, days: int) -> dict:
+    """Everything the species statistics page shows, from the rollup tables only."""
+    node = taxon_stats.node(db, taxon)
+    kids = taxon_stats.children(db, taxon)
+    species = taxon_stats.top_species(db, taxon, limit=50)
+    recent = taxon_stats.recent(db, [(n.rank, n.key) for n in kids + species], days)
+    trail = []
+    parts = taxon.split(taxon_stats.SEP) if taxon else []
+    for i, name in enumerate(parts):
+        trail.append((name, taxon_stats.SEP.join(parts[:i + 1])))
+    series = taxon_stats.series(db, node.rank, node.key, days) if node else []
+    feed = {}
+    for sp in species:
+        params = dict(zip(taxon_stats.RANKS, sp.parent.split(taxon_stats.SEP) if sp.parent else []))
+        feed[sp.key] = "/?" + urlencode({"q": sp.name, **params})
+    return {
+        "feed": feed,
+        "node": node,
+        "trail": trail,
+        "children": kids,
+        "species": species,
+        "recent": recent,
+        "series": series,
+        "series_max": max((n for _, n in series), default=0),
+    }
+
+
+@app.get("/stats/species")
+async def species_stats(request: Request, taxon: str = "", days: int = 30, db: AsyncSession = Depends(get_async_read_db)):
+    days = max(7, min(days, 365))
+    data = await db.run_sync(_species_stats, taxon.strip("/"), days)
+    if taxon and data["node"] is None:
+        raise HTTPException(404)
+    return await _render(
+        "species_stats.html",
+        {"request": request, "user": await get_current_user_async(request, db), "taxon": taxon.strip("/"),
+         "days": days, "ranks": dict(zip(taxon_stats.RANKS, ("Phylum", "Class", "Order", "Family", "Genus"))), **data},
+    )
 
 
 # Note: Internationalization removed; site defaults to English text.
 
 
+_tax_cache_lock = threading.Lock()
+
+
 def _load_tax_cache() -> dict:
     try:
         if TAX_CACHE_PATH.exists():
@@ -284,40 +555,114 @@ def _load_tax_cache() -> dict:
 
 
 def _save_tax_cache(cache: dict) -> None:
+    """Merge `cache` into the file and replace it atomically.
+
+    Several worker processes may write concurrently: re-reading first keeps
+    entries other workers added, and os.replace means readers never see a
+    half-written file.
+    """
     try:
-        with open(TAX_CACHE_PATH, "w", encoding="utf-8") as f:
-            json.dump(cache, f, ensure_ascii=False, indent=2)
+        with _tax_cache_lock:
+            merged = _load_tax_cache()
+            merged.update(cache)
+            tmp = TAX_CACHE_PATH.with_name(f"{TAX_CACHE_PATH.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(merged, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, TAX_CACHE_PATH)
     except Exception:
         pass
 
 
 @app.get("/api/taxonomy/lookup")
-def taxonomy_lookup(name: str):
-    """Lookup taxonomy (phylum/class/order/family/genus) via Wikidata and cache locally."""
+async def taxonomy_lookup(request: Request, name: str, job: Optional[int] = None):
+    """Lookup taxonomy (phylum/class/order/family/genus) via Wikidata and cache locally.
+
+    Cache hits are answered at once. A miss queues a background lookup and
+    returns 202 with the job id; the client asks again with `job=<id>` until
+    the answer (or 404/422/502) arrives. Repeated misses for one name share
+    one job.
+    """
     key = name.strip()
     if not key:
         return JSONResponse({"error": "empty name"}, status_code=400)
-    cache = _load_tax_cache()
+    cache = await run_in_threadpool(_load_tax_cache)
     hit = cache.get(key.lower())
     if hit:
-        return JSONResponse(hit)
-    try:
-        data = _wikidata_taxonomy(key)
-        if data:
-            phy = data.get("phylum")
-            if phy and phy not in ALLOWED_PHYLA:
-                return JSONResponse({"error": "phylum_not_allowed", "phylum": phy}, status_code=422)
-            cache[key.lower()] = data
-            _save_tax_cache(cache)
-            return JSONResponse(data)
-        return JSONResponse({"error": "not_found"}, status_code=404)
-    except Exception:
+        return conditional.json_response(request, hit, conditional.REVALIDATE)
+    job_id, status, data = await run_in_threadpool(_taxonomy_job, key, job)
+    if status == "failed":
         return JSONResponse({"error": "lookup_failed"}, status_code=502)
+    if status != "done":
+        return JSONResponse({"status": "pending", "job": job_id}, status_code=202, headers={"Retry-After": "1"})
+    if not data or data.get("error") == "not_found":
+        return JSONResponse({"error": "not_found"}, status_code=404)
+    if data.get("error") == "phylum_not_allowed":
+        return JSONResponse(data, status_code=422)
+    return conditional.json_response(request, data, conditional.REVALIDATE)
+
+
+def _taxonomy_job(name: str, job_id: Optional[int]) -> tuple:
+    """(id, status, result) of the lookup job for `name`, queued if needed.
+
+    Polls (with the id from the 202) only read the job; a fresh request for
+    a name whose lookup failed, or came back negative more than
+    TAXONOMY_NEGATIVE_TTL seconds ago, queues it again.
+    """
+    key = f"taxonomy:{name.lower()}"
+    with SessionLocal() as db:
+        job = db.get(Job, job_id) if job_id else None
+        if job is None or job.idempotency_key != key:
+            # the user is waiting on it: ahead of housekeeping jobs
+            job = jobs.enqueue(db, "taxonomy.lookup", {"name": name}, key=key, priority=10, max_attempts=3)
+            found = jobs.result(job) if job.status == "done" else None
+            if (isinstance(found, dict) and found.get("error")
+                    and job.updated_at < datetime.utcnow() - timedelta(seconds=TAXONOMY_NEGATIVE_TTL)):
+                # names get added to Wikidata; positive results live in the tax cache instead
+                jobs.requeue(db, job)
+            db.commit()
+        return job.id, job.status, jobs.result(job)
+
+
+@jobs.handler("taxonomy.lookup")
+def _taxonomy_lookup_job(payload: dict):
+    name = payload["name"]
+    data = _wikidata_taxonomy(name)
+    if not data:
+        return {"error": "not_found"}
+    phy = data.get("phylum")
+    if phy and phy not in ALLOWED_PHYLA:
+        return {"error": "phylum_not_allowed", "phylum": phy}
+    _save_tax_cache({name.lower(): data})
+    return data
+
+
+@jobs.handler("photo.hash")
+def _hash_photos_job(payload: dict):
+    """Perceptual hashes for the duplicate check; redone after photo edits."""
+    stored = 0
+    with SessionLocal() as db:
+        for rep in db.execute(select(SpeciesReport).where(SpeciesReport.id.in_(payload.get("report_ids", [])))).scalars():
+            stored += photo_hash.index_report(db, rep)
+        db.commit()
+    return {"hashed": stored}
+
+
+@jobs.handler("media.delete")
+def _delete_media_job(payload: dict):
+    """Remove files no committed row refers to any more; safe to repeat."""
+    from . import media_gc
+
+    paths = payload.get("paths", [])
+    with SessionLocal() as db:
+        # imported rows may share one upload; keep it while any row shows it
+        keep = media_gc.in_use(db, paths)
+    removed = sum(1 for p in paths if media_gc.normalize(p) not in keep and remove_media(p))
+    return {"removed": removed, "kept": len(keep)}
 
 
 def _wikidata_taxonomy(species_name: str) -> dict | None:
     """Query Wikidata SPARQL for the taxonomic chain of a species name (wdt:P225 exact match)."""
-    endpoint = "https://query.wikidata.org/sparql"
+    endpoint = WIKIDATA_SPARQL_URL
     query = f"""
 PREFIX wd: <http://www.wikidata.org/entity/>
 PREFIX wdt: <http://www.wikidata.org/prop/direct/>
@@ -334,9 +679,21 @@ SELECT ?rank ?rankLabel ?ancestorLabel WHERE {{
         "Accept": "application/sparql-results+json",
         "User-Agent": "KomodoHub/1.0 (+https://example.local)"
     }
-    resp = requests.get(endpoint, params={"query": query}, headers=headers, timeout=25)
+    import requests  # only needed on cache misses; keeps it off the startup path
+
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        resp = requests.get(endpoint, params={"query": query}, headers=headers, timeout=25)
+        outcome = "ok" if resp.status_code == 200 else f"http_{resp.status_code}"
+    finally:
+        metrics.WIKIDATA_LATENCY.observe(time.perf_counter() - t0, outcome)
+    if resp.status_code == 429 or resp.status_code >= 500:
+        # throttled or unavailable: raise so a background lookup is retried
+        resp.raise_for_status()
     if resp.status_code != 200:
-        return None
+        # no match is a 200 with no rows; this is a malformed or refused query: retrying the same request cannot help
+        raise jobs.PermanentError(f"Wikidata answered HTTP {resp.status_code}")
     res = resp.json()
     bindings = res.get("results", {}).get("bindings", [])
     rank_map = {"Q38348": "phylum", "Q37517": "class_name", "Q36602": "order_name", "Q35409": "family", "Q34740": "genus"}
@@ -364,6 +721,13 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> Optiona
     return db.get(User, uid)
 
 
+async def get_current_user_async(request: Request, db: AsyncSession) -> Optional[User]:
+    uid = request.session.get("user_id")
+    if not uid:
+        return None
+    return await db.get(User, uid)
+
+
 def require_user(user: Optional[User]) -> User:
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -380,12 +744,6 @@ def require_admin(user: Optional[User]) -> User:
 POINTS_PER_CNY = 10
 
 
-def award_points(db: Session, user_id: int, delta: int, reason: str, ref_type: str | None = None, ref_id: int | None = None):
-    entry = PointsLedger(user_id=user_id, delta=delta, reason=reason, ref_type=ref_type, ref_id=ref_id)
-    db.add(entry)
-    db.commit()
-
-
 def get_points_balance(db: Session, user_id: int) -> int:
     from sqlalchemy import func
     total = db.execute(select(func.coalesce(func.sum(PointsLedger.delta), 0)).where(PointsLedger.user_id == user_id)).scalar()
@@ -395,6 +753,7 @@ def get_points_balance(db: Session, user_id: int) -> int:
 def award_points(db: Session, user_id: int, delta: int, reason: str, ref_type: str | None = None, ref_id: int | None = None):
     entry = PointsLedger(user_id=user_id, delta=delta, reason=reason, ref_type=ref_type, ref_id=ref_id)
     db.add(entry)
+    user_stats.bump(db, user_id, points=delta)
     db.commit()
 
 
@@ -419,9 +778,24 @@ def _get_session_counters(request: Request):
     return d
 
 
+async def _render(name: str, context: dict, cache_key: str | None = None, version: str | None = None, **kwargs):
+    """TemplateResponse for async routes, rendered (and cached) in the threadpool.
+
+    Jinja and precompression are CPU-bound; on the event loop a large page
+    would hold up every other request until it finished.
+    """
+    def render():
+        response = templates.TemplateResponse(name, context, **kwargs)
+        if cache_key is not None:
+            page_cache.store(cache_key, version, response)
+        return response
+
+    return await run_in_threadpool(render)
+
+
 # Routes
 @app.get("/")
-def home(request: Request, q: str | None = None, db: Session = Depends(get_db)):
+async def home(request: Request, q: str | None = None, db: AsyncSession = Depends(get_async_read_db)):
     # taxonomy filters from query
     phylum = request.query_params.get("phylum") or None
     class_name = request.query_params.get("class_name") or None
@@ -429,6 +803,11 @@ def home(request: Request, q: str | None = None, db: Session = Depends(get_db)):
     family = request.query_params.get("family") or None
     genus = request.query_params.get("genus") or None
 
+    cache_key = page_cache.home_key(request.query_params)
+    version, cached = await page_cache.lookup(request, db, cache_key, "/")
+    if cached is not None:
+        return cached
+
     stmt = select(SpeciesReport).where(SpeciesReport.status == ReportStatus.approved.value)
     if q:
         stmt = stmt.where(
@@ -459,13 +838,15 @@ def home(request: Request, q: str | None = None, db: Session = Depends(get_db)):
         stmt = stmt.order_by(score.desc(), SpeciesReport.created_at.desc())
     else:
         stmt = stmt.order_by(SpeciesReport.created_at.desc())
-    items = db.execute(stmt).scalars().all()
+    # the template shows each reporter; an async session cannot lazy-load them
+    stmt = stmt.options(selectinload(SpeciesReport.reporter))
+    items = (await db.execute(stmt)).scalars().all()
     photos_map = {it.id: split_paths(it.photo_paths) for it in items}
-    return templates.TemplateResponse(
+    return await _render(
         "home.html",
         {
             "request": request,
-            "user": get_current_user(request, db),
+            "user": await get_current_user_async(request, db),
             "items": items,
             "q": q or "",
             "photos_map": photos_map,
@@ -477,25 +858,87 @@ def home(request: Request, q: str | None = None, db: Session = Depends(get_db)):
                 "genus": genus or "",
             },
         },
+        cache_key, version,
+    )
+
+
+@app.get("/api/export/reports.{fmt}")
+def export_reports(
+    request: Request,
+    fmt: str,
+    phylum: str | None = None,
+    class_name: str | None = None,
+    order_name: str | None = None,
+    family: str | None = None,
+    genus: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    since: str | None = None,
+    limit: int | None = None,
+):
+    """Stream approved reports as CSV, NDJSON or GeoJSON.
+
+    Rows come in (updated_at, id) order and each carries a `cursor`; pass the
+    last one back as `since` to resume or to pull only newer changes. Such
+    pulls also carry tombstones for reports revoked, rejected or deleted.
+    """
+    if fmt not in export.EXPORT_FORMATS:
+        raise HTTPException(404)
+    filters = {
+        "phylum": phylum, "class_name": class_name, "order_name": order_name, "family": family, "genus": genus,
+        "date_from": date_from, "date_to": date_to, "since": since,
+    }
+    try:
+        export.build_query(filters)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    media_base = str(request.base_url) + "media/"
+    return StreamingResponse(
+        export.stream_export(fmt, filters, media_base, limit),
+        media_type=export.EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="reports.{fmt}"'},
     )
 
 
 @app.get("/report/{report_id}")
-def report_detail(request: Request, report_id: int, db: Session = Depends(get_db)):
-    report = db.get(SpeciesReport, report_id)
-    if not report:
+async def report_detail(request: Request, report_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    cache_key = f"/report/{report_id}"
+    version, cached = await page_cache.lookup(request, db, cache_key, "/report/{report_id}")
+    if cached is not None:
+        _bump_session_counter(request, "views", 1)
+        return cached
+    # validators come from three columns; a revalidation never loads the row or renders
+    row = (await db.execute(
+        select(SpeciesReport.status, SpeciesReport.reporter_id, SpeciesReport.updated_at).where(SpeciesReport.id == report_id)
+    )).first()
+    if not row:
         raise HTTPException(404)
-    user = get_current_user(request, db)
-    if report.status != ReportStatus.approved.value:
+    status, reporter_id, updated_at = row
+    user = await get_current_user_async(request, db)
+    if status != ReportStatus.approved.value:
         if not user:
             raise HTTPException(403)
-        if not (user.is_admin or user.id == report.reporter_id):
+        if not (user.is_admin or user.id == reporter_id):
             raise HTTPException(403)
-    photos = split_paths(report.photo_paths)
+    # the content version covers the reporter's name and avatar, which live on another row
+    etag = conditional.make_etag(
+        conditional.template_stamp(str(TEMPLATES_DIR)), report_id, status, updated_at.isoformat(),
+        version or await page_cache.current_version(db),
+        (user.id, user.is_admin, user.display_name) if user else "anonymous",
+    )
+    headers = conditional.validators(etag, updated_at, conditional.REVALIDATE_PRIVATE if user else conditional.REVALIDATE,
+                                     vary="Cookie")
     _bump_session_counter(request, "views", 1)
-    return templates.TemplateResponse(
+    if conditional.is_fresh(request, etag, updated_at):
+        return conditional.not_modified(headers)
+    report = await db.get(SpeciesReport, report_id, options=[selectinload(SpeciesReport.reporter)])
+    if not report:
+        raise HTTPException(404)
+    photos = split_paths(report.photo_paths)
+    return await _render(
         "report_detail.html",
         {"request": request, "user": user, "item": report, "photos": photos},
+        cache_key, version, headers=headers,
     )
 
 
@@ -547,6 +990,7 @@ def donate_post(
     cents = int(round(amt * 100))
     don = Donation(user_id=user.id, report_id=rep.id, species_name=rep.species_name, amount_cents=cents, currency="CNY", provider="alipay", status="paid")
     db.add(don)
+    user_stats.bump(db, user.id, donations_cents=cents)
     db.commit()
     db.refresh(don)
     # award points
@@ -565,22 +1009,27 @@ def share_report(request: Request, report_id: int, db: Session = Depends(get_db)
     return templates.TemplateResponse("share.html", {"request": request, "item": rep, "share_url": str(url)})
 
 
-@app.get("/points")
-def points_page(request: Request, db: Session = Depends(get_db)):
-    user = require_user(get_current_user(request, db))
+def _points_summary(request: Request, db: Session, user: User) -> dict:
     balance = get_points_balance(db, user.id)
     counters = _get_session_counters(request)
     quests = []
     today = _today_str()
+    logs = {ql.code: ql for ql in db.execute(select(QuestLog).where(QuestLog.user_id == user.id, QuestLog.date == today)).scalars()}
     for code, cfg in QUEST_CONFIG.items():
         progress = counters["views"] if code == "view_5" else counters["shares"] if code == "share_1" else counters["reports"]
         done = progress >= cfg["need"]
-        ql = db.execute(select(QuestLog).where(QuestLog.user_id == user.id, QuestLog.code == code, QuestLog.date == today)).scalar_one_or_none()
+        ql = logs.get(code)
         rewarded = bool(ql and ql.rewarded)
         quests.append({"code": code, "title": cfg["title"], "need": cfg["need"], "points": cfg["points"], "progress": progress, "done": done, "rewarded": rewarded})
     recent = db.execute(select(PointsLedger).where(PointsLedger.user_id == user.id).order_by(PointsLedger.created_at.desc()).limit(20)).scalars().all()
     signed = db.execute(select(DailySignin).where(DailySignin.user_id == user.id, DailySignin.date == today)).scalar_one_or_none()
-    return templates.TemplateResponse("points.html", {"request": request, "user": user, "balance": balance, "quests": quests, "recent": recent, "signed": bool(signed), "signin_points": SIGNIN_POINTS})
+    return {"balance": balance, "quests": quests, "recent": recent, "signed": bool(signed), "signin_points": SIGNIN_POINTS}
+
+
+@app.get("/points")
+def points_page(request: Request, db: Session = Depends(get_db)):
+    user = require_user(get_current_user(request, db))
+    return templates.TemplateResponse("points.html", {"request": request, "user": user, **_points_summary(request, db, user)})
 
 
 @app.post("/points/signin")
@@ -716,11 +1165,7 @@ def logout(request: Request):
 @app.get("/profile")
 def profile_get(request: Request, db: Session = Depends(get_db)):
     user = require_user(get_current_user(request, db))
-    total_reports = db.execute(select(SpeciesReport).where(SpeciesReport.reporter_id == user.id)).scalars().all()
-    approved = [r for r in total_reports if r.status == ReportStatus.approved.value]
-    donations = db.execute(select(Donation).where(Donation.user_id == user.id)).scalars().all()
-    donations_sum = sum(d.amount_cents for d in donations) / 100.0
-    points = get_points_balance(db, user.id)
+    stats = user_stats.get_user_stats(db, user.id)
     favs = []
     if user.favorites:
         try:
@@ -728,10 +1173,139 @@ def profile_get(request: Request, db: Session = Depends(get_db)):
         except Exception:
             favs = []
     favs_json = _json.dumps(favs, ensure_ascii=False)
-    data = {"total_reports": len(total_reports), "approved_reports": len(approved), "donations_sum": donations_sum, "points": points}
+    data = {"total_reports": stats["total_reports"], "approved_reports": stats["approved_reports"], "donations_sum": stats["donations_cents"] / 100.0, "points": stats["points"]}
     return templates.TemplateResponse("profile.html", {"request": request, "user": user, "stats": data, "favs": favs, "favs_json": favs_json})
 
 
+@app.get("/api/profile/stats")
+async def profile_stats_api(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Cached counters for the current user; a single primary-key lookup."""
+    user = require_user(await get_current_user_async(request, db))
+    stats = await db.run_sync(user_stats.get_user_stats, user.id)
+    return conditional.json_response(request, {"user_id": user.id, **stats, "donations_sum": stats["donations_cents"] / 100.0})
+
+
+# --- JSON API v1 (desktop client) -------------------------------------------
+# Same data as the pages, without templates. Auth is the session cookie.
+
+
+@app.get("/api/v1/reports")
+async def api_v1_feed(request: Request, q: str | None = None, cursor: str | None = None, limit: int = api_v1.FEED_LIMIT,
+                      db: AsyncSession = Depends(get_async_read_db)):
+    limit = max(1, min(limit, api_v1.FEED_MAX_LIMIT))
+    after = None
+    if cursor:
+        after = api_v1.decode_cursor(cursor)
+        if after is None:
+            raise HTTPException(400, detail="Invalid cursor")
+    taxa = {k: request.query_params[k] for k in api_v1.TAX_PARAMS if request.query_params.get(k)}
+    rows = (await db.execute(api_v1.feed_query(q, taxa, after, limit))).all()
+    users = (await db.execute(api_v1.users_query(r.reporter_id for r in rows[:limit]))).all() if rows else []
+    return conditional.json_response(request, api_v1.feed_page(rows, users, limit), conditional.REVALIDATE,
+                                     dumps=api_v1.dumps)
+
+
+async def _geo_cards(db: AsyncSession, ids: List[int], distances: Optional[dict] = None) -> dict:
+    rows = (await db.execute(api_v1.rows_query(ids))).all() if ids else []
+    users = (await db.execute(api_v1.users_query(r.reporter_id for r in rows))).all() if rows else []
+    return api_v1.geo_page(rows, users, ids, distances)
+
+
+# declared before /api/v1/reports/{report_id}, which would otherwise match them
+@app.get("/api/v1/reports/near")
+async def api_v1_near(request: Request, lat: float, lon: float, radius_km: float = 10, limit: int = api_v1.FEED_LIMIT,
+                      db: AsyncSession = Depends(get_async_read_db)):
+    """Approved reports within `radius_km` of a point, nearest first, with distance_km."""
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or radius_km <= 0:
+        raise HTTPException(400, detail="Invalid coordinates or radius")
+    radius_km = min(radius_km, geo.MAX_RADIUS_KM)
+    limit = max(1, min(limit, api_v1.FEED_MAX_LIMIT))
+    hits = await db.run_sync(geo.nearby, lat, lon, radius_km, limit)
+    data = await _geo_cards(db, [rid for rid, _ in hits], dict(hits))
+    return conditional.json_response(request, data, conditional.REVALIDATE, dumps=api_v1.dumps)
+
+
+@app.get("/api/v1/reports/within")
+async def api_v1_within(request: Request, bbox: str, limit: int = api_v1.FEED_LIMIT,
+                        db: AsyncSession = Depends(get_async_read_db)):
+    """Approved reports inside `bbox=west,south,east,north` (west > east crosses the antimeridian).
+
+    At most `limit` reports, listed newest id first. When "truncated" is
+    set the box held more, and the page is an arbitrary subset of them (the
+    index returns the first it finds, not the newest), so the map tiles are
+    the better query.
+    """
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(400, detail="bbox must be west,south,east,north")
+    if not (-90 <= south <= north <= 90 and -180 <= west <= 180 and -180 <= east <= 180):
+        raise HTTPException(400, detail="Invalid bbox")
+    limit = max(1, min(limit, api_v1.FEED_MAX_LIMIT))
+    points = await db.run_sync(geo.points_in, south, west, north, east, limit + 1)
+    ids = sorted((p[0] for p in points[:limit]), reverse=True)
+    data = await _geo_cards(db, ids)
+    data["truncated"] = len(points) > limit
+    return conditional.json_response(request, data, conditional.REVALIDATE, dumps=api_v1.dumps)
+
+
+@app.get("/api/v1/map/{z}/{x}/{y}")
+async def api_v1_map_tile(request: Request, z: int, x: int, y: int, db: AsyncSession = Depends(get_async_read_db)):
+    """Clustered approved reports for one XYZ map tile.
+
+    Tiles are cached per process and carry an ETag, both tied to the content
+    version that moderation bumps, so panning back and forth costs nothing.
+    """
+    if not (0 <= z <= geo.MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(404)
+    version = await page_cache.current_version(db)
+    key = f"{z}/{x}/{y}"
+    headers = conditional.validators(conditional.make_etag("tile", version, key))
+    if conditional.is_fresh(request, headers["ETag"]):
+        return conditional.not_modified(headers)
+    hit = geo.tile_cache.get(key, version)
+    if hit is not None:
+        body = hit[0]
+    else:
+        clusters = await db.run_sync(geo.tile_clusters, z, x, y)
+        body = api_v1.dumps({"z": z, "x": x, "y": y, "clusters": clusters})
+        geo.tile_cache.put(key, version, body)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/v1/reports/{report_id}")
+async def api_v1_report(request: Request, report_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    report = await db.get(SpeciesReport, report_id, options=[selectinload(SpeciesReport.reporter)])
+    if not report:
+        raise HTTPException(404)
+    if report.status != ReportStatus.approved.value:
+        user = await get_current_user_async(request, db)
+        if not user or not (user.is_admin or user.id == report.reporter_id):
+            raise HTTPException(403)
+    return conditional.json_response(request, api_v1.detail(report), dumps=api_v1.dumps)
+
+
+@app.get("/api/v1/points")
+def api_v1_points(request: Request, db: Session = Depends(get_db)):
+    user = require_user(get_current_user(request, db))
+    return conditional.json_response(request, api_v1.points(_points_summary(request, db, user)), dumps=api_v1.dumps)
+
+
+@app.get("/api/v1/shop")
+def api_v1_shop(request: Request, db: Session = Depends(get_db)):
+    user = require_user(get_current_user(request, db))
+    items = db.execute(select(ShopItem).where(ShopItem.status == "active")).scalars().all()
+    return conditional.json_response(request, api_v1.shop(get_points_balance(db, user.id), items), dumps=api_v1.dumps)
+
+
+@app.get("/api/v1/profile/stats")
+async def api_v1_profile_stats(request: Request, db: AsyncSession = Depends(get_async_db)):
+    user = require_user(await get_current_user_async(request, db))
+    stats = await db.run_sync(user_stats.get_user_stats, user.id)
+    return conditional.json_response(request, {"user": {"id": user.id, "name": user.display_name, "avatar": user.avatar_url},
+                                               **stats}, dumps=api_v1.dumps)
+
+
 @app.post("/profile")
 async def profile_post(
     request: Request,
@@ -746,6 +1320,7 @@ async def profile_post(
     db: Session = Depends(get_db),
 ):
     user = require_user(get_current_user(request, db))
+    shown_before = (user.display_name, user.avatar_url)
     user.display_name = display_name.strip() or user.display_name
     user.gender = (gender or None)
     user.bio = (bio.strip() or None)
@@ -766,7 +1341,12 @@ async def profile_post(
             user.avatar_url = p
         except ValueError as e:
             return templates.TemplateResponse("profile.html", {"request": request, "user": user, "error": str(e)}, status_code=400)
+        if shown_before[1] and shown_before[1] != user.avatar_url:
+            jobs.enqueue(db, "media.delete", {"paths": [shown_before[1]]})
     db.add(user)
+    if (user.display_name, user.avatar_url) != shown_before:
+        # both appear on the user's report cards
+        page_cache.bump(db)
     db.commit()
     return RedirectResponse("/profile", status_code=303)
 
@@ -813,6 +1393,8 @@ async def create_report(
     order_name: str = Form(""),
     family: str = Form(""),
     genus: str = Form(""),
+    latitude: str = Form(""),
+    longitude: str = Form(""),
     photo1: Optional[UploadFile] = None,
     photo2: Optional[UploadFile] = None,
     photo3: Optional[UploadFile] = None,
@@ -823,9 +1405,11 @@ async def create_report(
     for f in (photo1, photo2, photo3):
         if f and f.filename:
             try:
-                p = save_upload(f)
+                # off the event loop: the write has to finish before the report refers to it
+                p = await run_in_threadpool(save_upload, f)
                 paths.append(p)
             except ValueError as e:
+                _discard_uploads(db, paths)
                 return templates.TemplateResponse(
                     "new_report.html",
                     {"request": request, "user": user, "error": str(e), "title": title, "species_name": species_name, "description": description, "location_text": location_text},
@@ -850,6 +1434,7 @@ async def create_report(
     # validate phylum if provided
     phy_clean = phylum.strip() if phylum else ""
     if phy_clean and phy_clean not in ALLOWED_PHYLA:
+        _discard_uploads(db, paths)
         return templates.TemplateResponse(
             "new_report.html",
             {
@@ -864,12 +1449,23 @@ async def create_report(
             status_code=400,
         )
 
+    try:
+        where = geo.locate(location_text, latitude, longitude)
+    except ValueError as e:
+        _discard_uploads(db, paths)
+        return templates.TemplateResponse(
+            "new_report.html",
+            {"request": request, "user": user, "error": str(e), "title": title, "species_name": species_name, "description": description, "location_text": location_text},
+            status_code=400,
+        )
+
     rep = SpeciesReport(
         reporter_id=user.id,
         title=title.strip(),
         species_name=species_name.strip(),
         description=description.strip(),
         location_text=location_text.strip(),
+        **where,
         phylum=(phy_clean or None),
         class_name=(class_name.strip() or None),
         order_name=(order_name.strip() or None),
@@ -878,12 +1474,47 @@ async def create_report(
         photo_paths=join_paths(paths),
     )
     db.add(rep)
+    user_stats.bump(db, user.id, total_reports=1)
+    db.flush()
+    photo_hash.enqueue(db, [rep.id])
     db.commit()
     db.refresh(rep)
     _bump_session_counter(request, "reports", 1)
     return RedirectResponse(f"/report/{rep.id}", status_code=303)
 
 
+def _discard_uploads(db: Session, paths: List[str]) -> None:
+    """Queue deletion of photos saved for a submission that was turned down."""
+    if paths:
+        jobs.enqueue(db, "media.delete", {"paths": paths})
+        db.commit()
+
+
+@app.post("/api/uploads")
+async def api_upload(request: Request, file: UploadFile, db: Session = Depends(get_db)):
+    """Upload one photo for a later bulk import; reference the returned path in photo_paths."""
+    user = require_user(get_current_user(request, db))
+    try:
+        p = save_upload(file, subdir=bulk_import.upload_subdir(user.id))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"path": p}, status_code=201)
+
+
+@app.post("/api/reports/import")
+def import_reports(request: Request, db: Session = Depends(get_db)):
+    """Bulk-create pending reports from an NDJSON request body.
+
+    One JSON object per line with the new-report form fields plus
+    `photo_urls` (fetched server-side) and/or `photo_paths` (from /api/uploads).
+    Results stream back as NDJSON, one line per input line, then a summary.
+    """
+    user = require_user(get_current_user(request, db))
+    return bulk_import.NDJSONStreamingResponse(
+        bulk_import.import_stream(request.stream(), user.id, ALLOWED_PHYLA)
+    )
+
+
 @app.get("/my/reports")
 def my_reports(request: Request, db: Session = Depends(get_db)):
     user = require_user(get_current_user(request, db))
@@ -896,20 +1527,89 @@ def my_reports(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/admin/reports")
-def admin_reports(request: Request, status: str = "pending", db: Session = Depends(get_db)):
+def admin_reports(request: Request, status: str = "pending", mine: int = 0, db: Session = Depends(get_db)):
     admin = require_admin(get_current_user(request, db))
     if status not in {s.value for s in ReportStatus}:
         status = "pending"
-    items = (
-        db.execute(
-            select(SpeciesReport).where(SpeciesReport.status == status).order_by(SpeciesReport.created_at.desc())
-        ).scalars().all()
-    )
+    if status == "pending" and mine:
+        items = moderation.my_claims(db, admin.id)
+    else:
+        items = (
+            db.execute(
+                select(SpeciesReport).where(SpeciesReport.status == status).order_by(SpeciesReport.created_at.desc())
+            ).scalars().all()
+        )
     return templates.TemplateResponse(
-        "admin_reports.html", {"request": request, "user": admin, "items": items, "status": status}
+        "admin_reports.html",
+        {
+            "request": request,
+            "user": admin,
+            "items": items,
+            "status": status,
+            "mine": bool(mine),
+            "now": datetime.utcnow(),
+            "claim_batch": moderation.CLAIM_BATCH_DEFAULT,
+            "duplicates": photo_hash.duplicates(db, [it.id for it in items]),
+        },
     )
 
 
+@app.post("/admin/reports/claim")
+def claim_reports(request: Request, n: int = Form(moderation.CLAIM_BATCH_DEFAULT), db: Session = Depends(get_db)):
+    """Lease the next N unclaimed pending reports to the current moderator."""
+    admin = require_admin(get_current_user(request, db))
+    moderation.claim_next(db, admin.id, n)
+    return RedirectResponse("/admin/reports?status=pending&mine=1", status_code=303)
+
+
+@app.post("/admin/reports/release")
+def release_reports(request: Request, ids: List[int] = Form([]), db: Session = Depends(get_db)):
+    admin = require_admin(get_current_user(request, db))
+    moderation.release_claims(db, admin.id, ids or None)
+    return RedirectResponse("/admin/reports?status=pending", status_code=303)
+
+
+@app.get("/admin/moderators/stats")
+async def moderator_stats(request: Request, hours: int = 24, db: AsyncSession = Depends(get_async_read_db)):
+    require_admin(await get_current_user_async(request, db))
+    hours = max(1, min(hours, 24 * 30))
+    return conditional.json_response(request, {"hours": hours, "moderators": await db.run_sync(moderation.throughput_stats, hours)})
+
+
+@app.get("/admin/jobs")
+def list_jobs(request: Request, status: str = "", kind: str = "", limit: int = 50, db: Session = Depends(get_read_db)):
+    """Background queue: counts per kind and status, and the most recently updated jobs."""
+    require_admin(get_current_user(request, db))
+    stmt = select(Job).order_by(Job.updated_at.desc(), Job.id.desc()).limit(max(1, min(limit, 500)))
+    if status:
+        stmt = stmt.where(Job.status == status)
+    if kind:
+        stmt = stmt.where(Job.kind == kind)
+    return JSONResponse({
+        "workers": jobs.workers_alive(),
+        "counts": jobs.counts(db),
+        "jobs": [jobs.to_dict(j) for j in db.execute(stmt).scalars()],
+    })
+
+
+@app.get("/admin/jobs/{job_id}")
+def get_job(request: Request, job_id: int, db: Session = Depends(get_read_db)):
+    require_admin(get_current_user(request, db))
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(404)
+    return JSONResponse(jobs.to_dict(job, full=True))
+
+
+@app.post("/admin/jobs/{job_id}/retry")
+def retry_job(request: Request, job_id: int, db: Session = Depends(get_db)):
+    """Queue a failed job again."""
+    require_admin(get_current_user(request, db))
+    if not jobs.retry(db, job_id):
+        return JSONResponse({"error": "not_failed"}, status_code=409)
+    return JSONResponse({"id": job_id, "status": "queued"})
+
+
 @app.post("/admin/reports/{report_id}/review")
 def review_report(
     request: Request,
@@ -925,6 +1625,9 @@ def review_report(
     valid_actions = {"approve", "reject", "revoke", "pending"}
     if action not in valid_actions:
         raise HTTPException(400, detail="Invalid action")
+    if moderation.claimed_by_other(rep, admin.id):
+        raise HTTPException(409, detail="Report is claimed by another moderator")
+    before = rep.status
 
     if action == "approve":
         rep.status = ReportStatus.approved.value
@@ -942,7 +1645,11 @@ def review_report(
         rep.reviewed_by = None
 
     rep.review_note = note.strip() or None
+    moderation.record_review(db, rep, admin.id, action)
+    user_stats.on_status_change(db, rep, before)
+    taxon_stats.on_status_change(db, rep, before)
     db.add(rep)
+    page_cache.bump(db)
     db.commit()
     return RedirectResponse("/admin/reports?status=pending", status_code=303)
 
@@ -955,7 +1662,8 @@ def edit_report_get(request: Request, report_id: int, db: Session = Depends(get_
         raise HTTPException(404)
     return templates.TemplateResponse(
         "admin_report_edit.html",
-        {"request": request, "user": admin, "item": rep, "photos": split_paths(rep.photo_paths)},
+        {"request": request, "user": admin, "item": rep, "photos": split_paths(rep.photo_paths),
+         "duplicates": photo_hash.duplicates(db, [rep.id]).get(rep.id, [])},
     )
 
 
@@ -978,8 +1686,14 @@ def edit_report_post(
     if not rep:
         raise HTTPException(404)
     rep.title = title.strip()
+    old_species = rep.species_name
     rep.species_name = species_name.strip()
+    taxon_stats.on_species_renamed(db, rep, old_species)
     rep.description = description.strip()
+    if location_text.strip() != (rep.location_text or "") and rep.geo_source != "submitted":
+        # reporter-supplied coordinates outrank a gazetteer match for the new text
+        for k, v in geo.locate(location_text).items():
+            setattr(rep, k, v)
     rep.location_text = location_text.strip()
     # handle optional new photos to append
     paths = []
@@ -996,6 +1710,7 @@ def edit_report_post(
                         "user": admin,
                         "item": rep,
                         "photos": split_paths(rep.photo_paths),
+                        "duplicates": photo_hash.duplicates(db, [rep.id]).get(rep.id, []),
                         "error": str(e),
                     },
                     status_code=400,
@@ -1003,11 +1718,18 @@ def edit_report_post(
     # compute final photos: remove selected, then append new ones
     existing = split_paths(rep.photo_paths)
     if delete_photos:
+        removed = [p for p in existing if p in set(delete_photos)]
         existing = [p for p in existing if p not in set(delete_photos)]
+        if removed:
+            # files go after the commit, like those of deleted reports
+            jobs.enqueue(db, "media.delete", {"paths": removed})
     if paths:
         existing.extend(paths)
+    if existing != split_paths(rep.photo_paths):
+        photo_hash.enqueue(db, [rep.id])
     rep.photo_paths = join_paths(existing)
     db.add(rep)
+    page_cache.bump(db)
     db.commit()
     return RedirectResponse("/admin/reports?status=pending", status_code=303)
 
@@ -1020,9 +1742,14 @@ def delete_report(request: Request, report_id: int, db: Session = Depends(get_db
         raise HTTPException(404)
     if rep.status != ReportStatus.rejected.value:
         raise HTTPException(400, detail="Only rejected reports can be deleted")
-    # delete media files
-    delete_media_list(split_paths(rep.photo_paths))
+    # files go once the row is gone for good, by a background job; no dedupe
+    # key, as SQLite can hand this id to a later report
+    jobs.enqueue(db, "media.delete", {"paths": split_paths(rep.photo_paths)})
+    user_stats.on_report_deleted(db, rep)
+    taxon_stats.on_report_deleted(db, rep)
+    photo_hash.forget(db, [rep.id])
     db.delete(rep)
+    db.add(ReviewAction(moderator_id=admin.id, report_id=rep.id, action="delete"))
     db.commit()
     return RedirectResponse("/admin/reports?status=rejected", status_code=303)
 
@@ -1044,7 +1771,12 @@ def batch_reports(
         return RedirectResponse(f"/admin/reports?status={redirect_status}", status_code=303)
 
     reps = db.execute(select(SpeciesReport).where(SpeciesReport.id.in_(ids))).scalars().all()
+    deleted_media: List[str] = []
     for rep in reps:
+        if moderation.claimed_by_other(rep, admin.id):
+            # leave it to the moderator holding the lease
+            continue
+        before = rep.status
         if action == "approve" and rep.status == ReportStatus.pending.value:
             rep.status = ReportStatus.approved.value
             rep.reviewed_by = admin.id
@@ -1066,7 +1798,19 @@ def batch_reports(
             rep.review_note = note.strip() or rep.review_note
             db.add(rep)
         elif action == "delete" and rep.status == ReportStatus.rejected.value:
-            delete_media_list(split_paths(rep.photo_paths))
+            deleted_media.extend(split_paths(rep.photo_paths))
+            user_stats.on_report_deleted(db, rep)
+            taxon_stats.on_report_deleted(db, rep)
+            photo_hash.forget(db, [rep.id])
             db.delete(rep)
+            db.add(ReviewAction(moderator_id=admin.id, report_id=rep.id, action=action))
+            continue
+        if rep.status != before:
+            moderation.record_review(db, rep, admin.id, action)
+            user_stats.on_status_change(db, rep, before)
+            taxon_stats.on_status_change(db, rep, before)
+    if deleted_media:
+        jobs.enqueue(db, "media.delete", {"paths": deleted_media})
+    page_cache.bump(db)
     db.commit()
     return RedirectResponse(f"/admin/reports?status={redirect_status}", status_code=303)
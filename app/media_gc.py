@@ -0,0 +1,295 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from .models import AppMeta, ShopItem, SpeciesReport, User
+from .utils import MEDIA_ROOT, UPLOADS_DIR, split_paths
+
+
+# Orphaned media: files under media/uploads that no row refers to. The
+# referenced set is streamed from the database into a sorted array of 64-bit
+# path hashes (8 bytes per reference), so memory stays small at millions of
+# photos; a hash collision can only keep an orphan, never delete a live file.
+# The upload tree is walked month by month (uploads/YYYY/MM) with os.scandir,
+# and a run may stop after a file budget and resume from a cursor.
+
+CURSOR_KEY = "media_gc_cursor"
+GRACE_HOURS = 24
+STREAM_BATCH = 5000
+MAX_LISTED = 100
+IN_USE_CHUNK = 50
+
+
+def path_key(rel_path: str) -> int:
+    return int.from_bytes(hashlib.blake2b(rel_path.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def normalize(ref: Optional[str]) -> Optional[str]:
+    """A stored reference as a path relative to MEDIA_ROOT ('/media/x' and 'x' alike)."""
+    if not ref:
+        return None
+    ref = ref.strip()
+    if ref.startswith(("http://", "https://")):
+        return None
+    if ref.startswith("/media/"):
+        ref = ref[len("/media/"):]
+    return ref.lstrip("/") or None
+
+
+def referenced(db: Session) -> Iterator[Tuple[str, str, int]]:
+    """(path, table, row id) for every media reference, streamed in batches."""
+    sources = (
+        ("species_reports", select(SpeciesReport.id, SpeciesReport.photo_paths).where(SpeciesReport.photo_paths.is_not(None))),
+        ("users", select(User.id, User.avatar_url).where(User.avatar_url.is_not(None))),
+        ("shop_items", select(ShopItem.id, ShopItem.media_url).where(ShopItem.media_url.is_not(None))),
+    )
+    for table, stmt in sources:
+        for row_id, value in db.execute(stmt.execution_options(yield_per=STREAM_BATCH)):
+            for ref in (split_paths(value) if table == "species_reports" else [value]):
+                path = normalize(ref)
+                if path:
+                    yield path, table, row_id
+
+
+def in_use(db: Session, paths: Iterable[str]) -> Set[str]:
+    """The paths among `paths` that some report, avatar or shop item still refers to.
+
+    For deleting a few known files (one query per table and chunk), where
+    build_index would read every reference.
+    """
+    wanted = {p for p in (normalize(p) for p in paths) if p}
+    found: Set[str] = set()
+    todo = sorted(wanted)
+    columns = ((SpeciesReport.photo_paths, True), (User.avatar_url, False), (ShopItem.media_url, False))
+    for i in range(0, len(todo), IN_USE_CHUNK):
+        chunk = todo[i:i + IN_USE_CHUNK]
+        for column, multi in columns:
+            # substring match narrows it down; exact comparison below
+            stmt = select(column).where(or_(*(column.contains(p, autoescape=True) for p in chunk)))
+            for (value,) in db.execute(stmt):
+                refs = split_paths(value) if multi else [value]
+                found.update(r for r in map(normalize, refs) if r in wanted)
+    return found
+
+
+class RefIndex:
+    """Sorted path hashes with a seen flag per entry."""
+
+    def __init__(self, keys: array):
+        self.keys = array("Q", sorted(keys))
+        self.seen = bytearray(len(self.keys))
+
+    def _find(self, key: int) -> int:
+        i = bisect_left(self.keys, key)
+        return i if i < len(self.keys) and self.keys[i] == key else -1
+
+    def mark(self, rel_path: str) -> bool:
+        """True (and flagged as seen) if the path is referenced."""
+        i = self._find(path_key(rel_path))
+        if i < 0:
+            return False
+        self.seen[i] = 1
+        return True
+
+    def was_seen(self, rel_path: str) -> bool:
+        i = self._find(path_key(rel_path))
+        return i >= 0 and bool(self.seen[i])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+def build_index(db: Session) -> RefIndex:
+    keys = array("Q")
+    for path, _, _ in referenced(db):
+        keys.append(path_key(path))
+    return RefIndex(keys)
+
+
+def _month_dirs(root: Path) -> List[str]:
+    """Relative paths of uploads/YYYY/MM (any second-level directory), sorted."""
+    out = []
+    with os.scandir(root) as years:
+        for y in sorted((e for e in years if e.is_dir(follow_symlinks=False)), key=lambda e: e.name):
+            with os.scandir(y.path) as months:
+                out.extend(f"{y.name}/{m.name}" for m in sorted(months, key=lambda e: e.name)
+                           if m.is_dir(follow_symlinks=False))
+    return out
+
+
+def _loose_files(root: Path) -> Iterator[os.DirEntry]:
+    """Files directly in uploads/ or uploads/YYYY, outside any month directory."""
+    with os.scandir(root) as top:
+        for e in top:
+            if e.is_file(follow_symlinks=False):
+                yield e
+            elif e.is_dir(follow_symlinks=False):
+                with os.scandir(e.path) as inner:
+                    yield from (f for f in inner if f.is_file(follow_symlinks=False))
+
+
+def _walk(path: str) -> Iterator[os.DirEntry]:
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.is_file(follow_symlinks=False):
+                    yield e
+
+
+def _rel(entry_path: str, root_prefix: str) -> str:
+    # plain slicing: Path.relative_to costs more than the stat on a big tree
+    rel = entry_path[len(root_prefix):]
+    return rel.replace(os.sep, "/") if os.sep != "/" else rel
+
+
+def _quarantine(src: str, rel: str, quarantine_dir: Path) -> None:
+    dest = quarantine_dir / rel
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(src, dest)
+    # the purge clock starts when the file is moved
+    os.utime(dest)
+
+
+def get_cursor(db: Session) -> Optional[str]:
+    return db.execute(select(AppMeta.value).where(AppMeta.key == CURSOR_KEY)).scalar()
+
+
+def set_cursor(db: Session, value: Optional[str]) -> None:
+    row = db.get(AppMeta, CURSOR_KEY)
+    if row is None:
+        db.add(AppMeta(key=CURSOR_KEY, value=value))
+    else:
+        row.value = value
+    db.commit()
+
+
+def collect(db: Session, action: str = "report", grace_hours: float = GRACE_HOURS,
+            quarantine_dir: Optional[Path] = None, max_files: Optional[int] = None,
+            resume: bool = False, media_root: Path = MEDIA_ROOT, uploads_dir: Path = UPLOADS_DIR) -> Dict:
+    """Find (and with action quarantine|delete, remove) orphaned uploads.
+
+    Files younger than `grace_hours` are never touched: an upload is written
+    before the row that refers to it commits, and import photos are uploaded
+    ahead of their import. With `max_files`, the walk stops after the month
+    directory that crosses the budget. With `resume`, a run starts after the
+    month where the previous one stopped (kept in app_meta) and records
+    where it stopped in turn, so nightly runs cover the tree in slices.
+    """
+    if action not in ("report", "quarantine", "delete"):
+        raise ValueError(f"unknown action {action!r}")
+    if action == "quarantine" and quarantine_dir is None:
+        raise ValueError("quarantine needs a quarantine directory")
+    t0 = time.perf_counter()
+    stats = {"action": action, "referenced": 0, "scanned": 0, "scanned_bytes": 0, "young": 0,
+             "orphans": 0, "orphan_bytes": 0, "reclaimed_bytes": 0, "errors": 0,
+             "orphan_paths": [], "dangling": 0, "dangling_refs": [], "months": 0, "cursor": None}
+    index = build_index(db)
+    stats["referenced"] = len(index)
+    if not uploads_dir.is_dir():
+        stats["seconds"] = round(time.perf_counter() - t0, 3)
+        return stats
+    cutoff = time.time() - grace_hours * 3600
+    root_prefix = os.path.join(str(media_root), "")
+
+    def visit(entry: os.DirEntry) -> None:
+        rel = _rel(entry.path, root_prefix)
+        st = entry.stat(follow_symlinks=False)
+        stats["scanned"] += 1
+        stats["scanned_bytes"] += st.st_size
+        if index.mark(rel):
+            return
+        if st.st_mtime > cutoff:
+            stats["young"] += 1
+            return
+        stats["orphans"] += 1
+        stats["orphan_bytes"] += st.st_size
+        if len(stats["orphan_paths"]) < MAX_LISTED:
+            stats["orphan_paths"].append(rel)
+        if action == "report":
+            return
+        try:
+            if action == "delete":
+                os.unlink(entry.path)
+            else:
+                _quarantine(entry.path, rel, quarantine_dir)
+            stats["reclaimed_bytes"] += st.st_size
+        except OSError:
+            stats["errors"] += 1
+
+    months = _month_dirs(uploads_dir)
+    start = get_cursor(db) if resume else None
+    if start:
+        months = [m for m in months if m > start]
+    full = not months or not start
+    if full:
+        # a new pass over the whole tree
+        months = _month_dirs(uploads_dir)
+        for entry in _loose_files(uploads_dir):
+            visit(entry)
+    walked = set()
+    for month in months:
+        for entry in _walk(str(uploads_dir / month)):
+            visit(entry)
+        walked.add(month)
+        if max_files and stats["scanned"] >= max_files and month != months[-1]:
+            stats["cursor"] = month
+            full = False
+            break
+    stats["months"] = len(walked)
+    if resume:
+        # None: the pass reached the end, the next run starts over
+        set_cursor(db, stats["cursor"])
+
+    # references whose file was not found; a partial run only judges the months it walked
+    prefix = uploads_dir.relative_to(media_root).as_posix() + "/"
+    for path, table, row_id in referenced(db):
+        if path.startswith(prefix):
+            if index.was_seen(path):
+                continue
+            if not full and "/".join(path[len(prefix):].split("/")[:2]) not in walked:
+                continue
+        elif (media_root / path).is_file():
+            continue
+        stats["dangling"] += 1
+        if len(stats["dangling_refs"]) < MAX_LISTED:
+            stats["dangling_refs"].append({"path": path, "table": table, "id": row_id})
+    stats["seconds"] = round(time.perf_counter() - t0, 3)
+    return stats
+
+
+def purge_quarantine(quarantine_dir: Path, days: float) -> Tuple[int, int]:
+    """Delete quarantined files older than `days`; (files, bytes) removed."""
+    if not quarantine_dir.is_dir():
+        return 0, 0
+    cutoff = time.time() - days * 86400
+    files = size = 0
+    for entry in _walk(str(quarantine_dir)):
+        st = entry.stat(follow_symlinks=False)
+        if st.st_mtime < cutoff:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                continue
+            files += 1
+            size += st.st_size
+    # drop directories the purge emptied, deepest first
+    for dirpath, _, _ in os.walk(quarantine_dir, topdown=False):
+        if dirpath != str(quarantine_dir):
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass  # not empty
+    return files, size
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# Minimal Prometheus-style registry. Numbers are per process: with several
+# workers each one reports its own, like prometheus_client without multiprocess mode.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, doc, labelnames=()):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Settable gauge, or a callback gauge whose samples are read at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, doc, labelnames=(), fn: Optional[Callable[[], Iterable[Tuple[tuple, float]]]] = None):
+        super().__init__(name, doc, labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._fn = fn
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def inc(self, amount: float = 1, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, amount: float = 1, *labelvalues: str) -> None:
+        self.inc(-amount, *labelvalues)
+
+    def samples(self):
+        if self._fn is not None:
+            try:
+                items = sorted(self._fn())
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(buckets)
+        # labelvalues -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labelvalues)
+            if row is None:
+                row = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        out = []
+        for k, row in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += n
+                le = 'le="%s"' % _fmt(bound)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {cumulative}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {cumulative}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_fmt(row[-1])}")
+        return out
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUESTS = Counter("komodo_http_requests_total", "HTTP responses by route template and status.", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("komodo_http_request_duration_seconds", "Time to the last response byte, by route template.", ("method", "route"))
+HTTP_RESPONSE_SIZE = Histogram("komodo_http_response_size_bytes", "Response body size by route template.", ("route",), SIZE_BUCKETS)
+HTTP_IN_FLIGHT = Gauge("komodo_http_requests_in_flight", "Requests currently being handled.")
+WIKIDATA_LATENCY = Histogram("komodo_wikidata_request_duration_seconds", "Wikidata SPARQL lookups by outcome.", ("outcome",))
+UPLOAD_BYTES = Counter("komodo_upload_bytes_total", "Bytes of photos written to media/uploads.")
+UPLOADS = Counter("komodo_uploads_total", "Photos written to media/uploads.")
+JOBS = Counter("komodo_jobs_total", "Background jobs run by this process, by kind and outcome (done|retry|failed).", ("kind", "outcome"))
+JOB_DURATION = Histogram("komodo_job_duration_seconds", "Background job run time by kind.", ("kind",))
+
+
+def _pool_samples():
+    from .db import engine, read_engine, async_engines
+
+    engines = [("write", engine), ("read", read_engine)]
+    if async_engines.cache_info().currsize:
+        aw, ar = async_engines()
+        engines += [("async_write", aw.sync_engine), ("async_read", ar.sync_engine)]
+    seen = set()
+    for label, eng in engines:
+        pool = eng.pool
+        if id(pool) in seen or not hasattr(pool, "checkedout"):
+            continue
+        seen.add(id(pool))
+        yield (label, "checked_out"), pool.checkedout()
+        yield (label, "idle"), pool.checkedin()
+        yield (label, "size"), pool.size()
+        yield (label, "overflow"), max(0, pool.overflow())
+
+
+def _threadpool_samples():
+    # the limiter belongs to the running event loop; scraped from an async route
+    import anyio.to_thread
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    yield ("busy",), limiter.borrowed_tokens
+    yield ("total",), limiter.total_tokens
+    yield ("waiting",), limiter.statistics().tasks_waiting
+
+
+def _page_cache_samples():
+    from .page_cache import cache
+
+    yield ("bytes",), cache.size
+    yield ("entries",), len(cache)
+
+
+DB_POOL = Gauge("komodo_db_pool_connections", "Database connections per pool and state.", ("pool", "state"), fn=_pool_samples)
+THREADPOOL = Gauge("komodo_threadpool_threads", "Threadpool for sync routes: busy/total threads and tasks waiting.", ("state",), fn=_threadpool_samples)
+PAGE_CACHE = Counter("komodo_page_cache_requests_total", "Anonymous page requests served from (hit) or added to (miss) the page cache.", ("route", "result"))
+PAGE_CACHE_SIZE = Gauge("komodo_page_cache_size", "Rendered pages held by the page cache.", ("unit",), fn=_page_cache_samples)
+
+
+def render() -> str:
+    return "\n".join(m.render() for m in REGISTRY) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: per-route latency, status, size and in-flight counts.
+
+    Routes are labelled by their template ("/report/{report_id}"), read from
+    the scope after routing, so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._mounts: Optional[List[Tuple[str, str]]] = None
+
+    def _route_label(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        if self._mounts is None:
+            from starlette.routing import Mount
+
+            router = scope.get("router")
+            if router is None:
+                # failed before routing
+                return "<unmatched>"
+            routes = router.routes
+            self._mounts = [(m.path + "/", m.path + "/{path}") for m in routes if isinstance(m, Mount)]
+        path = scope.get("path", "")
+        for prefix, label in self._mounts:
+            if path.startswith(prefix):
+                return label
+        return "<unmatched>"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = self._route_label(scope)
+            method = scope["method"]
+            HTTP_LATENCY.observe(time.perf_counter() - start, method, route)
+            HTTP_REQUESTS.inc(1, method, route, str(status))
+            HTTP_RESPONSE_SIZE.observe(size, route)
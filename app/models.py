@@ -12,6 +12,10 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     Text,
+    Index,
+    Float,
+    BigInteger,
+    Date,
 )
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -65,15 +69,32 @@ class SpeciesReport(Base):
     species_name = Column(String(200), nullable=False)
     description = Column(Text, nullable=True)
     location_text = Column(String(255), nullable=True)
+    # WGS84 degrees, submitted or looked up from location_text (see app.geo)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geo_source = Column(String(20), nullable=True)  # submitted|gazetteer
     photo_paths = Column(Text, nullable=True)  # JSON stored as simple comma-separated for simplicity
     status = Column(String(20), default=ReportStatus.pending.value, index=True)
     review_note = Column(Text, nullable=True)
     reviewed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # moderation lease: who is currently reviewing this report and until when
+    claimed_by = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    claim_expires_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     reporter = relationship("User", back_populates="reports", foreign_keys=[reporter_id])
     reviewer = relationship("User", foreign_keys=[reviewed_by])
+    claimer = relationship("User", foreign_keys=[claimed_by])
+
+    __table_args__ = (
+        # export / incremental sync order: approved rows by (updated_at, id)
+        Index("ix_species_reports_status_updated", "status", "updated_at", "id"),
+        # incremental sync (`since`): changes of any status, for tombstones
+        Index("ix_species_reports_updated", "updated_at", "id"),
+        # feeds, newest first (and the /api/v1 keyset cursor)
+        Index("ix_species_reports_status_created", "status", "created_at", "id"),
+    )
 
 
 class PointsLedger(Base):
@@ -149,3 +170,107 @@ class Redemption(Base):
     status = Column(String(20), default="pending", nullable=False)
     shipping_text = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ReviewAction(Base):
+    __tablename__ = "review_actions"
+
+    id = Column(Integer, primary_key=True)
+    moderator_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    report_id = Column(Integer, nullable=False)  # no FK: history survives report deletion
+    action = Column(String(20), nullable=False)  # approve|reject|revoke|pending|delete
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class UserStats(Base):
+    """Per-user counters kept in step with reports, donations and the points ledger."""
+
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_reports = Column(Integer, default=0, nullable=False)
+    approved_reports = Column(Integer, default=0, nullable=False)
+    donations_cents = Column(Integer, default=0, nullable=False)
+    points = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class AppMeta(Base):
+    """Small key/value store for app bookkeeping (e.g. the recorded bootstrap fingerprint)."""
+
+    __tablename__ = "app_meta"
+
+    key = Column(String(50), primary_key=True)
+    value = Column(Text, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class Job(Base):
+    """Background work queued by request handlers and run by app.jobs workers."""
+
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(50), nullable=False, index=True)
+    payload = Column(Text, nullable=True)  # JSON
+    result = Column(Text, nullable=True)  # JSON returned by the handler
+    priority = Column(Integer, default=0, nullable=False)  # higher runs first
+    status = Column(String(20), default="queued", nullable=False)  # queued|running|done|failed
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    # the same key enqueued twice yields one job (while the first one is kept)
+    idempotency_key = Column(String(200), unique=True, nullable=True)
+    last_error = Column(Text, nullable=True)
+    run_after = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # lease of the worker running it; an expired lease makes the job claimable again
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
+
+    __table_args__ = (
+        # worker claim order
+        Index("ix_jobs_claim", "status", "priority", "run_after"),
+    )
+
+
+class PhotoHash(Base):
+    """Perceptual hash of one report photo, for the duplicate check in app.photo_hash."""
+
+    __tablename__ = "photo_hashes"
+
+    id = Column(Integer, primary_key=True)
+    report_id = Column(Integer, ForeignKey("species_reports.id"), index=True, nullable=False)
+    path = Column(String(500), nullable=False)
+    phash = Column(BigInteger, nullable=False)  # 64-bit dHash, stored signed
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # ids are never reused: in-memory indexes load new rows by id
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class TaxonCount(Base):
+    """Approved reports per taxon node and per species, kept in step by app.taxon_stats."""
+
+    __tablename__ = "taxon_counts"
+
+    rank = Column(String(20), primary_key=True)  # phylum|class_name|order_name|family|genus|species
+    key = Column(String(700), primary_key=True)  # "Chordata/Mammalia/..." down to the node
+    name = Column(String(200), nullable=False)
+    parent = Column(String(700), nullable=True, index=True)  # key of the parent taxon
+    approved = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index("ix_taxon_counts_rank_approved", "rank", "approved"),
+    )
+
+
+class TaxonDaily(Base):
+    """The same counts split by the day the reports were submitted."""
+
+    __tablename__ = "taxon_daily"
+
+    rank = Column(String(20), primary_key=True)
+    key = Column(String(700), primary_key=True)
+    day = Column(Date, primary_key=True)
+    approved = Column(Integer, default=0, nullable=False)
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+from sqlalchemy import select, update, or_, and_, func
+from sqlalchemy.orm import Session
+
+from .models import SpeciesReport, ReportStatus, ReviewAction, User
+
+
+CLAIM_LEASE_SECONDS = 15 * 60
+CLAIM_BATCH_DEFAULT = 10
+CLAIM_BATCH_MAX = 50
+
+
+def _claimable():
+    """Pending reports with no live lease."""
+    now = datetime.utcnow()
+    return and_(
+        SpeciesReport.status == ReportStatus.pending.value,
+        or_(SpeciesReport.claimed_by.is_(None), SpeciesReport.claim_expires_at < now),
+    )
+
+
+def claim_next(db: Session, moderator_id: int, n: int = CLAIM_BATCH_DEFAULT, lease_seconds: int = CLAIM_LEASE_SECONDS) -> List[SpeciesReport]:
+    """Atomically lease the oldest N unclaimed pending reports to a moderator.
+
+    The candidate selection and the lease write happen in one UPDATE statement,
+    so two moderators claiming at the same time never receive the same report
+    (on PostgreSQL the candidates are locked with SKIP LOCKED).
+    Live leases already held by the moderator are renewed and returned too.
+    """
+    n = max(1, min(int(n), CLAIM_BATCH_MAX))
+    expires = datetime.utcnow() + timedelta(seconds=lease_seconds)
+    candidates = (
+        select(SpeciesReport.id)
+        .where(_claimable())
+        .order_by(SpeciesReport.created_at.asc(), SpeciesReport.id.asc())
+        .limit(n)
+        # server databases: skip rows another claim is locking instead of queueing on them
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(SpeciesReport)
+        # re-checked on the locked rows, so a lease won by a concurrent claim is not overwritten
+        .where(SpeciesReport.id.in_(candidates), _claimable())
+        # a lease is not a content change: keep updated_at (ETags, export cursors)
+        .values(claimed_by=moderator_id, claim_expires_at=expires, updated_at=SpeciesReport.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(SpeciesReport)
+        .where(
+            SpeciesReport.claimed_by == moderator_id,
+            SpeciesReport.status == ReportStatus.pending.value,
+            SpeciesReport.claim_expires_at >= datetime.utcnow(),
+        )
+        .values(claim_expires_at=expires, updated_at=SpeciesReport.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return my_claims(db, moderator_id)
+
+
+def my_claims(db: Session, moderator_id: int) -> List[SpeciesReport]:
+    stmt = (
+        select(SpeciesReport)
+        .where(
+            SpeciesReport.claimed_by == moderator_id,
+            SpeciesReport.status == ReportStatus.pending.value,
+            SpeciesReport.claim_expires_at >= datetime.utcnow(),
+        )
+        .order_by(SpeciesReport.created_at.asc())
+    )
+    return db.execute(stmt).scalars().all()
+
+
+def release_claims(db: Session, moderator_id: int, report_ids: Iterable[int] | None = None) -> int:
+    """Give leases back to the pool; all of the moderator's leases if no ids are given."""
+    stmt = update(SpeciesReport).where(SpeciesReport.claimed_by == moderator_id)
+    if report_ids is not None:
+        stmt = stmt.where(SpeciesReport.id.in_(list(report_ids)))
+    res = db.execute(stmt.values(claimed_by=None, claim_expires_at=None, updated_at=SpeciesReport.updated_at)
+                     .execution_options(synchronize_session=False))
+    db.commit()
+    return res.rowcount or 0
+
+
+def claimed_by_other(rep: SpeciesReport, moderator_id: int) -> bool:
+    """True if another moderator holds a live lease on the report."""
+    if rep.claimed_by is None or rep.claimed_by == moderator_id:
+        return False
+    return bool(rep.claim_expires_at and rep.claim_expires_at >= datetime.utcnow())
+
+
+def record_review(db: Session, rep: SpeciesReport, moderator_id: int, action: str) -> None:
+    """Clear the lease on a reviewed report and log the action for throughput stats.
+
+    Does not commit; callers commit together with the status change.
+    """
+    rep.claimed_by = None
+    rep.claim_expires_at = None
+    db.add(ReviewAction(moderator_id=moderator_id, report_id=rep.id, action=action))
+
+
+def throughput_stats(db: Session, hours: int = 24) -> list[dict]:
+    """Per-moderator review counts over the last `hours`, plus live lease counts."""
+    since = datetime.utcnow() - timedelta(hours=hours)
+    reviewed = dict(
+        db.execute(
+            select(ReviewAction.moderator_id, func.count())
+            .where(ReviewAction.created_at >= since)
+            .group_by(ReviewAction.moderator_id)
+        ).all()
+    )
+    holding = dict(
+        db.execute(
+            select(SpeciesReport.claimed_by, func.count())
+            .where(
+                SpeciesReport.claimed_by.is_not(None),
+                SpeciesReport.status == ReportStatus.pending.value,
+                SpeciesReport.claim_expires_at >= datetime.utcnow(),
+            )
+            .group_by(SpeciesReport.claimed_by)
+        ).all()
+    )
+    ids = set(reviewed) | set(holding)
+    names = dict(db.execute(select(User.id, User.display_name).where(User.id.in_(ids))).all()) if ids else {}
+    out = []
+    for uid in ids:
+        cnt = int(reviewed.get(uid, 0))
+        out.append({
+            "moderator_id": uid,
+            "display_name": names.get(uid),
+            "reviewed": cnt,
+            "per_hour": round(cnt / float(hours), 2) if hours else float(cnt),
+            "claimed": int(holding.get(uid, 0)),
+        })
+    out.sort(key=lambda r: r["reviewed"], reverse=True)
+    return out
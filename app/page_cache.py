@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import AppMeta
+
+
+# Rendered pages for anonymous visitors, per process. Every entry is tagged
+# with the content version it was rendered under; moderation and edits store
+# a new version in app_meta, which other workers pick up within CHECK_SECONDS.
+
+MAX_BYTES = int(float(os.environ.get("KOMODO_PAGE_CACHE_MB", "32")) * 1024 * 1024)
+CHECK_SECONDS = float(os.environ.get("KOMODO_PAGE_CACHE_CHECK_S", "1.0"))
+VERSION_KEY = "content_version"
+# query parameters that change what "/" renders; everything else is ignored
+HOME_PARAMS = ("q", "phylum", "class_name", "order_name", "family", "genus")
+# response headers kept with a page and replayed on hits
+KEPT_HEADERS = ("ETag", "Last-Modified", "Cache-Control", "Vary")
+
+
+class PageCache:
+    """LRU of rendered bodies (with validators and precompressed variants)
+    bounded by total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # a single page may take at most a quarter of the budget
+        self.max_entry = max_bytes // 4
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[str, bytes, Dict[str, str], Dict[str, bytes]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version: str) -> Optional[Tuple[bytes, Dict[str, str], Dict[str, bytes]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2], entry[3]
+
+    def put(self, key: str, version: str, body: bytes, headers: Optional[Dict[str, str]] = None,
+            variants: Optional[Dict[str, bytes]] = None) -> None:
+        variants = variants or {}
+        size = len(body) + sum(len(v) for v in variants.values())
+        if size > self.max_entry:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (version, body, headers or {}, variants)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: str) -> None:
+        _, body, _, variants = self._entries.pop(key)
+        self.size -= len(body) + sum(len(v) for v in variants.values())
+
+
+cache = PageCache(MAX_BYTES)
+_version: Optional[str] = None
+_checked_at = 0.0
+
+
+def enabled() -> bool:
+    return MAX_BYTES > 0
+
+
+def home_key(query_params) -> str:
+    """'/' plus the parameters that affect the feed in a fixed order; empty ones
+    render like absent ones and are dropped."""
+    parts = [f"{name}={query_params[name]}" for name in HOME_PARAMS if query_params.get(name)]
+    return "/?" + "&".join(parts)
+
+
+def _set_version(value: str) -> None:
+    global _version, _checked_at
+    if value != _version:
+        cache.clear()
+    _version = value
+    _checked_at = time.monotonic()
+
+
+async def current_version(db) -> str:
+    """Content version from app_meta, re-read at most every CHECK_SECONDS.
+
+    `db` is an AsyncSession; it only touches the database when the local
+    copy is due for a refresh.
+    """
+    if _version is None or time.monotonic() - _checked_at >= CHECK_SECONDS:
+        value = await db.scalar(select(AppMeta.value).where(AppMeta.key == VERSION_KEY))
+        _set_version(value or "0")
+    return _version
+
+
+async def lookup(request, db, key: str, route: str):
+    """(version, cached response or None) for an anonymous request.
+
+    A hit is answered with 304 when the page carries an ETag the client
+    already has. Returns (None, None) when the visitor is signed in or the
+    cache is off, in which case nothing is stored either.
+    """
+    if not enabled() or request.session.get("user_id"):
+        return None, None
+    from starlette.responses import HTMLResponse
+    from . import compression, conditional, metrics
+
+    version = await current_version(db)
+    entry = cache.get(key, version)
+    metrics.PAGE_CACHE.inc(1, route, "hit" if entry is not None else "miss")
+    if entry is None:
+        return version, None
+    body, headers, variants = entry
+    if "ETag" in headers and conditional.is_fresh(request, headers["ETag"]):
+        return version, conditional.not_modified(headers)
+    headers = dict(headers)
+    body = compression.pick(request.headers.get("accept-encoding"), body, variants, headers)
+    return version, HTMLResponse(body, headers={**headers, "X-Page-Cache": "hit"})
+
+
+def store(key: str, version: Optional[str], response) -> None:
+    if version is not None and response.status_code == 200:
+        from . import compression
+
+        kept = {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers}
+        # compressed once here instead of on every hit
+        cache.put(key, version, response.body, kept, compression.precompress(response.body))
+        response.headers["X-Page-Cache"] = "miss"
+
+
+def bump(db: Session) -> None:
+    """Record a content change in the caller's transaction.
+
+    This process drops its pages once the transaction commits; other workers
+    notice the new version on their next check.
+    """
+    value = uuid.uuid4().hex
+    stmt = update(AppMeta).where(AppMeta.key == VERSION_KEY).values(value=value)
+    if not db.execute(stmt.execution_options(synchronize_session=False)).rowcount:
+        try:
+            with db.begin_nested():
+                db.add(AppMeta(key=VERSION_KEY, value=value))
+        except IntegrityError:
+            # another worker created the row first
+            db.execute(stmt.execution_options(synchronize_session=False))
+    event.listen(db, "after_commit", lambda session: _set_version(value), once=True)
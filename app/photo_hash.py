@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import io
+import os
+import threading
+from array import array
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import Session
+
+from .models import PhotoHash, SpeciesReport
+from .utils import MEDIA_ROOT, split_paths
+
+try:  # optional: no duplicate detection without it
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    Image = None
+
+
+# Likely duplicate photos. Each report photo gets a 64-bit difference hash
+# (dHash), which survives re-encoding, resizing and small edits. Lookups use
+# multi-index hashing: the hash is split into four 16-bit bands, and each
+# band has a table from value to photos. Two hashes within Hamming distance
+# d agree within d // 4 bits on at least one band, so probing each table
+# with the band value and its few bit flips finds every candidate; only
+# candidates get the exact distance check. The tables live in memory (about
+# 40 bytes per photo), are loaded on first use and topped up from
+# photo_hashes by id (looking back REREAD_WINDOW ids for late commits
+# outside SQLite), so a lookup costs well under a millisecond at
+# millions of photos. Hits are confirmed against the table, which drops
+# hashes deleted since they were loaded.
+
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+# at most this many differing bits counts as the same picture
+MAX_DISTANCE = int(os.environ.get("KOMODO_DUPLICATE_DISTANCE", "6"))
+# hashes of near-blank images match too much to be useful
+MIN_BITS_SET = 4
+# bound on a single lookup, should one band value be very common
+CANDIDATE_LIMIT = 5000
+MAX_LISTED = 5
+LOAD_BATCH = 10000
+# ids below the newest loaded one that are read again (not on SQLite)
+REREAD_WINDOW = 2000
+_MASK = (1 << HASH_BITS) - 1
+_BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def dhash(data: bytes) -> Optional[int]:
+    """64-bit difference hash of an image; None if it cannot be decoded."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            # JPEG decodes at reduced scale, far cheaper than a full decode
+            img.draft("L", (64, 64))
+            small = img.convert("L").resize((9, 8), Image.BILINEAR)
+            px = small.tobytes()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    h = 0
+    for row in range(8):
+        line = px[row * 9:row * 9 + 9]
+        for col in range(8):
+            h = (h << 1) | (line[col] < line[col + 1])
+    return h
+
+
+def _signed(h: int) -> int:
+    return h - (1 << HASH_BITS) if h >= 1 << (HASH_BITS - 1) else h
+
+
+def _unsigned(h: int) -> int:
+    return h & _MASK
+
+
+def bands(h: int) -> List[int]:
+    return [(h >> (BAND_BITS * (BANDS - 1 - i))) & _BAND_MASK for i in range(BANDS)]
+
+
+def _neighbours(value: int, radius: int) -> List[int]:
+    out = [value]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), r):
+            v = value
+            for b in bits:
+                v ^= 1 << b
+            out.append(v)
+    return out
+
+
+def distance(a: int, b: int) -> int:
+    return ((a ^ b) & _MASK).bit_count()
+
+
+def row_for(report_id: int, path: str, h: int) -> PhotoHash:
+    return PhotoHash(report_id=report_id, path=path, phash=_signed(h))
+
+
+def index_report(db: Session, report: SpeciesReport) -> int:
+    """(Re)compute the hashes of a report's photos; returns how many were stored.
+
+    Blocking file reads and decoding: call from a job or a script.
+    """
+    db.execute(delete(PhotoHash).where(PhotoHash.report_id == report.id))
+    stored = 0
+    for path in split_paths(report.photo_paths):
+        try:
+            data = (MEDIA_ROOT / path).read_bytes()
+        except OSError:
+            continue
+        h = dhash(data)
+        if h is not None:
+            db.add(row_for(report.id, path, h))
+            stored += 1
+    return stored
+
+
+def forget(db: Session, report_ids: Iterable[int]) -> None:
+    ids = list(report_ids)
+    if ids:
+        db.execute(delete(PhotoHash).where(PhotoHash.report_id.in_(ids)))
+
+
+def enqueue(db: Session, report_ids: Iterable[int]) -> None:
+    """Queue hashing of these reports' photos in the caller's transaction."""
+    from . import jobs
+
+    ids = list(report_ids)
+    if ids and available():
+        jobs.enqueue(db, "photo.hash", {"report_ids": ids})
+
+
+class HashIndex:
+    """In-memory multi-index tables over photo_hashes, appended to by row id."""
+
+    def __init__(self):
+        self.row_ids = array("q")
+        self.hashes = array("Q")
+        # per band: band value -> positions in row_ids/hashes
+        self.tables: List[Dict[int, array]] = [{} for _ in range(BANDS)]
+        self.last_id = 0
+        # ids loaded within the re-read window, so they are not added twice
+        self._recent: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def refresh(self, db: Session) -> None:
+        """Load rows added since the last refresh (all of them the first time)."""
+        # SQLite has one writer at a time, so ids commit in order; elsewhere a
+        # slow transaction can commit an id below last_id, so look back a bit
+        window = 0 if db.get_bind().dialect.name == "sqlite" else REREAD_WINDOW
+        with self._lock:
+            result = db.connection().execute(
+                text("SELECT id, phash FROM photo_hashes WHERE id > :last ORDER BY id"),
+                {"last": max(0, self.last_id - window)})
+            while True:
+                rows = result.fetchmany(LOAD_BATCH)
+                if not rows:
+                    break
+                if window:
+                    rows = [r for r in rows if r[0] not in self._recent]
+                    self._recent.update(r[0] for r in rows)
+                if rows:
+                    self._extend(rows)
+                if window:
+                    floor = self.last_id - window
+                    self._recent = {i for i in self._recent if i > floor}
+
+    def _extend(self, rows: List[tuple]) -> None:
+        start = len(self.hashes)
+        self.row_ids.extend(r[0] for r in rows)
+        self.hashes.extend(r[1] & _MASK for r in rows)
+        hashes = self.hashes
+        # one pass per band with locals bound: this loop is the cold-load cost
+        for b, table in enumerate(self.tables):
+            shift = BAND_BITS * (BANDS - 1 - b)
+            get = table.get
+            for pos in range(start, len(hashes)):
+                value = (hashes[pos] >> shift) & _BAND_MASK
+                slot = get(value)
+                if slot is None:
+                    table[value] = array("I", (pos,))
+                else:
+                    slot.append(pos)
+        self.last_id = max(self.last_id, rows[-1][0])
+
+    def search(self, h: int, max_distance: int = MAX_DISTANCE) -> List[Tuple[int, int]]:
+        """(photo_hashes id, distance) of loaded hashes within `max_distance`."""
+        radius = max_distance // BANDS
+        hashes, seen, out = self.hashes, set(), []
+        with self._lock:
+            for table, value in zip(self.tables, bands(h)):
+                for probe in _neighbours(value, radius):
+                    for pos in table.get(probe, ()):
+                        if pos in seen:
+                            continue
+                        seen.add(pos)
+                        d = (hashes[pos] ^ h).bit_count()
+                        if d <= max_distance:
+                            out.append((self.row_ids[pos], d))
+                    if len(seen) >= CANDIDATE_LIMIT:
+                        return out
+        return out
+
+
+index = HashIndex()
+
+
+def _confirm(db: Session, row_ids: Iterable[int]) -> Dict[int, tuple]:
+    """photo_hashes id -> (report_id, path, title, status) for hits still in the table."""
+    ids = list(set(row_ids))
+    if not ids:
+        return {}
+    P, R = PhotoHash, SpeciesReport
+    rows = db.execute(
+        select(P.id, P.report_id, P.path, R.title, R.status).join(R, R.id == P.report_id).where(P.id.in_(ids))
+    ).all()
+    return {r.id: (r.report_id, r.path, r.title, r.status) for r in rows}
+
+
+def _searchable(h: int) -> bool:
+    return MIN_BITS_SET <= h.bit_count() <= HASH_BITS - MIN_BITS_SET
+
+
+def similar(db: Session, h: int, max_distance: int = MAX_DISTANCE,
+            exclude_report: Optional[int] = None) -> List[Tuple[int, str, int]]:
+    """(report_id, path, distance) of stored photos within `max_distance`, closest first."""
+    if not _searchable(h):
+        return []
+    index.refresh(db)
+    hits = index.search(h, max_distance)
+    rows = _confirm(db, (row_id for row_id, _ in hits))
+    out = [(rows[row_id][0], rows[row_id][1], d) for row_id, d in hits
+           if row_id in rows and rows[row_id][0] != exclude_report]
+    out.sort(key=lambda t: (t[2], t[0]))
+    return out
+
+
+def duplicates(db: Session, report_ids: Iterable[int], max_distance: int = MAX_DISTANCE) -> Dict[int, List[dict]]:
+    """Likely duplicates of each report's photos among all other reports.
+
+    {report_id: [{"id", "title", "status", "photo", "match", "distance"}]},
+    closest first, one entry per other report. Reports whose photos are not
+    hashed yet (or at all, without Pillow) are missing from the result.
+    """
+    ids = list(report_ids)
+    if not ids:
+        return {}
+    own = db.execute(select(PhotoHash.report_id, PhotoHash.path, PhotoHash.phash)
+                     .where(PhotoHash.report_id.in_(ids))).all()
+    if not own:
+        return {}
+    index.refresh(db)
+    searched = [(report_id, path, index.search(_unsigned(stored), max_distance))
+                for report_id, path, stored in own if _searchable(_unsigned(stored))]
+    # one confirming query for the whole page
+    rows = _confirm(db, (row_id for _, _, hits in searched for row_id, _ in hits))
+    best: Dict[int, Dict[int, dict]] = {}
+    for report_id, path, hits in searched:
+        for row_id, d in hits:
+            if row_id not in rows:
+                continue
+            other, match, title, status = rows[row_id]
+            if other == report_id:
+                continue
+            seen = best.setdefault(report_id, {}).get(other)
+            if seen is None or d < seen["distance"]:
+                best[report_id][other] = {"id": other, "title": title, "status": status,
+                                          "photo": path, "match": match, "distance": d}
+    return {
+        report_id: sorted(found.values(), key=lambda x: (x["distance"], x["id"]))[:MAX_LISTED]
+        for report_id, found in best.items()
+    }
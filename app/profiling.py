@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import functools
+import inspect
+import io
+import linecache
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+
+PROFILE_HEADER = b"x-komodo-profile"
+PROFILE_PARAM = "_profile"
+# values of the parameter or header that turn profiling on
+PROFILE_ON = {"1", "true", "yes", "on"}
+REPORT_LINES = 60
+# innermost source line of a thread that is waiting rather than working
+IDLE_CALLS = (".get(", ".wait(", ".select(", ".acquire(", ".poll(", ".accept(")
+
+_active: ContextVar[Optional[cProfile.Profile]] = ContextVar("komodo_profiler", default=None)
+
+
+class _ProfiledCoroutine:
+    """Drives a coroutine with the profiler enabled only while it runs.
+
+    Other tasks on the event loop run between the steps, so they stay out of
+    the report.
+    """
+
+    def __init__(self, coro, prof: cProfile.Profile):
+        self.coro = coro
+        self.prof = prof
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            self.prof.enable()
+            try:
+                if error is not None:
+                    step = self.coro.throw(error)
+                else:
+                    step = self.coro.send(value)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.prof.disable()
+            try:
+                value, error = (yield step), None
+            except BaseException as e:  # delivered into the coroutine on the next step
+                value, error = None, e
+
+
+def wrap_endpoint(fn):
+    """Route endpoint that runs under the request's profiler when one is active.
+
+    Sync endpoints run on a threadpool thread, so the profiler is enabled in
+    that thread around the call. Without an active profiler the cost is one
+    ContextVar lookup.
+    """
+    signature = inspect.signature(fn, eval_str=True)
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def endpoint(*args, **kwargs):
+            prof = _active.get()
+            if prof is None:
+                return await fn(*args, **kwargs)
+            return await _ProfiledCoroutine(fn(*args, **kwargs), prof)
+    else:
+        @functools.wraps(fn)
+        def endpoint(*args, **kwargs):
+            prof = _active.get()
+            if prof is None:
+                return fn(*args, **kwargs)
+            prof.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                prof.disable()
+    # resolved annotations: FastAPI would otherwise evaluate them in this module's globals
+    endpoint.__signature__ = signature
+    return endpoint
+
+
+class ProfilingRoute(APIRoute):
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, wrap_endpoint(endpoint), **kwargs)
+
+
+def profiles_dir() -> Path:
+    from .db import DATA_DIR
+
+    d = DATA_DIR / "profiles"
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def _safe_name(s: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", s).strip("_")[:60] or "root"
+
+
+def report_name(label: str) -> str:
+    return f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{_safe_name(label)}"
+
+
+def write_report(prof: cProfile.Profile, name: str, label: str, elapsed: float) -> None:
+    """Store the raw stats (.prof, for snakeviz/pstats) and a text call tree."""
+    d = profiles_dir()
+    prof.dump_stats(str(d / f"{name}.prof"))
+    out = io.StringIO()
+    out.write(f"{label}  {elapsed * 1000:.1f} ms wall\n\n")
+    stats = pstats.Stats(prof, stream=out)
+    stats.sort_stats("cumulative").print_stats(REPORT_LINES)
+    # who calls what, for the app's own functions (routes, filters, helpers)
+    stats.print_callees(r"[\\/]app[\\/]")
+    (d / f"{name}.txt").write_text(out.getvalue(), encoding="utf-8")
+
+
+def _is_admin(user_id) -> bool:
+    from .db import SessionLocal
+    from .models import User
+
+    with SessionLocal() as db:
+        user = db.get(User, user_id)
+        return bool(user and user.is_admin)
+
+
+def _requested(scope) -> bool:
+    query = scope.get("query_string", b"")
+    # cheap test first: most requests carry no such text at all
+    if PROFILE_PARAM.encode() in query:
+        values = parse_qs(query.decode("latin-1")).get(PROFILE_PARAM)
+        if values and values[-1].strip().lower() in PROFILE_ON:
+            return True
+    return any(k == PROFILE_HEADER and v.decode("latin-1").strip().lower() in PROFILE_ON
+               for k, v in scope.get("headers", ()))
+
+
+class ProfilingMiddleware:
+    """Profile one request when an admin adds ?_profile=1 or an X-Komodo-Profile header.
+
+    Must sit inside SessionMiddleware (it reads the session). The response
+    gets an X-Profile-Report header naming the report under /admin/profiles.
+    Requests without the flag pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+        from starlette.concurrency import run_in_threadpool
+
+        uid = scope.get("session", {}).get("user_id")
+        if not uid or not await run_in_threadpool(_is_admin, uid):
+            await self.app(scope, receive, send)
+            return
+
+        prof = cProfile.Profile()
+        label = f"{scope['method']} {scope.get('path', '')}"
+        name = report_name(label)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-report", name.encode())]
+            await send(message)
+
+        token = _active.set(prof)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _active.reset(token)
+            await run_in_threadpool(write_report, prof, name, label, time.perf_counter() - start)
+
+
+class StackSampler:
+    """Statistical profiler: samples every thread's stack at a fixed interval.
+
+    Aggregates across all requests in the window. Output is collapsed stacks
+    (flamegraph.pl / speedscope format) plus the hottest functions.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{Path(code.co_filename).name}:{code.co_name}"
+
+    @classmethod
+    def busy(cls) -> bool:
+        return cls._lock.locked()
+
+    @staticmethod
+    def _idle(frame) -> bool:
+        """Thread parked in a blocking call: idle pool workers, driver threads, the loop's select()."""
+        line = linecache.getline(frame.f_code.co_filename, frame.f_lineno)
+        return any(token in line for token in IDLE_CALLS)
+
+    def run(self, seconds: float) -> None:
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("a sampling session is already running")
+        try:
+            me = threading.get_ident()
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    if self._idle(frame):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(self._frame_label(frame))
+                        frame = frame.f_back
+                    self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+                time.sleep(self.interval)
+        finally:
+            self._lock.release()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def top(self, n: int = 30) -> list:
+        """Hottest functions by self time, as a share of busy samples."""
+        self_time: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_time[frames[-1]] += count
+            for f in set(frames):
+                total[f] += count
+        busy = sum(self.stacks.values()) or 1
+        return [
+            {"function": f, "self_pct": round(100.0 * self_time[f] / busy, 1), "total_pct": round(100.0 * total[f] / busy, 1)}
+            for f, _ in self_time.most_common(n)
+        ]
+
+    def save(self) -> str:
+        name = report_name("sample")
+        (profiles_dir() / f"{name}.collapsed").write_text(self.collapsed(), encoding="utf-8")
+        return name
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+logger = logging.getLogger("komodo.sql")
+
+SLOW_QUERY_MS = float(os.environ.get("KOMODO_SLOW_QUERY_MS", "200"))
+# identical statements per request before it is reported as a likely N+1
+NPLUS1_THRESHOLD = int(os.environ.get("KOMODO_NPLUS1_THRESHOLD", "5"))
+SERVER_TIMING = os.environ.get("KOMODO_SERVER_TIMING", "0").strip().lower() in {"1", "on", "true"}
+
+
+class QueryStats:
+    """Statements seen while this tracker was active."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+        self.slow: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, params, elapsed: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds += elapsed
+            self.statements[statement] += 1
+            if elapsed * 1000 >= SLOW_QUERY_MS:
+                self.slow.append({"statement": statement, "params": params, "ms": round(elapsed * 1000, 2)})
+
+    def repeated(self, threshold: int = NPLUS1_THRESHOLD) -> Dict[str, int]:
+        """Statements executed at least `threshold` times: likely N+1 loads."""
+        return {s: n for s, n in self.statements.items() if n >= threshold}
+
+    def assert_max_queries(self, n: int) -> None:
+        if self.count > n:
+            raise AssertionError(f"{self.count} queries, expected at most {n}:\n" + self._summary())
+
+    def assert_no_nplus1(self, threshold: int = NPLUS1_THRESHOLD) -> None:
+        rep = self.repeated(threshold)
+        if rep:
+            raise AssertionError("repeated statements (likely N+1):\n" + "\n".join(f"{n}x {s}" for s, n in rep.items()))
+
+    def _summary(self) -> str:
+        return "\n".join(f"{n}x {s}" for s, n in self.statements.most_common())
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("komodo_query_stats", default=None)
+# process-wide trackers from track_queries(); see its docstring
+_captures: List[QueryStats] = []
+
+
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("komodo_query_t0", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("komodo_query_t0")
+    if not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, parameters, elapsed)
+    for cap in _captures:
+        cap.record(statement, parameters, elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("slow query %.1f ms%s: %s params=%r", elapsed * 1000,
+                       f" [{stats.label}]" if stats is not None else "", statement, parameters)
+
+
+def install() -> None:
+    """Listen on every Engine (sync, async and scripts alike). Idempotent."""
+    if not event.contains(Engine, "before_cursor_execute", _before):
+        event.listen(Engine, "before_cursor_execute", _before)
+        event.listen(Engine, "after_cursor_execute", _after)
+
+
+@contextmanager
+def track_queries(label: str = "") -> Iterator[QueryStats]:
+    """Capture statements for a block of code, e.g. as a test assertion helper:
+
+        with track_queries() as q:
+            client.get("/")
+        q.assert_max_queries(4)
+        q.assert_no_nplus1()
+
+    Statements from every thread are captured, so requests made through
+    TestClient (which runs the app on another thread) are included.
+    """
+    install()
+    stats = QueryStats(label)
+    _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _captures.remove(stats)
+
+
+class QueryTraceMiddleware:
+    """Pure ASGI middleware: per-request query count/time and N+1 warnings.
+
+    With KOMODO_SERVER_TIMING=1 the response carries a Server-Timing header
+    (db time and query count up to the moment headers are sent, plus total).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        install()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats(f"{scope['method']} {scope.get('path', '')}")
+        token = _current.set(stats)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if SERVER_TIMING and message["type"] == "http.response.start":
+                timing = (f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries", '
+                          f"app;dur={(time.perf_counter() - start) * 1000:.1f}")
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            rep = stats.repeated()
+            if rep:
+                route = scope.get("route")
+                where = f"{scope['method']} {route.path if route is not None else scope.get('path', '')}"
+                for statement, n in rep.items():
+                    logger.warning("likely N+1 in %s: %d x %s", where, n, " ".join(statement.split()))
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from typing import Iterable, List
+
+from sqlalchemy import Table, inspect, literal, text
+from sqlalchemy.engine import Connection
+
+from .models import SpeciesReport, User
+
+
+# Columns added after the first release; older databases get them via ALTER TABLE.
+SPECIES_REPORT_COLUMNS = [
+    "phylum",
+    "class_name",
+    "order_name",
+    "family",
+    "genus",
+    "claimed_by",
+    "claim_expires_at",
+    "latitude",
+    "longitude",
+    "geo_source",
+]
+USER_COLUMNS = [
+    "avatar_url",
+    "gender",
+    "bio",
+    "city",
+    "theme",
+    "favorites",
+    "public_profile",
+    "last_active_at",
+]
+
+
+def existing_columns(conn: Connection, table: str) -> set:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _column_ddl(conn: Connection, table: Table, name: str) -> str:
+    """Column definition from the model, rendered for the connection's dialect.
+
+    Added columns are always nullable (existing rows have no value); a scalar
+    Python default becomes the server default so those rows get it.
+    """
+    col = table.c[name]
+    ddl = f"{conn.dialect.identifier_preparer.quote(name)} {col.type.compile(dialect=conn.dialect)}"
+    default = col.default
+    if default is not None and default.is_scalar:
+        value = literal(default.arg, col.type).compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {value}"
+    return ddl
+
+
+def add_missing_columns(conn: Connection, table: Table, names: Iterable[str]) -> List[str]:
+    have = existing_columns(conn, table.name)
+    added = []
+    for name in names:
+        if name not in have:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(conn, table, name)}"))
+            added.append(name)
+    return added
+
+
+def ensure_columns(conn: Connection) -> List[str]:
+    """Bring species_reports and users up to the current model; returns added columns."""
+    added = add_missing_columns(conn, SpeciesReport.__table__, SPECIES_REPORT_COLUMNS)
+    added += add_missing_columns(conn, User.__table__, USER_COLUMNS)
+    return added
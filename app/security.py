@@ -1,13 +1,18 @@
-from passlib.context import CryptContext
+from functools import lru_cache
 
 
-# Use pbkdf2_sha256 to avoid bcrypt backend issues on Windows/Py3.11
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+@lru_cache(maxsize=None)
+def _pwd_context():
+    # passlib is only needed on login/register; import it on first use to keep startup fast
+    from passlib.context import CryptContext
+
+    # Use pbkdf2_sha256 to avoid bcrypt backend issues on Windows/Py3.11
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    return pwd_context.verify(password, hashed)
+    return _pwd_context().verify(password, hashed)
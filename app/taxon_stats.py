@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, event, func, insert, select, true, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import AppMeta, ReportStatus, SpeciesReport, TaxonCount, TaxonDaily
+
+
+# Approved-report counts per taxon node (phylum ... genus) and per species,
+# in total (taxon_counts) and per submission day (taxon_daily). Moderation
+# hooks record +1/-1 deltas on the session; they are folded into one upsert
+# per table when the transaction commits, so a batch approval costs two
+# statements and the counts commit or roll back with the change itself.
+# Facets and the species pages read these tables only, never species_reports.
+
+RANKS = ("phylum", "class_name", "order_name", "family", "genus")
+SPECIES = "species"
+# every approved report, whatever its taxa
+ROOT = ("all", "", "All", None)
+SEP = "/"
+BUILT_KEY = "taxon_stats_built"
+REBUILD_BATCH = 5000
+_INFO_KEY = "taxon_deltas"
+
+Node = Tuple[str, str, str, Optional[str]]  # rank, key, name, parent key
+
+
+def nodes(taxa: Sequence[Optional[str]], species: Optional[str]) -> List[Node]:
+    """The nodes a report counts toward.
+
+    The root, then the taxa as a path that stops at the first missing
+    rank; the species hangs under the deepest taxon present.
+    """
+    out: List[Node] = [ROOT]
+    path: List[str] = []
+    parent = None
+    for rank, value in zip(RANKS, taxa):
+        value = (value or "").strip()
+        if not value:
+            break
+        path.append(value.replace(SEP, " "))
+        key = SEP.join(path)
+        out.append((rank, key, value, parent))
+        parent = key
+    name = (species or "").strip()
+    if name:
+        out.append((SPECIES, SEP.join(path + [name.replace(SEP, " ")]), name, parent))
+    return out
+
+
+def report_nodes(rep: SpeciesReport, species: Optional[str] = None) -> List[Node]:
+    taxa = (rep.phylum, rep.class_name, rep.order_name, rep.family, rep.genus)
+    return nodes(taxa, rep.species_name if species is None else species)
+
+
+def _day(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value or datetime.utcnow().date()
+
+
+# --- incremental updates ---------------------------------------------------
+
+def _record(db: Session, node_list: Iterable[Node], day: date, delta: int) -> None:
+    pending: Dict[tuple, int] = db.info.setdefault(_INFO_KEY, {})
+    for node in node_list:
+        k = (*node, day)
+        pending[k] = pending.get(k, 0) + delta
+
+
+def on_status_change(db: Session, rep: SpeciesReport, before: str | None) -> None:
+    """Count a report moving in or out of approved (call after setting rep.status)."""
+    was = before == ReportStatus.approved.value
+    now = rep.status == ReportStatus.approved.value
+    if was != now:
+        _record(db, report_nodes(rep), _day(rep.created_at), 1 if now else -1)
+
+
+def on_report_deleted(db: Session, rep: SpeciesReport) -> None:
+    if rep.status == ReportStatus.approved.value:
+        _record(db, report_nodes(rep), _day(rep.created_at), -1)
+
+
+def on_species_renamed(db: Session, rep: SpeciesReport, old_species: Optional[str]) -> None:
+    """Move an approved report's species count after an edit (call after setting the new name)."""
+    if rep.status == ReportStatus.approved.value and (old_species or "").strip() != (rep.species_name or "").strip():
+        day = _day(rep.created_at)
+        _record(db, [n for n in report_nodes(rep, old_species) if n[0] == SPECIES], day, -1)
+        _record(db, [n for n in report_nodes(rep) if n[0] == SPECIES], day, 1)
+
+
+def _upsert(db: Session, model, pk: Sequence[str], rows: List[dict]) -> None:
+    """Add each row's `approved` to the stored row, inserting missing ones."""
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=list(pk),
+                                          set_={"approved": table.c.approved + stmt.excluded.approved})
+        db.execute(stmt, rows)
+        return
+    for row in rows:
+        where = and_(*(table.c[k] == row[k] for k in pk))
+        stmt = update(table).where(where).values(approved=table.c.approved + row["approved"])
+        if db.execute(stmt).rowcount:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(table).values(**row))
+        except IntegrityError:
+            # inserted concurrently; add to it instead
+            db.execute(stmt)
+
+
+def flush(db: Session) -> None:
+    """Write the recorded deltas; runs on commit, callable earlier."""
+    pending = db.info.pop(_INFO_KEY, None)
+    if not pending:
+        return
+    totals: Dict[tuple, list] = {}
+    daily = []
+    for (rank, key, name, parent, day), delta in pending.items():
+        if not delta:
+            continue
+        daily.append({"rank": rank, "key": key, "day": day, "approved": delta})
+        entry = totals.setdefault((rank, key), [name, parent, 0])
+        entry[2] += delta
+    count_rows = [{"rank": rank, "key": key, "name": name, "parent": parent, "approved": n}
+                  for (rank, key), (name, parent, n) in totals.items() if n]
+    if count_rows:
+        _upsert(db, TaxonCount, ("rank", "key"), count_rows)
+    if daily:
+        _upsert(db, TaxonDaily, ("rank", "key", "day"), daily)
+
+
+@event.listens_for(Session, "before_commit")
+def _flush_on_commit(session: Session) -> None:
+    if session.info.get(_INFO_KEY):
+        flush(session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_on_rollback(session: Session, previous_transaction) -> None:
+    # a savepoint rolling back (e.g. jobs.enqueue meeting a duplicate key) keeps them
+    if previous_transaction.parent is None:
+        session.info.pop(_INFO_KEY, None)
+
+
+# --- full rebuild ----------------------------------------------------------
+
+def rebuild(db: Session) -> int:
+    """Recompute both tables from species_reports (one grouped scan) and commit.
+
+    For databases written outside the app and the first start after an
+    upgrade; returns the number of approved reports counted.
+    """
+    R = SpeciesReport
+    day = func.date(R.created_at)
+    stmt = (
+        select(R.phylum, R.class_name, R.order_name, R.family, R.genus, R.species_name, day, func.count())
+        .where(R.status == ReportStatus.approved.value)
+        .group_by(R.phylum, R.class_name, R.order_name, R.family, R.genus, R.species_name, day)
+    )
+    totals: Counter = Counter()
+    meta: Dict[tuple, tuple] = {}
+    daily: Counter = Counter()
+    node_cache: Dict[tuple, List[Node]] = {}
+    reports = 0
+    for *taxa, species, d, n in db.execute(stmt.execution_options(yield_per=REBUILD_BATCH)):
+        reports += n
+        d = _day(d)
+        # the same taxa and species recur on many days
+        ident = (*taxa, species)
+        node_list = node_cache.get(ident)
+        if node_list is None:
+            node_list = node_cache[ident] = nodes(taxa, species)
+            for rank, key, name, parent in node_list:
+                meta.setdefault((rank, key), (name, parent))
+        for rank, key, _, _ in node_list:
+            totals[(rank, key)] += n
+            daily[(rank, key, d)] += n
+    conn = db.connection()
+    conn.execute(delete(TaxonDaily))
+    conn.execute(delete(TaxonCount))
+    rows = [{"rank": r, "key": k, "name": meta[(r, k)][0], "parent": meta[(r, k)][1], "approved": n}
+            for (r, k), n in totals.items()]
+    for i in range(0, len(rows), REBUILD_BATCH):
+        conn.execute(TaxonCount.__table__.insert(), rows[i:i + REBUILD_BATCH])
+    rows = [{"rank": r, "key": k, "day": d, "approved": n} for (r, k, d), n in daily.items()]
+    for i in range(0, len(rows), REBUILD_BATCH):
+        conn.execute(TaxonDaily.__table__.insert(), rows[i:i + REBUILD_BATCH])
+    marker = db.get(AppMeta, BUILT_KEY)
+    if marker is None:
+        db.add(AppMeta(key=BUILT_KEY, value=datetime.utcnow().isoformat()))
+    else:
+        marker.value = datetime.utcnow().isoformat()
+    db.info.pop(_INFO_KEY, None)
+    db.commit()
+    return reports
+
+
+def ensure_built(db: Session) -> bool:
+    """Build the tables once, on the first start with them; True if it ran."""
+    if db.get(AppMeta, BUILT_KEY) is not None:
+        return False
+    rebuild(db)
+    return True
+
+
+# --- reads -----------------------------------------------------------------
+
+def facet_counts(db: Session) -> Dict[str, int]:
+    """{taxon key: approved reports} for every taxon node with any ("" is the total)."""
+    rows = db.execute(select(TaxonCount.key, TaxonCount.approved)
+                      .where(TaxonCount.rank != SPECIES, TaxonCount.approved > 0))
+    return {k: n for k, n in rows}
+
+
+def node(db: Session, key: str) -> Optional[TaxonCount]:
+    """The taxon node with this key ("" for the root)."""
+    return db.execute(select(TaxonCount).where(TaxonCount.key == key, TaxonCount.rank != SPECIES)).scalars().first()
+
+
+def children(db: Session, parent: Optional[str]) -> List[TaxonCount]:
+    """Taxon nodes directly under `parent` (phyla for None or ""), most reports first."""
+    stmt = select(TaxonCount).where(TaxonCount.rank != SPECIES, TaxonCount.approved > 0)
+    if not parent:
+        stmt = stmt.where(TaxonCount.rank == RANKS[0])
+    else:
+        stmt = stmt.where(TaxonCount.parent == parent)
+    return list(db.execute(stmt.order_by(TaxonCount.approved.desc(), TaxonCount.key)).scalars())
+
+
+def _under(key: Optional[str]):
+    if not key:
+        return true()
+    # keys below `key` sort between "key/" and "key0" ("0" follows "/")
+    return and_(TaxonCount.key > key + SEP, TaxonCount.key < key + chr(ord(SEP) + 1))
+
+
+def top_species(db: Session, under: Optional[str] = None, limit: int = 50) -> List[TaxonCount]:
+    stmt = (
+        select(TaxonCount)
+        .where(TaxonCount.rank == SPECIES, TaxonCount.approved > 0, _under(under))
+        .order_by(TaxonCount.approved.desc(), TaxonCount.key)
+        .limit(limit)
+    )
+    return list(db.execute(stmt).scalars())
+
+
+def recent(db: Session, keys: Iterable[Tuple[str, str]], days: int) -> Dict[str, int]:
+    """{key: approved reports submitted in the last `days` days} for (rank, key) pairs."""
+    pairs = list(keys)
+    if not pairs:
+        return {}
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    out: Dict[str, int] = {}
+    for rank in {r for r, _ in pairs}:
+        ks = [k for r, k in pairs if r == rank]
+        rows = db.execute(
+            select(TaxonDaily.key, func.sum(TaxonDaily.approved))
+            .where(TaxonDaily.rank == rank, TaxonDaily.key.in_(ks), TaxonDaily.day >= since)
+            .group_by(TaxonDaily.key)
+        )
+        out.update({k: int(n or 0) for k, n in rows})
+    return out
+
+
+def series(db: Session, rank: str, key: str, days: int) -> List[Tuple[date, int]]:
+    """Approved reports per submission day over the last `days` days, oldest first."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    stmt = select(TaxonDaily.day, TaxonDaily.approved).where(
+        TaxonDaily.rank == rank, TaxonDaily.key == key, TaxonDaily.day >= since)
+    counts = {_day(d): int(n or 0) for d, n in db.execute(stmt)}
+    return [(since + timedelta(days=i), counts.get(since + timedelta(days=i), 0)) for i in range(days)]
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from jinja2.bccache import Bucket, FileSystemBytecodeCache
+
+from .utils import _user_data_dir
+
+
+PRECOMPILED_DIRNAME = "template_cache"
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """Filesystem bytecode cache that survives relocation of the template dir.
+
+    Jinja keys buckets by template name *and* absolute filename. The frozen
+    build extracts templates to a fresh _MEIPASS temp dir on every launch, so
+    the stock cache would never hit. Keys here use the name only; each bucket
+    still carries a checksum of the source, so edited templates recompile.
+
+    Misses in the writable directory fall back to read-only precompiled
+    directories shipped with the build (see scripts/precompile_templates.py).
+    """
+
+    def __init__(self, directory: str, fallback_dirs: Optional[List[str]] = None):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(directory)
+        self.fallback_dirs = [d for d in (fallback_dirs or []) if os.path.isdir(d)]
+
+    def get_cache_key(self, name: str, filename: Optional[str] = None) -> str:
+        return super().get_cache_key(name)
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        super().load_bytecode(bucket)
+        if bucket.code is not None:
+            return
+        for d in self.fallback_dirs:
+            path = os.path.join(d, self.pattern % (bucket.key,))
+            try:
+                with open(path, "rb") as f:
+                    bucket.load_bytecode(f)
+            except OSError:
+                continue
+            if bucket.code is not None:
+                # promote into the writable cache for the next launch
+                self.dump_bytecode(bucket)
+                return
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            # read-only or full disk: rendering must not fail because of the cache
+            pass
+
+
+def cache_dir() -> Optional[Path]:
+    """KOMODO_TEMPLATE_CACHE overrides the location; "0" or "off" disables the cache."""
+    env = os.environ.get("KOMODO_TEMPLATE_CACHE")
+    if env is not None:
+        if env.strip().lower() in {"", "0", "off", "false"}:
+            return None
+        return Path(env)
+    return _user_data_dir() / "jinja_cache"
+
+
+def make_bytecode_cache(templates_dir: Path) -> Optional[TemplateBytecodeCache]:
+    d = cache_dir()
+    if d is None:
+        return None
+    try:
+        return TemplateBytecodeCache(str(d), [str(templates_dir.parent / PRECOMPILED_DIRNAME)])
+    except OSError:
+        return None
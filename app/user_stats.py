@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import event, insert, select, update, func, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import SpeciesReport, ReportStatus, Donation, PointsLedger, UserStats
+
+
+STAT_FIELDS = ("total_reports", "approved_reports", "donations_cents", "points")
+# users bumped in this transaction who have no row yet
+_MISSING_KEY = "user_stats_missing"
+
+
+def compute_user_stats(db: Session, user_id: int) -> dict:
+    """Aggregate a user's counters in SQL (one row per query, no ORM objects)."""
+    total, approved = db.execute(
+        select(
+            func.count(SpeciesReport.id),
+            func.coalesce(func.sum(case((SpeciesReport.status == ReportStatus.approved.value, 1), else_=0)), 0),
+        ).where(SpeciesReport.reporter_id == user_id)
+    ).one()
+    cents = db.execute(
+        select(func.coalesce(func.sum(Donation.amount_cents), 0)).where(Donation.user_id == user_id)
+    ).scalar()
+    points = db.execute(
+        select(func.coalesce(func.sum(PointsLedger.delta), 0)).where(PointsLedger.user_id == user_id)
+    ).scalar()
+    return {
+        "total_reports": int(total or 0),
+        "approved_reports": int(approved or 0),
+        "donations_cents": int(cents or 0),
+        "points": int(points or 0),
+    }
+
+
+def rebuild_user_stats(db: Session, user_id: int) -> dict:
+    """Recompute a user's row from the source tables and store it."""
+    data = compute_user_stats(db, user_id)
+    row = db.get(UserStats, user_id)
+    if row is None:
+        row = UserStats(user_id=user_id)
+    for k, v in data.items():
+        setattr(row, k, v)
+    row.updated_at = datetime.utcnow()
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError:
+        # another request created the row first; its counters are equally fresh
+        db.rollback()
+    return data
+
+
+def get_user_stats(db: Session, user_id: int) -> dict:
+    """Read the cached counters, or aggregate them in SQL for a user without a row.
+
+    Never writes: the row is created by the first change to the user's counters.
+    """
+    row = db.get(UserStats, user_id)
+    if row is None:
+        return compute_user_stats(db, user_id)
+    return {k: int(getattr(row, k) or 0) for k in STAT_FIELDS}
+
+
+def bump(db: Session, user_id: int, **deltas: int) -> None:
+    """Apply counter deltas in the caller's transaction.
+
+    A user without a stats row gets one when the transaction commits, built
+    from the source tables as they stand then, so this change included.
+    """
+    deltas = {k: int(v) for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    values = {k: getattr(UserStats, k) + v for k, v in deltas.items()}
+    values["updated_at"] = datetime.utcnow()
+    updated = db.execute(
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        missing: dict = db.info.setdefault(_MISSING_KEY, {})
+        pending = missing.setdefault(user_id, {})
+        for k, v in deltas.items():
+            pending[k] = pending.get(k, 0) + v
+
+
+def _create_missing(db: Session) -> None:
+    missing = db.info.pop(_MISSING_KEY, None)
+    if not missing:
+        return
+    # the aggregates below must see every change of this transaction
+    db.flush()
+    now = datetime.utcnow()
+    for user_id, deltas in missing.items():
+        if db.get(UserStats, user_id) is not None:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(UserStats).values(user_id=user_id, updated_at=now,
+                                                    **compute_user_stats(db, user_id)))
+        except IntegrityError:
+            # built concurrently from data without this transaction's changes; add them
+            db.execute(update(UserStats).where(UserStats.user_id == user_id).values(
+                updated_at=now, **{k: getattr(UserStats, k) + v for k, v in deltas.items()}))
+
+
+@event.listens_for(Session, "before_commit")
+def _create_on_commit(session: Session) -> None:
+    if session.info.get(_MISSING_KEY):
+        _create_missing(session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_on_rollback(session: Session, previous_transaction) -> None:
+    # a savepoint rolling back leaves the outer transaction's changes in place
+    if previous_transaction.parent is None:
+        session.info.pop(_MISSING_KEY, None)
+
+
+def on_status_change(db: Session, rep: SpeciesReport, before: str | None) -> None:
+    """Keep approved_reports in step with a report moving in or out of approved."""
+    was = before == ReportStatus.approved.value
+    now = rep.status == ReportStatus.approved.value
+    if was != now:
+        bump(db, rep.reporter_id, approved_reports=1 if now else -1)
+
+
+def on_report_deleted(db: Session, rep: SpeciesReport) -> None:
+    approved = -1 if rep.status == ReportStatus.approved.value else 0
+    bump(db, rep.reporter_id, total_reports=-1, approved_reports=approved)
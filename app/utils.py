@@ -9,6 +9,8 @@ from datetime import datetime
 from pathlib import Path
 from typing import Iterable, List
 
+from . import metrics
+
 
 def _app_base_dir() -> Path:
     if getattr(sys, 'frozen', False):
@@ -26,7 +28,9 @@ def _user_data_dir() -> Path:
 
 BASE_DIR = _app_base_dir()
 # For frozen app, write media to user data directory; else use repo media folder
-if getattr(sys, 'frozen', False):
+if os.environ.get('KOMODO_MEDIA_ROOT'):
+    MEDIA_ROOT = Path(os.environ['KOMODO_MEDIA_ROOT'])
+elif getattr(sys, 'frozen', False):
     MEDIA_ROOT = _user_data_dir() / 'media'
 else:
     MEDIA_ROOT = BASE_DIR / 'media'
@@ -42,7 +46,6 @@ def ensure_media_dirs() -> None:
 
 
 def save_upload(file_obj, subdir: str = "") -> str:
-    ensure_media_dirs()
     # Validate content type and size
     content_type = file_obj.content_type or mimetypes.guess_type(file_obj.filename)[0]
     if content_type not in ALLOWED_MIME:
@@ -51,18 +54,25 @@ def save_upload(file_obj, subdir: str = "") -> str:
     contents = file_obj.file.read()
     if len(contents) > MAX_FILE_SIZE:
         raise ValueError("File too large")
+    ext = os.path.splitext(file_obj.filename)[1].lower()
+    return save_bytes(contents, ext, subdir)
 
+
+def save_bytes(contents: bytes, ext: str, subdir: str = "") -> str:
+    """Write already-validated image bytes under uploads/YYYY/MM[/subdir]."""
+    ensure_media_dirs()
     dt = datetime.utcnow()
     folder = UPLOADS_DIR / dt.strftime("%Y/%m")
     if subdir:
         folder = folder / subdir
     folder.mkdir(parents=True, exist_ok=True)
 
-    ext = os.path.splitext(file_obj.filename)[1].lower()
     name = f"{uuid.uuid4().hex}{ext}"
     path = folder / name
     with open(path, "wb") as f:
         f.write(contents)
+    metrics.UPLOADS.inc()
+    metrics.UPLOAD_BYTES.inc(len(contents))
 
     rel_path = path.relative_to(MEDIA_ROOT).as_posix()
     return rel_path
@@ -78,13 +88,24 @@ def split_paths(path_str: str | None) -> List[str]:
     return [p for p in path_str.split(",") if p]
 
 
+def remove_media(rel_path: str) -> bool:
+    """Delete a file under MEDIA_ROOT; False if there was nothing to delete.
+
+    Paths outside the media root are ignored. OS errors propagate, so a
+    background job can retry them.
+    """
+    target = (MEDIA_ROOT / rel_path).resolve()
+    root = MEDIA_ROOT.resolve()
+    # safety: ensure target under media root
+    if not (str(target).startswith(str(root)) and target.is_file()):
+        return False
+    target.unlink(missing_ok=True)
+    return True
+
+
 def delete_media(rel_path: str) -> None:
     try:
-        target = (MEDIA_ROOT / rel_path).resolve()
-        root = MEDIA_ROOT.resolve()
-        # safety: ensure target under media root
-        if str(target).startswith(str(root)) and target.is_file():
-            target.unlink(missing_ok=True)
+        remove_media(rel_path)
     except Exception:
         # best-effort deletion; ignore failures
         pass
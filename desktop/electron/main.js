@@ -22,17 +22,21 @@ function startBackend() {
   }
 }
 
-function waitForServer(retries = 50) {
+function waitForServer(retries = 100) {
   return new Promise((resolve, reject) => {
     const http = require('http');
+    const retry = () => {
+      if (retries-- > 0) setTimeout(check, 100);
+      else reject(new Error('Backend not responding'));
+    };
     const check = () => {
-      const req = http.get(`http://127.0.0.1:${PORT}/`, res => {
-        resolve();
-      });
-      req.on('error', () => {
-        if (retries-- > 0) setTimeout(check, 200);
-        else reject(new Error('Backend not responding'));
+      // /healthz is cheap and only returns 200 once startup has finished
+      const req = http.get(`http://127.0.0.1:${PORT}/healthz`, res => {
+        res.resume();
+        if (res.statusCode === 200) resolve();
+        else retry();
       });
+      req.on('error', retry);
     };
     check();
   });
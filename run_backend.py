@@ -1,21 +1,61 @@
+import argparse
+import multiprocessing
 import sys
 import os
 from pathlib import Path
 from uvicorn import Config, Server
 
 
-def main():
-    port = int(sys.argv[1]) if len(sys.argv) > 1 else 18555
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Run the Komodo Hub backend.")
+    ap.add_argument("port", nargs="?", type=int, default=18555)
+    ap.add_argument("--prod", action="store_true", help="production mode: multiple workers, bind --host")
+    ap.add_argument("--host", default=None, help="bind address (default 127.0.0.1; 0.0.0.0 with --prod)")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count with --prod, else 1)")
+    ap.add_argument("--threads", type=int, default=None, help="threadpool size per worker for sync routes (default 40)")
+    ap.add_argument("--graceful-timeout", type=int, default=30, help="seconds to drain in-flight requests on shutdown/reload")
+    ap.add_argument("--log-level", default="info")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
     # Ensure working directory for bundled/frozen app
     if getattr(sys, 'frozen', False):
         base = Path(getattr(sys, '_MEIPASS', Path(os.getcwd())))
         os.chdir(base)
     else:
         os.chdir(Path(__file__).resolve().parent)
-    config = Config("app.main:app", host="127.0.0.1", port=port, reload=False, log_level="info")
+    if args.threads:
+        # read by each worker's startup hook
+        os.environ["KOMODO_THREADPOOL"] = str(args.threads)
+    workers = args.workers or ((os.cpu_count() or 1) if args.prod else 1)
+    host = args.host or ("0.0.0.0" if args.prod else "127.0.0.1")
+    if workers > 1:
+        # Run schema bootstrap once here so workers don't race on create_all/seeding;
+        # each worker then finds the recorded fingerprint and skips it.
+        from app.main import bootstrap
+        bootstrap()
+    config = Config(
+        "app.main:app",
+        host=host,
+        port=args.port,
+        reload=False,
+        workers=workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+    )
     server = Server(config)
-    server.run()
+    if workers > 1:
+        # uvicorn supervisor: SIGHUP restarts workers one at a time (graceful reload),
+        # SIGTTIN/SIGTTOU add/remove a worker; in-flight requests drain on SIGTERM.
+        from uvicorn.supervisors import Multiprocess
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # required for worker processes in the PyInstaller build
     main()
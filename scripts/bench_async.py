@@ -0,0 +1,106 @@
+"""
+Concurrent-connection benchmark: async read routes vs. an older sync build.
+
+Starts the backend from this tree and, with --baseline, from another git ref
+checked out into a temporary worktree (e.g. the commit before the async
+routes). Both run one worker with the same small threadpool against copies of
+the same database. Each is then loaded at increasing numbers of concurrent
+keep-alive connections. Sync routes hold a threadpool thread per in-flight
+request, so their latency climbs once concurrency passes --threads; async
+routes only borrow a thread for the driver call.
+
+Usage:
+  python scripts/bench_async.py --baseline <commit-before-async>
+  python scripts/bench_async.py --baseline HEAD~1 --paths / /report/1 --concurrency 8 64 256 --threads 8
+  python scripts/bench_async.py --db data/app.db --json async.json          # this tree only
+
+The baseline must read KOMODO_DATABASE_URL (any commit with the pluggable
+database URL); older builds would use their own empty data/app.db. Use a
+realistic database (scripts/generate_dataset.py).
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from bench_workers import free_port, wait_ready, load
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def serve(tree: Path, db: Path, threads: int):
+    port = free_port()
+    env = dict(os.environ, KOMODO_DATABASE_URL=f"sqlite:///{db.as_posix()}")
+    proc = subprocess.Popen(
+        [sys.executable, str(tree / "run_backend.py"), str(port), "--host", "127.0.0.1",
+         "--workers", "1", "--threads", str(threads), "--log-level", "warning"],
+        cwd=tree, env=env,
+    )
+    return proc, f"http://127.0.0.1:{port}"
+
+
+def bench_tree(label: str, tree: Path, db: Path, args) -> list:
+    proc, base = serve(tree, db, args.threads)
+    rows = []
+    try:
+        wait_ready(base)
+        for path in args.paths:
+            load(base, path, 4, args.warmup)
+            for c in args.concurrency:
+                r = load(base, path, c, args.duration)
+                r.update(build=label, path=path, concurrency=c)
+                rows.append(r)
+                print(f"{label:<8} {path:<16} c={c:<4} {r['rps']:8.1f} req/s  p50 {r['p50_ms'] or 0:.1f} ms  "
+                      f"p99 {r['p99_ms'] or 0:.1f} ms  errors {r['errors']}")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compare concurrent-connection capacity of two builds.")
+    ap.add_argument("--baseline", help="git ref to compare against (checked out into a temporary worktree)")
+    ap.add_argument("--db", type=Path, default=ROOT / "data" / "app.db")
+    ap.add_argument("--paths", nargs="+", default=["/"])
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 128, 256])
+    ap.add_argument("--threads", type=int, default=8, help="threadpool size for both builds")
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--json", type=Path)
+    args = ap.parse_args(argv)
+    if not args.db.exists():
+        ap.error(f"{args.db} does not exist; create one with scripts/generate_dataset.py")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        builds = [("current", ROOT)]
+        worktree = None
+        if args.baseline:
+            worktree = tmp / "baseline"
+            subprocess.run(["git", "worktree", "add", "--detach", str(worktree), args.baseline], cwd=ROOT, check=True)
+            builds.insert(0, ("baseline", worktree))
+        try:
+            for label, tree in builds:
+                # own copy per build: both bootstrap and may migrate it
+                db = tmp / f"{label}.db"
+                shutil.copyfile(args.db, db)
+                rows += bench_tree(label, tree, db, args)
+        finally:
+            if worktree:
+                subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=ROOT)
+
+    if args.json:
+        args.json.write_text(json.dumps({"threads": args.threads, "results": rows}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Serialisation benchmark: Jinja-rendered pages vs. the /api/v1 JSON DTOs.
+
+Part 1 renders the home feed template and serialises the same reports as an
+/api/v1/reports page (orjson and the stdlib encoder). Rows are loaded once, so
+only rendering/serialisation is timed. For each feed size it reports ms per
+response, bytes, and gzip bytes.
+
+Part 2 times whole requests in-process (TestClient) for the page/API pairs:
+report detail, points and shop, signed in as a throwaway user.
+
+Usage:
+  python scripts/bench_serialization.py --db data/app.db
+  python scripts/bench_serialization.py --db big.db --sizes 20 50 200 1000 --repeat 50 --json ser.json
+
+Works on a temporary copy of --db (part 2 registers a user). Create a
+realistic database with scripts/generate_dataset.py.
+"""
+import argparse
+import gzip
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def timed(fn, repeat: int) -> float:
+    """Median milliseconds per call."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t)
+    return statistics.median(samples) * 1000
+
+
+def serialisation(sizes, repeat: int) -> list:
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from app import api_v1
+    from app.db import SessionLocal
+    from app.main import templates
+    from app.models import SpeciesReport, ReportStatus
+    from app.utils import split_paths
+
+    home = templates.env.get_template("home.html")
+    rows_out = []
+    with SessionLocal() as db:
+        for n in sizes:
+            items = db.execute(
+                select(SpeciesReport).where(SpeciesReport.status == ReportStatus.approved.value)
+                .order_by(SpeciesReport.created_at.desc()).limit(n).options(selectinload(SpeciesReport.reporter))
+            ).scalars().all()
+            rows = db.execute(api_v1.feed_query(None, {}, None, n)).all()
+            users = db.execute(api_v1.users_query(r.reporter_id for r in rows)).all()
+            if not items:
+                sys.exit("no approved reports in this database")
+            context = {"user": None, "items": items, "q": "", "photos_map": {it.id: split_paths(it.photo_paths) for it in items},
+                       "tax": {k: "" for k in api_v1.TAX_PARAMS}}
+
+            def html():
+                return home.render(context).encode("utf-8")
+
+            def fast():
+                return api_v1.dumps(api_v1.feed_page(rows, users, n))
+
+            def stdlib():
+                return json.dumps(api_v1.feed_page(rows, users, n), ensure_ascii=False, separators=(",", ":"),
+                                  default=api_v1._default).encode("utf-8")
+
+            page, data = html(), fast()
+            r = {
+                "reports": len(items),
+                "html_ms": timed(html, repeat),
+                "json_ms": timed(fast, repeat),
+                "json_stdlib_ms": timed(stdlib, repeat),
+                "html_bytes": len(page),
+                "json_bytes": len(data),
+                "html_gzip_bytes": len(gzip.compress(page, 6)),
+                "json_gzip_bytes": len(gzip.compress(data, 6)),
+                "encoder": "orjson" if api_v1.orjson is not None else "json",
+            }
+            rows_out.append(r)
+            print(f"{r['reports']:>6} reports  html {r['html_ms']:8.2f} ms {r['html_bytes']:>9} B ({r['html_gzip_bytes']} gz)  "
+                  f"json {r['json_ms']:7.2f} ms (stdlib {r['json_stdlib_ms']:.2f}) {r['json_bytes']:>8} B ({r['json_gzip_bytes']} gz)")
+    return rows_out
+
+
+def whole_requests(repeat: int) -> list:
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+
+    from app.db import SessionLocal
+    from app.main import app
+    from app.models import SpeciesReport, ReportStatus
+
+    with SessionLocal() as db:
+        rid = db.execute(select(SpeciesReport.id).where(SpeciesReport.status == ReportStatus.approved.value)
+                         .order_by(SpeciesReport.id.desc()).limit(1)).scalar()
+    pairs = [("report detail", f"/report/{rid}", f"/api/v1/reports/{rid}"),
+             ("points", "/points", "/api/v1/points"),
+             ("shop", "/shop", "/api/v1/shop")]
+    out = []
+    with TestClient(app) as c:
+        r = c.post("/register", data={"email": f"bench-ser-{os.getpid()}@example.com", "display_name": "bench",
+                                      "password": "pw"}, follow_redirects=False)
+        assert r.status_code == 303, r.text[:200]
+        for label, page, api in pairs:
+            row = {"pair": label,
+                   "page_ms": timed(lambda: c.get(page), repeat),
+                   "api_ms": timed(lambda: c.get(api), repeat),
+                   "page_bytes": len(c.get(page).content),
+                   "api_bytes": len(c.get(api).content)}
+            out.append(row)
+            print(f"{label:<14} page {row['page_ms']:7.2f} ms {row['page_bytes']:>8} B   "
+                  f"api {row['api_ms']:7.2f} ms {row['api_bytes']:>7} B")
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compare template rendering with /api/v1 JSON serialisation.")
+    ap.add_argument("--db", type=Path, default=ROOT / "data" / "app.db")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[20, 50, 200, 1000], help="reports per feed")
+    ap.add_argument("--repeat", type=int, default=30)
+    ap.add_argument("--json", type=Path)
+    args = ap.parse_args(argv)
+    if not args.db.exists():
+        ap.error(f"{args.db} does not exist; create one with scripts/generate_dataset.py")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "bench.db"
+        shutil.copyfile(args.db, db)
+        # must be set before app.db is imported; pages are rendered, not served from the page cache
+        os.environ["KOMODO_DATABASE_URL"] = f"sqlite:///{db.as_posix()}"
+        os.environ["KOMODO_PAGE_CACHE_MB"] = "0"
+        os.environ["KOMODO_COMPRESSION"] = "0"
+        if str(ROOT) not in sys.path:
+            sys.path.insert(0, str(ROOT))
+        print("feed serialisation (median of", args.repeat, "runs)")
+        feed = serialisation(args.sizes, args.repeat)
+        print("\nwhole requests, in-process")
+        pairs = whole_requests(args.repeat)
+        from app.db import engine
+        engine.dispose()
+
+    if args.json:
+        args.json.write_text(json.dumps({"feed": feed, "requests": pairs}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
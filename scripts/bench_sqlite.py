@@ -0,0 +1,169 @@
+"""
+Concurrency benchmark for the SQLite engine profile in app/db.py.
+
+Runs writer threads (report insert + points ledger + stats bump, like
+create_report and the points routes) alongside reader threads (the home feed
+query) against a scratch database, once with the stock engine
+(KOMODO_SQLITE_TUNING=0: rollback journal, one shared pool) and once with the
+tuned profile (WAL + pragmas, separate read-only pool). Reports ops/s, latency
+percentiles and how many operations failed with "database is locked".
+
+Usage:
+  python scripts/bench_sqlite.py                                 # scratch DB seeded with 2000 reports
+  python scripts/bench_sqlite.py --db data/app.db --writers 8 --readers 16 --duration 20
+  python scripts/bench_sqlite.py --profile tuned --json sqlite.json
+"""
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db import make_sqlite_engine  # noqa: E402
+from app.models import Base, User, SpeciesReport, PointsLedger  # noqa: E402
+from app import user_stats  # noqa: E402
+
+
+def seed(path: Path, reports: int) -> None:
+    eng = make_sqlite_engine(path, tuned=False)
+    Base.metadata.create_all(eng)
+    S = sessionmaker(bind=eng)
+    with S() as db:
+        if db.query(User).count() == 0:
+            db.add_all(User(email=f"bench{i}@example.com", password_hash="x", display_name=f"Bench {i}")
+                       for i in range(20))
+            db.commit()
+        have = db.query(SpeciesReport).count()
+        user_ids = [u.id for u in db.query(User.id).limit(20)]
+        now = datetime.utcnow()
+        db.add_all(
+            SpeciesReport(reporter_id=random.choice(user_ids), title=f"Sighting {i}",
+                          species_name=f"Species {i % 300}", description="benchmark seed",
+                          status="approved", created_at=now, updated_at=now)
+            for i in range(max(0, reports - have))
+        )
+        db.commit()
+    eng.dispose()
+
+
+def run(path: Path, tuned: bool, writers: int, readers: int, duration: float) -> dict:
+    write_engine = make_sqlite_engine(path, tuned=tuned)
+    # the stock setup has a single pool that readers and writers share
+    read_engine = make_sqlite_engine(path, readonly=True, tuned=True) if tuned else write_engine
+    W = sessionmaker(bind=write_engine)
+    R = sessionmaker(bind=read_engine)
+    with W() as db:
+        user_ids = [u.id for u in db.query(User.id)]
+
+    stats = {"write": [], "read": []}
+    locked = {"write": 0, "read": 0}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def write_op(db):
+        uid = random.choice(user_ids)
+        now = datetime.utcnow()
+        db.add(SpeciesReport(reporter_id=uid, title="Bench write", species_name="Bench write",
+                             status="pending", created_at=now, updated_at=now))
+        db.add(PointsLedger(user_id=uid, delta=1, reason="report"))
+        user_stats.bump(db, uid, total_reports=1, points=1)
+        db.commit()
+
+    def read_op(db):
+        db.execute(
+            select(SpeciesReport).where(SpeciesReport.status == "approved")
+            .order_by(SpeciesReport.created_at.desc()).limit(20)
+        ).scalars().all()
+        db.rollback()
+
+    def worker(kind, factory, op):
+        mine, failed = [], 0
+        while time.perf_counter() < stop_at:
+            t = time.perf_counter()
+            db = factory()
+            try:
+                op(db)
+                mine.append(time.perf_counter() - t)
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                failed += 1
+            finally:
+                db.close()
+        with lock:
+            stats[kind].extend(mine)
+            locked[kind] += failed
+
+    threads = [threading.Thread(target=worker, args=("write", W, write_op)) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=("read", R, read_op)) for _ in range(readers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    write_engine.dispose()
+    read_engine.dispose()
+
+    out = {"profile": "tuned" if tuned else "stock"}
+    for kind, lat in stats.items():
+        lat.sort()
+
+        def pct(p):
+            return lat[min(len(lat) - 1, int(len(lat) * p))] * 1000 if lat else None
+
+        out[kind] = {"ops": len(lat), "ops_per_s": len(lat) / elapsed, "locked": locked[kind],
+                     "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99)}
+    return out
+
+
+def fmt_ms(v):
+    return f"{v:.1f}" if v is not None else "-"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark concurrent SQLite reads/writes, stock vs tuned engine.")
+    ap.add_argument("--db", type=Path, help="database to copy (default: fresh scratch database)")
+    ap.add_argument("--reports", type=int, default=2000, help="seed size for the scratch database")
+    ap.add_argument("--writers", type=int, default=4)
+    ap.add_argument("--readers", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--profile", choices=["stock", "tuned", "both"], default="both")
+    ap.add_argument("--json", type=Path)
+    args = ap.parse_args(argv)
+
+    profiles = {"stock": [False], "tuned": [True], "both": [False, True]}[args.profile]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for tuned in profiles:
+            # fresh copy per profile: WAL mode is persistent in the file
+            path = Path(tmp) / f"bench_{'tuned' if tuned else 'stock'}.db"
+            if args.db:
+                shutil.copyfile(args.db, path)
+            seed(path, args.reports)
+            r = run(path, tuned, args.writers, args.readers, args.duration)
+            results.append(r)
+            for kind in ("write", "read"):
+                k = r[kind]
+                print(f"{r['profile']:<6} {kind:<5} {k['ops_per_s']:8.1f} ops/s  p50 {fmt_ms(k['p50_ms'])} ms  "
+                      f"p95 {fmt_ms(k['p95_ms'])} ms  p99 {fmt_ms(k['p99_ms'])} ms  locked {k['locked']}")
+    if args.json:
+        args.json.write_text(json.dumps({"writers": args.writers, "readers": args.readers,
+                                         "duration": args.duration, "results": results}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
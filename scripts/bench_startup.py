@@ -0,0 +1,94 @@
+"""
+Measure backend startup time: module import cost and time until /healthz answers.
+
+Launches the same entry point the desktop shell uses (run_backend.py, or the
+frozen KomodoHubBackend.exe via --exe) several times and reports cold/warm
+timings. The first launch against a fresh database includes bootstrap
+(create_all, migrations, seeding); later launches skip it.
+
+Usage:
+  python scripts/bench_startup.py
+  python scripts/bench_startup.py --runs 10 --exe desktop/electron/KomodoHubBackend.exe
+  python scripts/bench_startup.py --json startup.json
+"""
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_time() -> float:
+    """Seconds to import app.main in a fresh interpreter."""
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_to_ready(cmd: list, timeout: float = 60.0) -> float:
+    """Launch `cmd` (port appended) and return seconds until /healthz returns 200."""
+    port = free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd + [str(port)], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}/healthz"
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"backend exited with code {proc.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError("backend did not become ready")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark backend startup.")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--exe", type=Path, help="frozen backend executable (default: python run_backend.py)")
+    ap.add_argument("--json", type=Path, help="write results as JSON")
+    args = ap.parse_args(argv)
+
+    cmd = [str(args.exe)] if args.exe else [sys.executable, str(ROOT / "run_backend.py")]
+    imports = [import_time() for _ in range(args.runs)] if not args.exe else []
+    ready = [time_to_ready(cmd) for _ in range(args.runs)]
+    result = {
+        "command": " ".join(cmd),
+        "runs": args.runs,
+        "import_s": {"min": min(imports), "median": statistics.median(imports)} if imports else None,
+        "ready_s": {"first": ready[0], "min": min(ready), "median": statistics.median(ready), "max": max(ready)},
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+    }
+    if imports:
+        print(f"import app.main: min {min(imports) * 1000:.0f} ms, median {statistics.median(imports) * 1000:.0f} ms")
+    print(f"time to /healthz: first {ready[0] * 1000:.0f} ms, median {statistics.median(ready) * 1000:.0f} ms, "
+          f"min {min(ready) * 1000:.0f} ms over {args.runs} runs")
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
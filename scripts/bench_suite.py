@@ -0,0 +1,446 @@
+"""
+End-to-end HTTP benchmark suite: latency percentiles and throughput per scenario.
+
+Runs the backend (run_backend.py) against a copy of a generated database, with
+Wikidata and Wikipedia replaced by local stand-ins (standin_servers.py), and
+drives each scenario with concurrent keep-alive clients for a fixed time:
+
+  home             GET /
+  search           GET /?q=<word>
+  taxon_filter     GET /?phylum=..&class_name=..
+  report_detail    GET /report/{id}         (random approved reports)
+  taxonomy         GET /api/taxonomy
+  taxonomy_lookup  GET /api/taxonomy/lookup (new names: cache miss -> Wikidata stand-in)
+  points           GET /points              (signed in)
+  login            POST /login              (fresh client each time)
+  create_report    POST /reports            (multipart, photo from the Wikipedia stand-in)
+  redeem           POST /shop/redeem/{id}
+  admin_batch      POST /admin/reports/batch (20 reports: approve -> revoke -> pending)
+
+The result is a JSON report (per-scenario p50/p95/p99, mean, req/s, errors,
+plus commit and parameters). Compare two reports to catch regressions; the
+exit status is 1 when a scenario got slower or less productive than the
+tolerance allows.
+
+Usage:
+  python scripts/bench_suite.py --json bench/HEAD.json
+  python scripts/bench_suite.py --scenarios home search report_detail --duration 5
+  python scripts/bench_suite.py --json new.json --compare bench/main.json --tolerance 0.15
+  python scripts/bench_suite.py --compare-only bench/main.json new.json
+
+The dataset is generated once per size/seed with scripts/generate_dataset.py
+and kept under data/bench/; pass --db to use your own. Every run works on a
+fresh copy, so results from different commits start from the same rows. The
+home page lists every approved report, so keep --reports modest or expect it
+to dominate the run. Server output goes to data/bench/server.log. Client threads share the machine with the server; compare
+runs made on the same host.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+from bench_workers import free_port, wait_ready
+from standin_servers import StandInServer
+
+ROOT = Path(__file__).resolve().parents[1]
+BENCH_DIR = ROOT / "data" / "bench"
+PASSWORD = "password"
+BATCH_SIZE = 20
+SCENARIOS = ("home", "search", "taxon_filter", "report_detail", "taxonomy", "taxonomy_lookup",
+             "points", "login", "create_report", "redeem", "admin_batch")
+
+
+# --- dataset ---------------------------------------------------------------
+
+def ensure_dataset(args) -> Path:
+    if args.db:
+        if not args.db.exists():
+            sys.exit(f"{args.db} does not exist")
+        return args.db
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    path = BENCH_DIR / f"bench-u{args.users}-r{args.reports}-s{args.seed}.db"
+    if not path.exists():
+        print(f"generating {path.name} ...")
+        tmp = path.with_suffix(".tmp")
+        tmp.unlink(missing_ok=True)
+        env = dict(os.environ, KOMODO_DATABASE_URL=f"sqlite:///{tmp.as_posix()}")
+        subprocess.run([sys.executable, str(ROOT / "scripts" / "generate_dataset.py"), "--users", str(args.users),
+                        "--reports", str(args.reports), "--seed", str(args.seed), "--fast"], env=env, check=True)
+        # fold the WAL into the file before it is copied around
+        import sqlite3
+        with sqlite3.connect(tmp) as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA journal_mode=DELETE")
+        tmp.replace(path)
+    return path
+
+
+def seed_accounts(url: str, clients: int) -> dict:
+    """Bench users with plenty of points, an admin and an unlimited shop item.
+
+    Runs in a child process so this process never binds app.db to a database.
+    """
+    code = f"""
+import json, sys
+sys.path.insert(0, {str(ROOT)!r})
+from sqlalchemy import func, select
+from app.db import SessionLocal
+from app.models import User, PointsLedger, ShopItem, SpeciesReport, ReportStatus
+from app.security import hash_password
+
+pw = hash_password({PASSWORD!r})
+with SessionLocal() as db:
+    users = []
+    for i in range({clients}):
+        u = User(email=f"bench{{i:03d}}@example.com", display_name=f"Bench {{i}}", password_hash=pw)
+        db.add(u)
+        users.append(u)
+    admin = User(email="bench-admin@example.com", display_name="Bench admin", password_hash=pw, is_admin=True)
+    db.add(admin)
+    item = ShopItem(kind="virtual", title="Bench badge", points_cost=1, stock=None, status="active")
+    db.add(item)
+    db.flush()
+    for u in users:
+        db.add(PointsLedger(user_id=u.id, delta=10_000_000, reason="adjust"))
+    approved = [r for (r,) in db.execute(select(SpeciesReport.id).where(
+        SpeciesReport.status == ReportStatus.approved.value).order_by(func.random()).limit(2000))]
+    pending = [r for (r,) in db.execute(select(SpeciesReport.id).where(
+        SpeciesReport.status == ReportStatus.pending.value).order_by(SpeciesReport.id).limit(5000))]
+    row = db.execute(select(SpeciesReport.phylum, SpeciesReport.class_name, func.count()).where(
+        SpeciesReport.status == ReportStatus.approved.value, SpeciesReport.class_name.is_not(None)).group_by(
+        SpeciesReport.phylum, SpeciesReport.class_name).order_by(func.count().desc()).limit(1)).first()
+    genus = db.execute(select(SpeciesReport.genus, func.count()).where(SpeciesReport.genus.is_not(None)).group_by(
+        SpeciesReport.genus).order_by(func.count().desc()).limit(1)).first()
+    db.commit()
+    print(json.dumps({{
+        "users": [u.email for u in users], "admin": admin.email, "item": item.id,
+        "approved": approved, "pending": pending,
+        "taxon": {{"phylum": row[0], "class_name": row[1]}} if row else {{}},
+        "q": (genus[0] if genus else "a").lower(),
+    }}))
+"""
+    env = dict(os.environ, KOMODO_DATABASE_URL=url)
+    out = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+# --- load ------------------------------------------------------------------
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    latencies.sort()
+
+    def pct(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+    }
+
+
+def run_scenario(make_worker, concurrency: int, duration: float) -> dict:
+    """Each worker is (setup, step): setup runs untimed, step is one timed request returning ok/not ok."""
+    latencies: list = []
+    errors = [0]
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency + 1)
+    window = {}
+
+    def thread(i):
+        try:
+            step = make_worker(i)
+        except Exception as e:
+            print(f"  worker {i} setup failed: {e}")
+            step = None
+        ready.wait()
+        mine, bad = [], 0
+        if step is not None:
+            while time.perf_counter() < window["stop"]:
+                t = time.perf_counter()
+                try:
+                    ok = step()
+                except requests.RequestException:
+                    ok = False
+                if ok:
+                    mine.append(time.perf_counter() - t)
+                else:
+                    bad += 1
+        with lock:
+            latencies.extend(mine)
+            errors[0] += bad
+
+    threads = [threading.Thread(target=thread, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    window["stop"] = float("inf")
+    ready.wait()
+    t0 = time.perf_counter()
+    window["stop"] = t0 + duration
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors[0], time.perf_counter() - t0)
+
+
+class Suite:
+    def __init__(self, base: str, seed: dict, photo: bytes, rng_seed: int):
+        self.base = base
+        self.seed = seed
+        self.photo = photo
+        self.rng_seed = rng_seed
+        self._pending = list(seed["pending"])
+        self._lock = threading.Lock()
+
+    def session(self, email: str = None) -> requests.Session:
+        s = requests.Session()
+        if email:
+            r = s.post(self.base + "/login", data={"email": email, "password": PASSWORD}, allow_redirects=False)
+            if r.status_code != 303:
+                raise RuntimeError(f"login as {email}: HTTP {r.status_code}")
+        return s
+
+    def user(self, i: int) -> str:
+        users = self.seed["users"]
+        return users[i % len(users)]
+
+    def get(self, path_fn, email=None):
+        def make(i):
+            s = self.session(email(i) if email else None)
+            rng = random.Random(self.rng_seed + i)
+
+            def step():
+                return s.get(self.base + path_fn(rng), allow_redirects=False).status_code == 200
+            return step
+        return make
+
+    def workers(self, name: str):
+        seed = self.seed
+        if name == "home":
+            return self.get(lambda rng: "/")
+        if name == "search":
+            return self.get(lambda rng: f"/?q={seed['q']}")
+        if name == "taxon_filter":
+            query = "&".join(f"{k}={v}" for k, v in seed["taxon"].items())
+            return self.get(lambda rng: f"/?{query}")
+        if name == "report_detail":
+            return self.get(lambda rng: f"/report/{rng.choice(seed['approved'])}")
+        if name == "taxonomy":
+            return self.get(lambda rng: "/api/taxonomy")
+        if name == "taxonomy_lookup":
+            # a new name every time, so each request misses the cache and goes upstream
+            return self.get(lambda rng: f"/api/taxonomy/lookup?name=Benchus+{uuid.uuid4().hex[:12]}")
+        if name == "points":
+            return self.get(lambda rng: "/points", email=self.user)
+        if name == "login":
+            def make(i):
+                email = self.user(i)
+
+                def step():
+                    with requests.Session() as s:
+                        r = s.post(self.base + "/login", data={"email": email, "password": PASSWORD}, allow_redirects=False)
+                    return r.status_code == 303
+                return step
+            return make
+        if name == "create_report":
+            def make(i):
+                s = self.session(self.user(i))
+
+                def step():
+                    r = s.post(self.base + "/reports", data={
+                        "title": "Bench sighting", "species_name": "Varanus komodoensis", "location_text": "Komodo",
+                        "phylum": "Chordata", "class_name": "Reptilia", "order_name": "Squamata",
+                        "family": "Varanidae", "genus": "Varanus",
+                    }, files={"photo1": ("photo.png", self.photo, "image/png")}, allow_redirects=False)
+                    return r.status_code == 303
+                return step
+            return make
+        if name == "redeem":
+            def make(i):
+                s = self.session(self.user(i))
+
+                def step():
+                    r = s.post(f"{self.base}/shop/redeem/{seed['item']}", data={"shipping_text": ""}, allow_redirects=False)
+                    return r.status_code == 303
+                return step
+            return make
+        if name == "admin_batch":
+            def make(i):
+                with self._lock:
+                    ids, self._pending = self._pending[:BATCH_SIZE], self._pending[BATCH_SIZE:]
+                if not ids:
+                    raise RuntimeError("no pending reports left for this worker")
+                s = self.session(seed["admin"])
+                # pending -> approved -> rejected -> pending: the cycle can repeat forever
+                cycle = ["approve", "revoke", "pending"]
+                n = [0]
+
+                def step():
+                    action = cycle[n[0] % 3]
+                    n[0] += 1
+                    r = s.post(self.base + "/admin/reports/batch", data={"action": action, "ids": ids}, allow_redirects=False)
+                    return r.status_code == 303
+                return step
+            return make
+        raise ValueError(name)
+
+
+def fetch_photo(wikipedia_api: str) -> bytes:
+    """The photo for create_report, found the way submit_reports_from_web.py finds one."""
+    summary = requests.get(f"{wikipedia_api}/page/summary/Komodo_dragon", timeout=10).json()
+    r = requests.get(summary["thumbnail"]["source"], timeout=10)
+    r.raise_for_status()
+    return r.content
+
+
+def git_commit() -> str:
+    try:
+        rev = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=ROOT).returncode != 0
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> dict:
+    source = ensure_dataset(args)
+    with tempfile.TemporaryDirectory() as tmp, StandInServer(latency_ms=args.upstream_latency_ms) as upstream:
+        tmp = Path(tmp)
+        db = tmp / "bench.db"
+        shutil.copyfile(source, db)
+        url = f"sqlite:///{db.as_posix()}"
+        seed = seed_accounts(url, max(args.concurrency))
+        port = free_port()
+        env = dict(os.environ, KOMODO_DATABASE_URL=url, KOMODO_WIKIDATA_URL=upstream.wikidata_url,
+                   KOMODO_TAX_CACHE=str(tmp / "tax_cache.json"), KOMODO_MEDIA_ROOT=str(tmp / "media"))
+        cmd = [sys.executable, str(ROOT / "run_backend.py"), str(port), "--host", "127.0.0.1",
+               "--workers", str(args.workers), "--log-level", "warning"]
+        if args.threads:
+            cmd += ["--threads", str(args.threads)]
+        # server warnings (slow queries, N+1) go to a log file instead of the results table
+        BENCH_DIR.mkdir(parents=True, exist_ok=True)
+        log = open(BENCH_DIR / "server.log", "w", encoding="utf-8")
+        proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        base = f"http://127.0.0.1:{port}"
+        results = {}
+        try:
+            wait_ready(base)
+            suite = Suite(base, seed, fetch_photo(upstream.wikipedia_api), args.seed)
+            for name in args.scenarios:
+                for c in args.concurrency:
+                    if args.warmup:
+                        run_scenario(suite.workers(name), min(c, 4), args.warmup)
+                    key = name if len(args.concurrency) == 1 else f"{name}@c{c}"
+                    r = results[key] = run_scenario(suite.workers(name), c, args.duration)
+                    r["concurrency"] = c
+                    print(f"{key:<22} {r['rps']:8.1f} req/s  p50 {r['p50_ms'] or 0:8.1f}  p95 {r['p95_ms'] or 0:8.1f}  "
+                          f"p99 {r['p99_ms'] or 0:8.1f} ms  errors {r['errors']}")
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            log.close()
+        upstream_hits = dict(upstream.hits)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "dataset": source.name,
+            "params": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()
+                       if k not in ("json", "compare", "compare_only")},
+            "upstream_hits": upstream_hits,
+        },
+        "scenarios": results,
+    }
+
+
+# --- comparison ------------------------------------------------------------
+
+def compare(base: dict, new: dict, tolerance: float) -> int:
+    """Print a side-by-side table; returns the number of regressions.
+
+    A scenario regresses when its p95 grows or its throughput drops by more
+    than `tolerance`, or when it starts failing requests.
+    """
+    print(f"\n{'scenario':<22} {'p95 base':>10} {'p95 new':>10} {'change':>8} {'rps base':>10} {'rps new':>10} {'change':>8}")
+    regressions = 0
+    for name, b in base["scenarios"].items():
+        n = new["scenarios"].get(name)
+        if n is None:
+            continue
+        notes = []
+        p95_change = (n["p95_ms"] / b["p95_ms"] - 1) if b.get("p95_ms") and n.get("p95_ms") else 0.0
+        rps_change = (n["rps"] / b["rps"] - 1) if b.get("rps") else 0.0
+        if p95_change > tolerance:
+            notes.append("slower")
+        if rps_change < -tolerance:
+            notes.append("fewer req/s")
+        if n["errors"] > b["errors"]:
+            notes.append(f"{n['errors']} errors")
+        regressions += bool(notes)
+        print(f"{name:<22} {b.get('p95_ms') or 0:10.1f} {n.get('p95_ms') or 0:10.1f} {p95_change:+8.0%} "
+              f"{b['rps']:10.1f} {n['rps']:10.1f} {rps_change:+8.0%}  {' '.join(notes)}")
+    print(f"\nbaseline {base['meta'].get('commit')} vs {new['meta'].get('commit')}: "
+          + (f"{regressions} regression(s) beyond {tolerance:.0%}" if regressions else "no regressions"))
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="End-to-end HTTP benchmark with comparable JSON reports.")
+    ap.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    ap.add_argument("--db", type=Path, help="benchmark this database (copied) instead of a generated one")
+    ap.add_argument("--users", type=int, default=2_000)
+    ap.add_argument("--reports", type=int, default=5_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[8])
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    ap.add_argument("--warmup", type=float, default=1.0)
+    ap.add_argument("--workers", type=int, default=1, help="backend worker processes")
+    ap.add_argument("--threads", type=int, default=None, help="backend threadpool size")
+    ap.add_argument("--upstream-latency-ms", type=float, default=50.0, help="delay added by the Wikidata/Wikipedia stand-ins")
+    ap.add_argument("--json", type=Path, help="write the report here")
+    ap.add_argument("--compare", type=Path, help="baseline report; exit 1 on regressions")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="allowed p95/throughput change before flagging")
+    ap.add_argument("--compare-only", type=Path, nargs=2, metavar=("BASE", "NEW"), help="compare two saved reports and exit")
+    args = ap.parse_args(argv)
+
+    if args.compare_only:
+        base, new = (json.loads(p.read_text(encoding="utf-8")) for p in args.compare_only)
+        sys.exit(1 if compare(base, new, args.tolerance) else 0)
+
+    report = run(args)
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"wrote {args.json}")
+    if args.compare:
+        base = json.loads(args.compare.read_text(encoding="utf-8"))
+        sys.exit(1 if compare(base, report, args.tolerance) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Throughput scaling benchmark for run_backend.py --prod across worker counts.
+
+For each worker count the backend is started on a free port, warmed up, then
+hammered by a pool of client threads with keep-alive connections for a fixed
+duration. Reports requests/s and latency percentiles per worker count.
+
+Usage:
+  python scripts/bench_workers.py                               # 1/2/4/8 workers, GET /
+  python scripts/bench_workers.py --workers 1 2 4 --path "/?q=lion" --concurrency 64 --duration 20
+  python scripts/bench_workers.py --json workers.json
+
+Run against a realistic database (scripts/generate_dataset.py). The client
+threads share this machine's CPUs with the server, so use a separate load
+machine for absolute numbers; the relative scaling is what matters here.
+"""
+import argparse
+import http.client
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlsplit
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(base: str, timeout: float = 60.0) -> None:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        try:
+            with urllib.request.urlopen(base + "/healthz", timeout=1) as r:
+                if r.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("backend did not become ready")
+
+
+def load(base: str, path: str, concurrency: int, duration: float) -> dict:
+    parts = urlsplit(base)
+    latencies: list = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        mine = []
+        while time.perf_counter() < stop_at:
+            t = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status >= 500:
+                    errors[0] += 1
+                mine.append(time.perf_counter() - t)
+            except Exception:
+                errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / elapsed,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else None,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark throughput vs. worker count.")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--threads", type=int, default=None, help="passed to run_backend.py --threads")
+    ap.add_argument("--path", default="/")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--warmup", type=float, default=2.0)
+    ap.add_argument("--json", type=Path)
+    args = ap.parse_args(argv)
+
+    results = []
+    for n in args.workers:
+        port = free_port()
+        cmd = [sys.executable, str(ROOT / "run_backend.py"), str(port), "--prod", "--host", "127.0.0.1",
+               "--workers", str(n), "--log-level", "warning"]
+        if args.threads:
+            cmd += ["--threads", str(args.threads)]
+        proc = subprocess.Popen(cmd, cwd=ROOT)
+        base = f"http://127.0.0.1:{port}"
+        try:
+            wait_ready(base)
+            load(base, args.path, args.concurrency, args.warmup)
+            r = load(base, args.path, args.concurrency, args.duration)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        r["workers"] = n
+        results.append(r)
+        print(f"workers={n:<2} {r['rps']:8.1f} req/s  p50 {r['p50_ms']:.1f} ms  p95 {r['p95_ms']:.1f} ms  "
+              f"p99 {r['p99_ms']:.1f} ms  errors {r['errors']}")
+
+    base_rps = results[0]["rps"] if results and results[0]["rps"] else None
+    if base_rps:
+        print("scaling vs first: " + ", ".join(f"{r['workers']}w x{r['rps'] / base_rps:.2f}" for r in results))
+    if args.json:
+        args.json.write_text(json.dumps({"path": args.path, "concurrency": args.concurrency, "results": results}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
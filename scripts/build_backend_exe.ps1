@@ -9,7 +9,10 @@ if ($LASTEXITCODE -ne 0) {
     pip install pyinstaller
 }
 
-# Build onefile EXE including app modules, templates, and data
+# Precompile Jinja templates so the first launch skips template compilation
+python scripts/precompile_templates.py
+
+# Build onefile EXE including app modules, templates, precompiled templates, and data
 pyinstaller --noconfirm --clean `
   --onefile --name KomodoHubBackend `
   --hidden-import app.main `
@@ -17,7 +20,31 @@ pyinstaller --noconfirm --clean `
   --hidden-import app.db `
   --hidden-import app.utils `
   --hidden-import app.security `
+  --hidden-import app.moderation `
+  --hidden-import app.user_stats `
+  --hidden-import app.bulk_import `
+  --hidden-import app.export `
+  --hidden-import app.template_cache `
+  --hidden-import app.schema `
+  --hidden-import app.metrics `
+  --hidden-import app.query_trace `
+  --hidden-import app.profiling `
+  --hidden-import app.page_cache `
+  --hidden-import app.conditional `
+  --hidden-import app.compression `
+  --hidden-import brotli `
+  --hidden-import app.api_v1 `
+  --hidden-import orjson `
+  --hidden-import app.jobs `
+  --hidden-import app.media_gc `
+  --hidden-import app.geo `
+  --hidden-import app.photo_hash `
+  --hidden-import app.taxon_stats `
+  --hidden-import PIL `
+  --hidden-import aiosqlite `
+  --hidden-import sqlalchemy.dialects.sqlite.aiosqlite `
   --add-data "app/templates;app/templates" `
+  --add-data "app/template_cache;app/template_cache" `
   --add-data "data;data" `
   run_backend.py
 
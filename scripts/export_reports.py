@@ -0,0 +1,53 @@
+"""
+Export approved reports straight from the database as CSV, NDJSON or GeoJSON.
+Rows are streamed from a server-side cursor, so memory stays flat at any size.
+
+Usage:
+  python scripts/export_reports.py --format csv --out reports.csv
+  python scripts/export_reports.py --format ndjson --phylum Chordata --from 2024-01-01 --to 2024-12-31
+  python scripts/export_reports.py --format ndjson --since <cursor> --out delta.ndjson
+
+Every row carries a `cursor`; pass the last one to --since for the next incremental pull.
+Incremental pulls include tombstones ({id, status, updated_at, cursor}) for reports
+revoked, rejected or deleted since the cursor.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+
+def main(argv=None):
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from app.export import EXPORT_FORMATS, TAX_FIELDS, build_query, stream_export
+
+    ap = argparse.ArgumentParser(description="Stream approved reports to a file or stdout.")
+    ap.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    ap.add_argument("--out", type=Path, help="output file (default: stdout)")
+    for f in TAX_FIELDS:
+        ap.add_argument(f"--{f.replace('_', '-')}", dest=f)
+    ap.add_argument("--from", dest="date_from", help="created on/after YYYY-MM-DD")
+    ap.add_argument("--to", dest="date_to", help="created on/before YYYY-MM-DD")
+    ap.add_argument("--since", help="resume after this cursor")
+    ap.add_argument("--limit", type=int)
+    ap.add_argument("--media-base", default="http://127.0.0.1:8000/media/", help="prefix for photo URLs")
+    args = ap.parse_args(argv)
+
+    filters = {k: getattr(args, k) for k in (*TAX_FIELDS, "date_from", "date_to", "since")}
+    try:
+        build_query(filters)
+    except ValueError as e:
+        ap.error(str(e))
+
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    try:
+        for chunk in stream_export(args.format, filters, args.media_base, args.limit):
+            out.write(chunk)
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Find and remove orphaned uploads: files under media/uploads that no report
+photo, avatar or shop item refers to, and report references whose file is
+missing.
+
+Without --action, nothing is changed (a report). Files younger than
+--grace-hours are never touched. Quarantined files are moved out of the
+served media folder and can be purged later.
+
+Usage:
+  python scripts/gc_media.py                                   # report only
+  python scripts/gc_media.py --action quarantine --list
+  python scripts/gc_media.py --action delete --grace-hours 72
+  python scripts/gc_media.py --action quarantine --max-files 200000   # nightly slice, resumes next run
+  python scripts/gc_media.py --purge-quarantine-days 30
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1048576:.1f} MB"
+
+
+def main(argv=None):
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    from app import media_gc
+    from app.db import SessionLocal, engine
+    from app.models import Base
+    from app.utils import MEDIA_ROOT
+
+    ap = argparse.ArgumentParser(description="Garbage-collect orphaned media uploads.")
+    ap.add_argument("--action", choices=("report", "quarantine", "delete"), default="report")
+    ap.add_argument("--grace-hours", type=float, default=media_gc.GRACE_HOURS,
+                    help="leave files younger than this alone (default %(default)s)")
+    ap.add_argument("--quarantine-dir", type=Path, default=MEDIA_ROOT.parent / "media_quarantine")
+    ap.add_argument("--max-files", type=int, help="stop after about this many files; the next run continues from there")
+    ap.add_argument("--purge-quarantine-days", type=float, help="delete quarantined files older than this and exit")
+    ap.add_argument("--list", action="store_true", help=f"print orphans and dangling references (first {media_gc.MAX_LISTED})")
+    ap.add_argument("--json", type=Path, help="write the full result here")
+    args = ap.parse_args(argv)
+
+    if args.purge_quarantine_days is not None:
+        files, size = media_gc.purge_quarantine(args.quarantine_dir, args.purge_quarantine_days)
+        print(f"purged {files} quarantined file(s), {_mb(size)}")
+        return
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        stats = media_gc.collect(db, action=args.action, grace_hours=args.grace_hours,
+                                 quarantine_dir=args.quarantine_dir, max_files=args.max_files,
+                                 resume=bool(args.max_files))
+    print(f"referenced paths: {stats['referenced']}")
+    print(f"scanned: {stats['scanned']} file(s), {_mb(stats['scanned_bytes'])} in {stats['months']} month dir(s)"
+          f" ({stats['seconds']} s)")
+    print(f"orphans: {stats['orphans']} ({_mb(stats['orphan_bytes'])}), "
+          f"{stats['young']} more inside the grace period")
+    if args.action != "report":
+        print(f"{'deleted' if args.action == 'delete' else 'quarantined'}: {_mb(stats['reclaimed_bytes'])} reclaimed,"
+              f" {stats['errors']} error(s)")
+    print(f"dangling references: {stats['dangling']}")
+    if stats["cursor"]:
+        print(f"stopped after {stats['cursor']}; the next run continues there")
+    if args.list:
+        for p in stats["orphan_paths"]:
+            print(f"  orphan   {p}")
+        for d in stats["dangling_refs"]:
+            print(f"  dangling {d['path']}  ({d['table']} #{d['id']})")
+    if args.json:
+        args.json.write_text(json.dumps(stats, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Generate a large synthetic dataset for load testing and benchmarks.
+
+Rows are bulk-inserted with Core executemany in large transactions, with ids
+assigned up front so related tables never need a round trip. Reporter activity
+and taxon popularity follow a Zipf-like skew, so a few users and genera dominate
+the way they do in real data. Reports are spread over taxonomy.json.
+
+Usage:
+  python scripts/generate_dataset.py --users 100000 --reports 1000000
+  python scripts/generate_dataset.py --users 1000000 --reports 5000000 --batch-size 50000 --skew 1.2 --media 200
+
+All generated users share the password "password" (emails: loadNNNNNNN@example.com).
+Per-user counters (user_stats) are aggregated on read until a user's first
+change creates the row; run scripts/rebuild_user_stats.py to precompute them. The taxon rollups are
+rebuilt at the end of the run.
+"""
+import argparse
+import bisect
+import json
+import random
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+ALLOWED_PHYLA = {"Chordata", "Arthropoda", "Mollusca", "Cnidaria", "Echinodermata"}
+WORDS = ("river", "forest", "meadow", "coast", "ridge", "marsh", "valley", "garden", "trail", "reef", "dune", "canopy")
+PLACES = ("Serengeti, Tanzania", "Komodo NP, Indonesia", "Highlands, Scotland", "Yellowstone, USA", "Kruger, South Africa",
+          "Bay of Biscay", "Sundarbans, India", "Provence, France", "Kamchatka, Russia", "City park", "Urban garden")
+QUEST_CODES = ("view_5", "share_1", "report_1")
+QUEST_POINTS = {"view_5": 5, "share_1": 5, "report_1": 10}
+
+
+class ZipfPicker:
+    """Draw indexes 0..n-1 with P(i) proportional to 1 / (i + 1) ** skew."""
+
+    def __init__(self, n: int, skew: float, rng: random.Random):
+        self.rng = rng
+        acc = 0.0
+        self.cum: List[float] = []
+        for i in range(n):
+            acc += 1.0 / (i + 1) ** skew if skew > 0 else 1.0
+            self.cum.append(acc)
+        self.total = acc
+
+    def pick(self) -> int:
+        return bisect.bisect_left(self.cum, self.rng.random() * self.total)
+
+
+def taxon_paths(path: Path) -> List[tuple]:
+    with open(path, "r", encoding="utf-8") as f:
+        tree = json.load(f)
+    out = []
+    for phylum, classes in tree.items():
+        if phylum not in ALLOWED_PHYLA:
+            continue
+        for class_name, orders in classes.items():
+            for order_name, families in orders.items():
+                for family, genera in families.items():
+                    for genus in genera:
+                        out.append((phylum, class_name, order_name, family, genus))
+    return out
+
+
+def chunks(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    buf: List[dict] = []
+    for r in rows:
+        buf.append(r)
+        if len(buf) >= size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def bulk_insert(engine, table, rows: Iterable[dict], batch_size: int, label: str) -> int:
+    """executemany `rows` into `table`, one transaction per batch."""
+    total = 0
+    t0 = time.perf_counter()
+    for batch in chunks(rows, batch_size):
+        with engine.begin() as conn:
+            conn.execute(table.insert(), batch)
+        total += len(batch)
+        rate = total / max(time.perf_counter() - t0, 1e-9)
+        print(f"\r{label}: {total:,} rows ({rate:,.0f}/s)", end="", flush=True)
+    print(f"\r{label}: {total:,} rows in {time.perf_counter() - t0:.1f}s" + " " * 20)
+    return total
+
+
+def placeholder_png(rng: random.Random, size: int = 32) -> bytes:
+    """A small solid-colour PNG, so photo URLs resolve to real files."""
+    rgb = bytes(rng.randrange(256) for _ in range(3))
+    raw = b"".join(b"\x00" + rgb * size for _ in range(size))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    ihdr = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+def write_media(count: int, rng: random.Random) -> List[str]:
+    from app.utils import MEDIA_ROOT, UPLOADS_DIR
+
+    folder = UPLOADS_DIR / "synthetic"
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        p = folder / f"placeholder_{i:05d}.png"
+        if not p.exists():
+            p.write_bytes(placeholder_png(rng))
+        paths.append(p.relative_to(MEDIA_ROOT).as_posix())
+    print(f"media: {count} placeholder files under {folder}")
+    return paths
+
+
+def next_id(engine, table) -> int:
+    from sqlalchemy import select, func
+
+    with engine.connect() as conn:
+        return int(conn.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()) + 1
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk-generate a realistic Komodo Hub database.")
+    ap.add_argument("--users", type=int, default=10_000)
+    ap.add_argument("--reports", type=int, default=100_000)
+    ap.add_argument("--donations", type=int, default=None, help="default: reports / 10")
+    ap.add_argument("--signin-days", type=int, default=30, help="daily sign-in window per user")
+    ap.add_argument("--signin-rate", type=float, default=0.3, help="probability a user signs in on a given day")
+    ap.add_argument("--quest-rate", type=float, default=0.1, help="probability of a quest log per user-day")
+    ap.add_argument("--days", type=int, default=365, help="spread report timestamps over this many days")
+    ap.add_argument("--approved", type=float, default=0.7, help="share of approved reports")
+    ap.add_argument("--rejected", type=float, default=0.1, help="share of rejected reports (rest pending)")
+    ap.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for reporter/taxon popularity (0 = uniform)")
+    ap.add_argument("--batch-size", type=int, default=20_000, help="rows per executemany transaction")
+    ap.add_argument("--media", type=int, default=0, help="write N placeholder images and reference them from reports")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--fast", action="store_true", help="SQLite: synchronous=OFF during the load")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+
+    from sqlalchemy import event, text
+    from app.db import engine
+    from app.models import Base, User, SpeciesReport, ReportStatus, PointsLedger, Donation, DailySignin, QuestLog
+    from app.security import hash_password
+
+    Base.metadata.create_all(bind=engine)
+    if args.fast and engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _fast_pragmas(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            cur.execute("PRAGMA synchronous=OFF")
+            cur.close()
+        engine.dispose()
+
+    now = datetime.utcnow()
+    taxa = taxon_paths(PROJECT_ROOT / "data" / "taxonomy.json")
+    media = write_media(args.media, rng) if args.media else []
+    pw_hash = hash_password("password")  # hashing is slow; share one hash
+    batch = args.batch_size
+    t_start = time.perf_counter()
+
+    # users
+    uid0 = next_id(engine, User.__table__)
+    n_users = args.users
+
+    def user_rows():
+        for i in range(n_users):
+            uid = uid0 + i
+            created = now - timedelta(days=rng.uniform(0, args.days), seconds=rng.randrange(86400))
+            yield {
+                "id": uid, "email": f"load{uid:07d}@example.com", "password_hash": pw_hash,
+                "display_name": f"Observer {uid}", "is_admin": False, "public_profile": rng.random() < 0.2,
+                "city": rng.choice(PLACES), "last_active_at": now, "created_at": created,
+            }
+
+    bulk_insert(engine, User.__table__, user_rows(), batch, "users")
+    user_ids = list(range(uid0, uid0 + n_users))
+    if not user_ids:
+        print("No users generated; nothing else to do.")
+        return
+    rng.shuffle(user_ids)  # heavy reporters spread over the id range
+    reporter = ZipfPicker(len(user_ids), args.skew, rng)
+    rng.shuffle(taxa)
+    taxon = ZipfPicker(len(taxa), args.skew, rng)
+
+    # reports
+    rid0 = next_id(engine, SpeciesReport.__table__)
+    statuses = (ReportStatus.approved.value, ReportStatus.rejected.value, ReportStatus.pending.value)
+    status_w = (args.approved, args.rejected, max(0.0, 1.0 - args.approved - args.rejected))
+
+    def report_rows():
+        for i in range(args.reports):
+            phylum, class_name, order_name, family, genus = taxa[taxon.pick()]
+            species = f"{genus} {rng.choice(WORDS)}{rng.randrange(50)}"
+            created = now - timedelta(days=rng.uniform(0, args.days))
+            status = rng.choices(statuses, status_w)[0]
+            photos = ",".join(rng.sample(media, k=min(len(media), rng.randint(1, 3)))) if media else None
+            yield {
+                "id": rid0 + i, "reporter_id": user_ids[reporter.pick()],
+                "phylum": phylum, "class_name": class_name, "order_name": order_name, "family": family, "genus": genus,
+                "title": f"{genus} near the {rng.choice(WORDS)}", "species_name": species,
+                "description": f"Observed {species} by the {rng.choice(WORDS)} at dusk. " * rng.randint(1, 4),
+                "location_text": rng.choice(PLACES), "photo_paths": photos, "status": status,
+                "created_at": created, "updated_at": created,
+            }
+
+    bulk_insert(engine, SpeciesReport.__table__, report_rows(), batch, "reports")
+    rid_max = rid0 + args.reports - 1
+
+    # donations + their ledger entries
+    n_don = args.reports // 10 if args.donations is None else args.donations
+    did0 = next_id(engine, Donation.__table__)
+    donation_rows: List[dict] = []
+    ledger_rows: List[dict] = []
+
+    def flush_ledger(force: bool = False):
+        if ledger_rows and (force or len(ledger_rows) >= batch):
+            with engine.begin() as conn:
+                conn.execute(PointsLedger.__table__.insert(), ledger_rows)
+            ledger_rows.clear()
+
+    def donations():
+        for i in range(n_don):
+            uid = user_ids[reporter.pick()]
+            cents = rng.choice((100, 500, 1000, 2000, 5000, 10000))
+            created = now - timedelta(days=rng.uniform(0, args.days))
+            did = did0 + i
+            ledger_rows.append({"user_id": uid, "delta": cents // 100 * 10, "reason": "donate", "ref_type": "donation", "ref_id": did, "created_at": created})
+            flush_ledger()
+            yield {
+                "id": did, "user_id": uid, "report_id": rng.randint(rid0, rid_max) if args.reports else None,
+                "species_name": None, "amount_cents": cents, "currency": "CNY", "provider": "alipay", "status": "paid", "created_at": created,
+            }
+
+    bulk_insert(engine, Donation.__table__, donations(), batch, "donations")
+    flush_ledger(force=True)
+
+    # daily sign-ins and quest logs over the last N days
+    sid0 = next_id(engine, DailySignin.__table__)
+    qid0 = next_id(engine, QuestLog.__table__)
+    days = [(now - timedelta(days=d)).strftime("%Y-%m-%d") for d in range(args.signin_days)]
+    counters = {"signin": sid0, "quest": qid0}
+    quest_rows: List[dict] = []
+
+    def signins():
+        for uid in user_ids:
+            for day in days:
+                created = datetime.strptime(day, "%Y-%m-%d") + timedelta(seconds=rng.randrange(86400))
+                if rng.random() < args.quest_rate:
+                    code = rng.choice(QUEST_CODES)
+                    qid = counters["quest"]
+                    counters["quest"] += 1
+                    quest_rows.append({"id": qid, "user_id": uid, "code": code, "date": day, "progress": 1, "completed": True, "rewarded": True, "created_at": created})
+                    ledger_rows.append({"user_id": uid, "delta": QUEST_POINTS[code], "reason": "quest", "ref_type": "quest", "ref_id": qid, "created_at": created})
+                    if len(quest_rows) >= batch:
+                        with engine.begin() as conn:
+                            conn.execute(QuestLog.__table__.insert(), quest_rows)
+                        quest_rows.clear()
+                if rng.random() >= args.signin_rate:
+                    continue
+                sid = counters["signin"]
+                counters["signin"] += 1
+                ledger_rows.append({"user_id": uid, "delta": 5, "reason": "signin", "ref_type": "daily", "ref_id": sid, "created_at": created})
+                flush_ledger()
+                yield {"id": sid, "user_id": uid, "date": day, "points": 5, "created_at": created}
+
+    bulk_insert(engine, DailySignin.__table__, signins(), batch, "signins")
+    if quest_rows:
+        with engine.begin() as conn:
+            conn.execute(QuestLog.__table__.insert(), quest_rows)
+    flush_ledger(force=True)
+    print(f"quest logs: {counters['quest'] - qid0:,} rows")
+
+    from app import taxon_stats
+    from app.db import SessionLocal
+    t0 = time.perf_counter()
+    with SessionLocal() as db:
+        taxon_stats.rebuild(db)
+    print(f"taxon rollups rebuilt in {time.perf_counter() - t0:.1f}s")
+
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE"))
+    print(f"Done in {time.perf_counter() - t_start:.1f}s. Login with any loadNNNNNNN@example.com / password")
+
+
+if __name__ == "__main__":
+    main()
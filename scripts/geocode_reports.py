@@ -0,0 +1,89 @@
+"""
+Fill latitude/longitude of existing reports from their location_text with the
+offline gazetteer (data/gazetteer.csv, plus KOMODO_GAZETTEER if set).
+Reports with submitted coordinates are never changed. The spatial index
+follows through its triggers.
+
+Usage:
+  python scripts/geocode_reports.py              # reports without coordinates
+  python scripts/geocode_reports.py --refresh    # also redo earlier gazetteer matches
+  python scripts/geocode_reports.py --dry-run    # count matches, write nothing
+"""
+import argparse
+import sys
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+BATCH = 5000
+
+
+def main(argv=None):
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    ap = argparse.ArgumentParser(description="Geocode reports from location_text.")
+    ap.add_argument("--refresh", action="store_true", help="recompute coordinates that came from the gazetteer")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args(argv)
+
+    from sqlalchemy import bindparam, or_, select, update
+
+    from app import geo, page_cache
+    from app.db import SessionLocal, engine
+    from app.models import SpeciesReport as R
+    from app.schema import ensure_columns
+
+    with engine.begin() as conn:
+        ensure_columns(conn)
+    try:
+        with engine.begin() as conn:
+            geo.ensure_index(conn)
+    except Exception as e:
+        print(f"spatial index unavailable: {e}")
+
+    todo = R.latitude.is_(None)
+    if args.refresh:
+        todo = or_(todo, R.geo_source == "gazetteer")
+    t = R.__table__
+    stmt = update(t).where(t.c.id == bindparam("rid")).values(
+        latitude=bindparam("latitude"), longitude=bindparam("longitude"), geo_source=bindparam("geo_source"))
+    memo = {}
+    located = seen = 0
+    misses = Counter()
+    last = 0
+    with SessionLocal() as db:
+        while True:
+            rows = db.execute(
+                select(R.id, R.location_text).where(todo, R.id > last).order_by(R.id).limit(BATCH)
+            ).all()
+            if not rows:
+                break
+            last = rows[-1].id
+            updates = []
+            for rid, text in rows:
+                seen += 1
+                if text not in memo:
+                    memo[text] = geo.geocode(text)
+                coords = memo[text]
+                if coords:
+                    updates.append({"rid": rid, "latitude": coords[0], "longitude": coords[1], "geo_source": "gazetteer"})
+                elif text:
+                    misses[text] += 1
+            located += len(updates)
+            if updates and not args.dry_run:
+                db.connection().execute(stmt, updates)
+                db.commit()
+            print(f"{seen} reports checked, {located} located")
+        if located and not args.dry_run:
+            # map tiles are cached per content version
+            page_cache.bump(db)
+            db.commit()
+    print(f"done: {located} of {seen} located{' (dry run)' if args.dry_run else ''}")
+    if misses:
+        print("most common unmatched locations:")
+        for text, n in misses.most_common(10):
+            print(f"  {n:>7}  {text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compute perceptual hashes for report photos that have none yet, so older
+reports take part in the duplicate check. New uploads are hashed by a
+background job. Needs Pillow.
+
+Usage:
+  python scripts/hash_photos.py                 # reports without hashes
+  python scripts/hash_photos.py --all           # rehash every report
+  python scripts/hash_photos.py --workers 8
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+BATCH = 1000
+
+
+def main(argv=None):
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    ap = argparse.ArgumentParser(description="Hash report photos for duplicate detection.")
+    ap.add_argument("--all", action="store_true", help="rehash reports that already have hashes")
+    ap.add_argument("--workers", type=int, default=4, help="decoding threads (default %(default)s)")
+    args = ap.parse_args(argv)
+
+    from sqlalchemy import delete, exists, select
+
+    from app import photo_hash
+    from app.db import SessionLocal, engine
+    from app.models import Base, PhotoHash, SpeciesReport as R
+    from app.utils import MEDIA_ROOT, split_paths
+
+    if not photo_hash.available():
+        sys.exit("Pillow is not installed: pip install Pillow")
+    Base.metadata.create_all(bind=engine)
+
+    def hash_file(path):
+        try:
+            return path, photo_hash.dhash((MEDIA_ROOT / path).read_bytes())
+        except OSError:
+            return path, None
+
+    stmt = select(R.id, R.photo_paths).where(R.photo_paths.is_not(None))
+    if not args.all:
+        stmt = stmt.where(~exists().where(PhotoHash.report_id == R.id))
+    t0 = time.perf_counter()
+    reports = stored = 0
+    last = 0
+    with SessionLocal() as db, ThreadPoolExecutor(max(1, args.workers)) as pool:
+        while True:
+            rows = db.execute(stmt.where(R.id > last).order_by(R.id).limit(BATCH)).all()
+            if not rows:
+                break
+            last = rows[-1].id
+            todo = [(rid, p) for rid, value in rows for p in split_paths(value)]
+            hashes = dict(pool.map(hash_file, [p for _, p in todo]))
+            if args.all:
+                db.execute(delete(PhotoHash).where(PhotoHash.report_id.in_([r.id for r in rows])))
+            for rid, p in todo:
+                if hashes.get(p) is not None:
+                    db.add(photo_hash.row_for(rid, p, hashes[p]))
+                    stored += 1
+            db.commit()
+            reports += len(rows)
+            print(f"{reports} reports, {stored} photos hashed ({time.perf_counter() - t0:.1f} s)")
+    print(f"done: {stored} photo(s) of {reports} report(s)")
+
+
+if __name__ == "__main__":
+    main()
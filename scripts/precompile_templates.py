@@ -0,0 +1,58 @@
+"""
+Precompile every template in app/templates/ into a Jinja bytecode cache.
+
+By default the output is app/template_cache/, which the PyInstaller build ships
+next to the templates; at runtime it backs the per-user cache, so even the very
+first launch skips template compilation.
+
+Usage:
+  python scripts/precompile_templates.py                 # write app/template_cache/
+  python scripts/precompile_templates.py --out DIR
+  python scripts/precompile_templates.py --bench         # compare cold compile vs cached load
+"""
+import argparse
+import shutil
+import sys
+import time
+from pathlib import Path
+
+
+def main(argv=None):
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    # the app's environment carries the custom filters the templates need to compile
+    from app.main import templates, TEMPLATES_DIR
+    from app.template_cache import TemplateBytecodeCache, PRECOMPILED_DIRNAME
+
+    ap = argparse.ArgumentParser(description="Precompile Jinja templates to bytecode.")
+    ap.add_argument("--out", type=Path, default=TEMPLATES_DIR.parent / PRECOMPILED_DIRNAME)
+    ap.add_argument("--bench", action="store_true", help="time source compile vs bytecode load per template")
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    if args.out.exists():
+        shutil.rmtree(args.out)
+    bcc = TemplateBytecodeCache(str(args.out))
+    env = templates.env.overlay(bytecode_cache=bcc, cache_size=0)
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        env.get_template(name)
+    print(f"Precompiled {len(names)} templates into {args.out}")
+
+    if args.bench:
+        cold_env = templates.env.overlay(bytecode_cache=None, cache_size=0)
+        timings = {}
+        for label, e in (("compile", cold_env), ("bytecode", env)):
+            t0 = time.perf_counter()
+            for _ in range(args.rounds):
+                for name in names:
+                    e.get_template(name)
+            timings[label] = (time.perf_counter() - t0) / args.rounds
+        print(f"load all templates: compile {timings['compile'] * 1000:.1f} ms, "
+              f"bytecode {timings['bytecode'] * 1000:.1f} ms "
+              f"({timings['compile'] / max(timings['bytecode'], 1e-9):.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Recompute the taxon rollups (taxon_counts, taxon_daily) from species_reports.
+The app keeps them current itself and builds them once on the first start
+with the tables; run this after approving or changing reports outside the
+app (seeding, direct SQL).
+
+Usage:
+  python scripts/rebuild_taxon_stats.py
+"""
+import sys
+import time
+from pathlib import Path
+
+
+def main():
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from app.db import SessionLocal, engine
+    from app.models import Base
+    from app import page_cache, taxon_stats
+
+    Base.metadata.create_all(bind=engine)
+    t0 = time.perf_counter()
+    with SessionLocal() as db:
+        n = taxon_stats.rebuild(db)
+        # facet counts are cached per content version
+        page_cache.bump(db)
+        db.commit()
+    print(f"Counted {n} approved reports in {time.perf_counter() - t0:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Recompute the cached per-user counters (user_stats) from the source tables.
+Run after writing reports, donations or points outside the app (seeding, imports).
+
+Usage:
+  python scripts/rebuild_user_stats.py            # all users
+  python scripts/rebuild_user_stats.py 12 34      # selected user ids
+"""
+import sys
+from pathlib import Path
+
+
+def main():
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    from sqlalchemy import select
+    from app.db import SessionLocal, engine
+    from app.models import Base, User
+    from app.user_stats import rebuild_user_stats
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if len(sys.argv) > 1:
+            ids = [int(a) for a in sys.argv[1:]]
+        else:
+            ids = db.execute(select(User.id).order_by(User.id)).scalars().all()
+        for i, uid in enumerate(ids, 1):
+            rebuild_user_stats(db, uid)
+            if i % 1000 == 0:
+                print(f"{i}/{len(ids)} users")
+        print(f"Rebuilt stats for {len(ids)} users.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
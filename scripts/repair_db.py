@@ -1,5 +1,6 @@
 """
-One-off DB repair script to add missing columns for existing SQLite DB.
+One-off DB repair script to add missing columns to an existing database
+(SQLite, or the server database named by KOMODO_DATABASE_URL).
 Usage: python scripts/repair_db.py
 """
 from pathlib import Path
@@ -13,40 +14,23 @@ def main():
     if str(root) not in sys.path:
         sys.path.insert(0, str(root))
 
-    from sqlalchemy import text
+    from app import geo
     from app.db import engine
+    from app.schema import ensure_columns
 
     with engine.begin() as conn:
-        # species_reports taxonomy columns
-        cols = {row[1] for row in conn.execute(text("PRAGMA table_info(species_reports)"))}
-        for name, typ in [
-            ("phylum", "TEXT"),
-            ("class_name", "TEXT"),
-            ("order_name", "TEXT"),
-            ("family", "TEXT"),
-            ("genus", "TEXT"),
-        ]:
-            if name not in cols:
-                conn.execute(text(f"ALTER TABLE species_reports ADD COLUMN {name} {typ}"))
+        added = ensure_columns(conn)
 
-        # users profile columns
-        ucols = {row[1] for row in conn.execute(text("PRAGMA table_info(users)"))}
-        for name, typ in [
-            ("avatar_url", "TEXT"),
-            ("gender", "TEXT"),
-            ("bio", "TEXT"),
-            ("city", "TEXT"),
-            ("theme", "TEXT"),
-            ("favorites", "TEXT"),
-            ("public_profile", "INTEGER DEFAULT 0"),
-            ("last_active_at", "DATETIME"),
-        ]:
-            if name not in ucols:
-                conn.execute(text(f"ALTER TABLE users ADD COLUMN {name} {typ}"))
-
-    print("DB schema repair completed.")
+    for name in added:
+        print(f"added column {name}")
+    try:
+        with engine.begin() as conn:
+            if geo.ensure_index(conn):
+                print(f"spatial index {geo.RTREE_TABLE} in place")
+    except Exception as e:
+        print(f"spatial index unavailable ({e}); map queries scan the table")
+    print(f"DB schema repair completed ({engine.dialect.name}).")
 
 
 if __name__ == "__main__":
     main()
-
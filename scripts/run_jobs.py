@@ -0,0 +1,53 @@
+"""
+Run background jobs (the `jobs` table) outside the web server.
+
+The app already runs KOMODO_JOB_WORKERS worker threads per process; use this
+to drain the queue after maintenance with the server stopped, or to run
+dedicated workers next to web processes started with KOMODO_JOB_WORKERS=0.
+
+Usage:
+  python scripts/run_jobs.py --once              # run what is due, then exit
+  python scripts/run_jobs.py --workers 4         # keep running until Ctrl+C
+  python scripts/run_jobs.py --status            # counts per kind and status
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+
+def main(argv=None):
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    ap = argparse.ArgumentParser(description="Run queued background jobs.")
+    ap.add_argument("--once", action="store_true", help="run the jobs that are due and exit")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--status", action="store_true", help="print queue counts and exit")
+    args = ap.parse_args(argv)
+
+    # importing the app registers the job handlers
+    from app.main import bootstrap
+    from app import jobs
+    from app.db import SessionLocal
+
+    bootstrap()
+    if args.status:
+        with SessionLocal() as db:
+            for kind, by_status in sorted(jobs.counts(db).items()):
+                print(kind, " ".join(f"{s}={by_status.get(s, 0)}" for s in jobs.STATUSES))
+        return
+    if args.once:
+        print(f"ran {jobs.run_pending()} job(s)")
+        return
+    jobs.start(args.workers)
+    print(f"{args.workers} worker(s) running; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        jobs.stop()
+
+
+if __name__ == "__main__":
+    main()
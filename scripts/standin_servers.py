@@ -0,0 +1,131 @@
+"""
+Local stand-ins for the external services the app and scripts call.
+
+  /sparql                       Wikidata SPARQL: every species resolves to the
+                                same Chordata > Reptilia > ... > Varanus chain
+  /api/rest_v1/page/summary/X   Wikipedia page summary with a thumbnail URL
+  /images/X.png                 a small placeholder PNG (stable per name)
+
+Used by bench_suite.py so benchmarks never reach the internet and see a fixed
+upstream latency. Can also be run on its own for manual testing:
+
+Usage:
+  python scripts/standin_servers.py --port 18600 --latency-ms 80
+  KOMODO_WIKIDATA_URL=http://127.0.0.1:18600/sparql python run_backend.py
+  APP_WIKIPEDIA_API=http://127.0.0.1:18600/api/rest_v1 python scripts/submit_reports_from_web.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+from generate_dataset import placeholder_png
+
+RANKS = [
+    ("Q38348", "Chordata"),
+    ("Q37517", "Reptilia"),
+    ("Q36602", "Squamata"),
+    ("Q35409", "Varanidae"),
+    ("Q34740", "Varanus"),
+]
+
+
+def sparql_body() -> bytes:
+    bindings = [
+        {"rank": {"type": "uri", "value": f"http://www.wikidata.org/entity/{qid}"},
+         "ancestorLabel": {"type": "literal", "value": label}}
+        for qid, label in RANKS
+    ]
+    return json.dumps({"head": {"vars": ["rank", "rankLabel", "ancestorLabel"]},
+                       "results": {"bindings": bindings}}).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StandInServer"
+
+    def _reply(self, status: int, body: bytes, ctype: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        path = urlsplit(self.path).path
+        with self.server.lock:
+            key = path.split("/")[1]
+            self.server.hits[key] = self.server.hits.get(key, 0) + 1
+        if path == "/sparql":
+            self._reply(200, sparql_body(), "application/sparql-results+json")
+        elif path.startswith("/api/rest_v1/page/summary/"):
+            title = unquote(path.rsplit("/", 1)[1])
+            host = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+            body = {"title": title, "extract": f"{title} (stand-in summary).",
+                    "thumbnail": {"source": f"{host}/images/{quote(title)}.png", "width": 32, "height": 32}}
+            self._reply(200, json.dumps(body).encode(), "application/json")
+        elif path.startswith("/images/"):
+            rng = random.Random(zlib.crc32(path.encode()))
+            self._reply(200, placeholder_png(rng), "image/png")
+        else:
+            self._reply(404, b"not found", "text/plain")
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency_ms: float = 0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.hits = {"sparql": 0, "api": 0, "images": 0}
+        self._thread = None
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @property
+    def wikidata_url(self) -> str:
+        return self.base + "/sparql"
+
+    @property
+    def wikipedia_api(self) -> str:
+        return self.base + "/api/rest_v1"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve local stand-ins for Wikidata and Wikipedia.")
+    ap.add_argument("--port", type=int, default=18600)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every response")
+    args = ap.parse_args(argv)
+    with StandInServer(args.port, args.latency_ms) as srv:
+        print(f"Wikidata:  KOMODO_WIKIDATA_URL={srv.wikidata_url}")
+        print(f"Wikipedia: APP_WIKIPEDIA_API={srv.wikipedia_api}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,52 @@
+"""
+Bulk-submit species reports to a running Komodo Hub server.
+
+Image discovery (Wikipedia summary API) and downloads run on a bounded worker
+pool with retries and an on-disk cache; submissions are posted as soon as their
+image is ready. Progress is recorded in a state file so an interrupted run can
+be resumed without re-posting; it is tied to the server and account that wrote it.
+
+Usage:
+  python scripts/submit_reports_from_web.py                      # built-in REPORTS list
+  python scripts/submit_reports_from_web.py --input items.jsonl   # or items.csv
+  python scripts/submit_reports_from_web.py --workers 8 --state data/submit_state.jsonl
+
+Input rows use the ReportItem field names (title, species_name, description,
+location_text, phylum, class_name, order_name, family, genus, photo_url).
+"""
+import argparse
+import csv
+import hashlib
 import io
+import json
 import os
-import base64
-from dataclasses import dataclass
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, fields
+from itertools import islice
+from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple, Set
+from urllib.parse import quote
 
 import requests
-from pathlib import Path
-import sys
 
 
+CURRENT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = CURRENT_DIR.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
 BASE_URL = os.environ.get("APP_BASE_URL", "http://127.0.0.1:8000")
+WIKIPEDIA_API = os.environ.get("APP_WIKIPEDIA_API", "https://en.wikipedia.org/api/rest_v1").rstrip("/")
 DEFAULT_UA = os.environ.get(
     "APP_UA",
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36 KomodoHub/1.0",
 )
+DEFAULT_CACHE_DIR = PROJECT_ROOT / "data" / "http_cache"
+DEFAULT_STATE_PATH = PROJECT_ROOT / "data" / "submit_state.jsonl"
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 
 @dataclass
@@ -78,6 +111,144 @@ REPORTS: List[ReportItem] = [
 ]
 
 
+def load_items(path: Path) -> List[ReportItem]:
+    """Read report items from a .jsonl or .csv file."""
+    names = {f.name for f in fields(ReportItem)}
+    rows: List[Dict[str, Any]] = []
+    if path.suffix.lower() == ".csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    rows.append(json.loads(line))
+    items = []
+    for row in rows:
+        data = {k: str(row.get(k) or "").strip() for k in names if k != "photo_url"}
+        if not data["title"] or not data["species_name"]:
+            print(f"[skip] row without title/species_name: {row}")
+            continue
+        items.append(ReportItem(**data, photo_url=str(row.get("photo_url") or "").strip() or None))
+    return items
+
+
+class SubmitState:
+    """Species already submitted, appended one per line after each success so runs can resume.
+
+    The first line records the server and account; resuming against a
+    different one is refused, as its species were never submitted there.
+    """
+
+    def __init__(self, path: Optional[Path], base_url: str, user: str):
+        self.path = path
+        self.owner = {"base_url": base_url, "user": user}
+        self.done: Set[str] = set()
+        self._fh = None
+        if not path:
+            return
+        if path.exists():
+            header, self.done = self._load(path)
+            for k, v in self.owner.items():
+                if header.get(k, v) != v:
+                    raise SystemExit(f"{path} belongs to {k}={header[k]!r}, not {v!r}; "
+                                     "pass --fresh or another --state file")
+        # (re)write the header and keys once; marks then only append
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.owner, ensure_ascii=False) + "\n")
+            f.writelines(json.dumps(k, ensure_ascii=False) + "\n" for k in sorted(self.done))
+        os.replace(tmp, path)
+        self._fh = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _load(path: Path) -> Tuple[Dict[str, Any], Set[str]]:
+        text = path.read_text(encoding="utf-8")
+        try:
+            # older format: one JSON document {"base_url", "done": [...]}
+            legacy = json.loads(text)
+            if isinstance(legacy, dict) and "done" in legacy:
+                return {k: v for k, v in legacy.items() if k != "done"}, set(legacy["done"])
+        except ValueError:
+            pass
+        header: Dict[str, Any] = {}
+        done: Set[str] = set()
+        for i, line in enumerate(text.splitlines()):
+            try:
+                value = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if i == 0 and isinstance(value, dict):
+                header = value
+            elif isinstance(value, str):
+                done.add(value)
+        return header, done
+
+    def mark(self, key: str) -> None:
+        self.done.add(key)
+        if self._fh:
+            self._fh.write(json.dumps(key, ensure_ascii=False) + "\n")
+            self._fh.flush()
+
+    def close(self) -> None:
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+
+class HttpCache:
+    """Content-addressed on-disk cache for fetched bodies, keyed by URL."""
+
+    def __init__(self, root: Optional[Path]):
+        self.root = root
+        if root:
+            root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, url: str) -> Path:
+        h = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.root / h[:2] / h
+
+    def get(self, url: str) -> Optional[bytes]:
+        if not self.root:
+            return None
+        p = self._path(url)
+        try:
+            return p.read_bytes()
+        except OSError:
+            return None
+
+    def put(self, url: str, body: bytes) -> None:
+        if not self.root:
+            return
+        p = self._path(url)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(f".{os.getpid()}.{random.randrange(1 << 30)}.tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, p)
+
+
+def http_get(url: str, retries: int = 4, backoff: float = 0.5, **kwargs) -> requests.Response:
+    """GET with exponential backoff (plus jitter) on connection errors and 429/5xx."""
+    kwargs.setdefault("timeout", 30)
+    last_exc: Optional[Exception] = None
+    for attempt in range(retries + 1):
+        try:
+            r = requests.get(url, **kwargs)
+            if r.status_code not in RETRY_STATUS:
+                return r
+            retry_after = r.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else backoff * (2 ** attempt)
+            last_exc = RuntimeError(f"HTTP {r.status_code} for {url}")
+        except requests.RequestException as e:
+            last_exc = e
+            delay = backoff * (2 ** attempt)
+        if attempt < retries:
+            time.sleep(delay + random.uniform(0, backoff))
+    raise last_exc or RuntimeError(f"GET failed: {url}")
+
+
 def login(session: requests.Session, email: str, password: str) -> bool:
     # get login page to establish session cookie
     session.get(f"{BASE_URL}/login")
@@ -117,11 +288,6 @@ def ensure_login(session: requests.Session, email: str, password: str) -> None:
 
 def ensure_user_in_db(email: str, password: str, display_name: str) -> bool:
     try:
-        # import app.db & models dynamically
-        CURRENT_DIR = Path(__file__).resolve().parent
-        PROJECT_ROOT = CURRENT_DIR.parent
-        if str(PROJECT_ROOT) not in sys.path:
-            sys.path.insert(0, str(PROJECT_ROOT))
         from app.db import SessionLocal, engine
         from app.models import Base, User
         from app.security import hash_password
@@ -140,62 +306,86 @@ def ensure_user_in_db(email: str, password: str, display_name: str) -> bool:
             return True
         finally:
             db.close()
-    except Exception as e:
+    except Exception:
         return False
 
 
-def get_user_id(email: str) -> Optional[int]:
+def existing_species_for_user(email: str) -> Optional[Set[str]]:
+    """Lower-cased species names the user already reported, in a single query.
+
+    Returns None when the local database is not reachable (remote server).
+    """
     try:
-        CURRENT_DIR = Path(__file__).resolve().parent
-        PROJECT_ROOT = CURRENT_DIR.parent
-        if str(PROJECT_ROOT) not in sys.path:
-            sys.path.insert(0, str(PROJECT_ROOT))
+        from sqlalchemy import select, func
         from app.db import SessionLocal
-        from app.models import User
+        from app.models import SpeciesReport, User
+
         db = SessionLocal()
         try:
-            u = db.query(User).filter(User.email == email.lower()).one_or_none()
-            return u.id if u else None
+            rows = db.execute(
+                select(func.lower(SpeciesReport.species_name))
+                .join(User, User.id == SpeciesReport.reporter_id)
+                .where(User.email == email.lower())
+            ).scalars().all()
+            return {r.strip() for r in rows if r}
         finally:
             db.close()
     except Exception:
         return None
 
 
-def species_exists_for_user(user_id: int, species_name: str) -> bool:
+def find_image_url(cache: HttpCache, title: str) -> Optional[str]:
+    """Use Wikipedia summary API to fetch a thumbnail for the species page."""
+    api = f"{WIKIPEDIA_API}/page/summary/{quote(title)}"
+    body = cache.get(api)
+    if body is None:
+        try:
+            r = http_get(api, timeout=20, headers={"User-Agent": DEFAULT_UA, "Accept": "application/json"})
+        except Exception:
+            return None
+        if r.status_code != 200:
+            return None
+        body = r.content
+        cache.put(api, body)
     try:
-        CURRENT_DIR = Path(__file__).resolve().parent
-        PROJECT_ROOT = CURRENT_DIR.parent
-        if str(PROJECT_ROOT) not in sys.path:
-            sys.path.insert(0, str(PROJECT_ROOT))
-        from app.db import SessionLocal
-        from app.models import SpeciesReport
-        db = SessionLocal()
+        data = json.loads(body)
+    except ValueError:
+        return None
+    thumb = data.get("thumbnail") or {}
+    return thumb.get("source")
+
+
+def fetch_image(cache: HttpCache, url: str) -> Optional[Tuple[str, bytes, str]]:
+    content = cache.get(url)
+    if content is None:
+        headers = {"User-Agent": DEFAULT_UA, "Accept": "image/*,*/*;q=0.8", "Referer": "https://commons.wikimedia.org/"}
         try:
-            q = db.query(SpeciesReport).filter(
-                SpeciesReport.reporter_id == user_id,
-                SpeciesReport.species_name.ilike(species_name)
-            )
-            return db.query(q.exists()).scalar()
-        finally:
-            db.close()
-    except Exception:
-        return False
+            r = http_get(url, timeout=30, headers=headers)
+            r.raise_for_status()
+        except Exception:
+            return None
+        content = r.content
+        cache.put(url, content)
+    # guess mime from url
+    if url.lower().endswith(".png"):
+        return ("photo.png", content, "image/png")
+    return ("photo.jpg", content, "image/jpeg")
 
 
-def submit_report(session: requests.Session, item: ReportItem) -> None:
-    # Find image URL if missing
-    img_url = item.photo_url or find_image_url(session, item.species_name)
+def prepare(cache: HttpCache, item: ReportItem) -> Tuple[ReportItem, Optional[Tuple[str, bytes, str]], str]:
+    """Worker step: resolve and download the image for one item."""
+    img_url = item.photo_url or find_image_url(cache, item.species_name)
     if not img_url:
-        print(f"[skip] No image found for {item.species_name}")
-        return
-    fetched = fetch_image(session, img_url)
+        return item, None, "No image found"
+    fetched = fetch_image(cache, img_url)
     if not fetched:
-        print(f"[skip] Unable to download image for {item.species_name}")
-        return
-    fname, content, mime = fetched
-    img_bytes = io.BytesIO(content)
-    files = {"photo1": (fname, img_bytes, mime)}
+        return item, None, "Unable to download image"
+    return item, fetched, ""
+
+
+def submit_report(session: requests.Session, item: ReportItem, image: Tuple[str, bytes, str]) -> None:
+    fname, content, mime = image
+    files = {"photo1": (fname, io.BytesIO(content), mime)}
     data = {
         "title": item.title,
         "species_name": item.species_name,
@@ -212,56 +402,82 @@ def submit_report(session: requests.Session, item: ReportItem) -> None:
         raise RuntimeError(f"Submit failed: {resp.status_code} {resp.text[:200]}")
 
 
-def fetch_image(session: requests.Session, url: str) -> Optional[Tuple[str, bytes, str]]:
-    headers = {"User-Agent": DEFAULT_UA, "Accept": "image/*,*/*;q=0.8", "Referer": "https://commons.wikimedia.org/"}
-    try:
-        r = session.get(url, timeout=30, headers=headers)
-        r.raise_for_status()
-        # guess mime from url
-        if url.lower().endswith(".png"):
-            return ("photo.png", r.content, "image/png")
-        else:
-            return ("photo.jpg", r.content, "image/jpeg")
-    except Exception as e:
-        return None
-
-
-def find_image_url(session: requests.Session, title: str) -> Optional[str]:
-    """Use Wikipedia summary API to fetch a thumbnail for the species page."""
-    try:
-        from urllib.parse import quote
-        api = f"https://en.wikipedia.org/api/rest_v1/page/summary/{quote(title)}"
-        r = session.get(api, timeout=20, headers={"User-Agent": DEFAULT_UA, "Accept": "application/json"})
-        if r.status_code != 200:
-            return None
-        data = r.json()
-        thumb = data.get("thumbnail") or {}
-        src = thumb.get("source")
-        return src
-    except Exception:
-        return None
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk-submit species reports with web images.")
+    ap.add_argument("--input", type=Path, help="JSONL or CSV file of items (default: built-in REPORTS)")
+    ap.add_argument("--workers", type=int, default=int(os.environ.get("APP_WORKERS", "6")), help="image discovery/download workers")
+    ap.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR, help="on-disk HTTP cache directory")
+    ap.add_argument("--no-cache", action="store_true", help="disable the on-disk HTTP cache")
+    ap.add_argument("--state", type=Path, default=DEFAULT_STATE_PATH, help="resume state file")
+    ap.add_argument("--fresh", action="store_true", help="ignore and overwrite an existing state file")
+    return ap.parse_args(argv)
 
 
-def main():
+def main(argv=None):
+    args = parse_args(argv)
     # 默认使用普通用户账号（可用 APP_EMAIL/APP_PASSWORD 覆盖）
     email = os.environ.get("APP_EMAIL", "liusizhe0312@sohu.com")
     password = os.environ.get("APP_PASSWORD", "liusizhe0312")
+    items = load_items(args.input) if args.input else REPORTS
+    cache = HttpCache(None if args.no_cache else args.cache_dir)
+    if args.fresh and args.state.exists():
+        args.state.unlink()
+    state = SubmitState(args.state, BASE_URL, email)
+
     with requests.Session() as s:
         s.headers.update({"User-Agent": DEFAULT_UA})
         ensure_login(s, email, password)
-        user_id = get_user_id(email)
+        existing = existing_species_for_user(email) or set()
+
+        todo: List[ReportItem] = []
         seen: Set[str] = set()
-        for r in REPORTS:
+        for r in items:
             key = r.species_name.strip().lower()
             if key in seen:
                 print(f"[skip] duplicate species in batch: {r.species_name}")
                 continue
-            if user_id and species_exists_for_user(user_id, r.species_name):
+            seen.add(key)
+            if key in state.done:
+                print(f"[skip] already submitted in a previous run: {r.species_name}")
+                continue
+            if key in existing:
                 print(f"[skip] already exists for user: {r.species_name}")
                 continue
-            submit_report(s, r)
-            seen.add(key)
-    print(f"Submitted {len(REPORTS)} reports to {BASE_URL}")
+            todo.append(r)
+
+        submitted = failed = 0
+        window = 2 * max(1, args.workers)
+        queue = iter(todo)
+        pending: Set[Future] = set()
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+                # at most `window` items downloaded ahead of posting, so finished
+                # images do not pile up in memory when posting is the slower side
+                for r in islice(queue, window):
+                    pending.add(pool.submit(prepare, cache, r))
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    # post from this thread; the session is not shared with workers
+                    for fut in finished:
+                        item, image, reason = fut.result()
+                        for r in islice(queue, 1):
+                            pending.add(pool.submit(prepare, cache, r))
+                        if not image:
+                            print(f"[skip] {reason} for {item.species_name}")
+                            failed += 1
+                            continue
+                        try:
+                            submit_report(s, item, image)
+                        except Exception as e:
+                            print(f"[fail] {item.species_name}: {e}")
+                            failed += 1
+                            continue
+                        state.mark(item.species_name.strip().lower())
+                        submitted += 1
+                        print(f"[ok] {item.species_name}")
+        finally:
+            state.close()
+    print(f"Submitted {submitted} reports to {BASE_URL} ({failed} failed, {len(items) - len(todo)} skipped)")
 
 
 if __name__ == "__main__":